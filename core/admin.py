@@ -25,4 +25,10 @@ class EditHistoryAdmin(admin.ModelAdmin):
 class DeleteHistoryAdmin(admin.ModelAdmin):
     list_display = [field.name for field in DeleteHistory._meta.fields]
 
+@admin.register(ShadowPrediction)
+class ShadowPredictionAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in ShadowPrediction._meta.fields]
 
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = [field.name for field in PredictionJob._meta.fields]
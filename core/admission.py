@@ -0,0 +1,165 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed instead of being queued for inference.
+    """
+    def __init__(self, status_code, reason, message, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+    def as_response(self):
+        """Returns the fast 429/503 response for this rejection, with Retry-After when known."""
+        headers = {}
+        if self.retry_after is not None:
+            headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return Response({"error": self.message, "reason": self.reason},
+                        status=self.status_code, headers=headers)
+
+    def as_json_response(self):
+        """Same as as_response(), for plain Django (async) views."""
+        response = JsonResponse({"error": self.message, "reason": self.reason}, status=self.status_code)
+        if self.retry_after is not None:
+            response['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return response
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens.
+    """
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now):
+        """Takes one token. Returns 0 on success, otherwise the seconds until a token is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    """
+    Bounds the number of in-flight inference requests in this worker and
+    rate-limits each client with a token bucket. Requests over either limit
+    are rejected immediately instead of queueing until the proxy times out.
+    """
+    def __init__(self, max_in_flight, rate, burst, max_clients=10000):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.in_flight = 0
+        self.rejected = {'rate_limited': 0, 'overloaded': 0, 'deadline_exceeded': 0}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_in_flight=settings.PREDICT_MAX_IN_FLIGHT,
+            rate=settings.PREDICT_RATE_LIMIT_PER_SECOND,
+            burst=settings.PREDICT_RATE_LIMIT_BURST,
+        )
+
+    def _reject(self, status_code, reason, message, retry_after=None):
+        """Counts and logs a rejection and returns the exception to raise. Caller holds the lock."""
+        self.rejected[reason] += 1
+        logger.warning("Predict request rejected (%s): %s", reason, message)
+        return AdmissionRejected(status_code, reason, message, retry_after)
+
+    def _take_token(self, client_key, now):
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                # Forget idle clients; a full bucket carries no state worth keeping
+                self._buckets = {key: b for key, b in self._buckets.items() if not b.is_full(now)}
+            bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst, now)
+        return bucket.take(now)
+
+    @contextmanager
+    def admit(self, client_key, deadline=None):
+        """
+        Admits one request for `client_key` or raises AdmissionRejected.
+        The in-flight slot is released when the block exits.
+        """
+        self.check_deadline(deadline)
+        with self._lock:
+            # Check capacity first so requests turned away for overload don't spend the client's tokens
+            if self.in_flight >= self.max_in_flight:
+                raise self._reject(503, 'overloaded', "Server is busy, please retry shortly.", 1)
+            wait = self._take_token(client_key, time.monotonic()) if self.rate > 0 else 0
+            if wait:
+                raise self._reject(429, 'rate_limited', "Too many prediction requests, slow down.", wait)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def check_deadline(self, deadline):
+        """Raises AdmissionRejected when the client's deadline has already passed."""
+        if deadline is not None and time.time() >= deadline:
+            with self._lock:
+                raise self._reject(503, 'deadline_exceeded', "Request deadline exceeded before inference.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'rejected': dict(self.rejected),
+            }
+
+
+def parse_deadline(request):
+    """
+    Returns the client's deadline as a time.time() timestamp, or None.
+    Accepts an absolute Unix timestamp in PREDICT_DEADLINE_HEADER
+    or a relative budget in seconds in PREDICT_TIMEOUT_HEADER.
+    """
+    try:
+        deadline = request.headers.get(settings.PREDICT_DEADLINE_HEADER)
+        if deadline:
+            return float(deadline)
+        timeout = request.headers.get(settings.PREDICT_TIMEOUT_HEADER)
+        if timeout:
+            return time.time() + float(timeout)
+    except ValueError:
+        logger.warning("Ignoring malformed deadline header")
+    return None
+
+
+def client_key(request):
+    """Rate-limit key: the authenticated user, or the client address for anonymous requests."""
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"addr:{request.META.get('REMOTE_ADDR', '-')}"
+
+
+# Admission controller shared by the predict views of this worker process
+predict_admission = AdmissionController.from_settings()
@@ -1,6 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def start_inference():
+    """
+    Loads the model (or connects to the inference servers) up front when this process
+    serves inference (DEPLOYMENT_ROLE 'all' or 'inference'). Called by wsgi.py / asgi.py,
+    i.e. on the server's main thread: the first predict doesn't pay the cold start, and
+    the model registry can install its SIGHUP reload handler (main thread only).
+    Not done in ready(), which also runs for migrate, training and other commands.
+    """
+    if settings.DEPLOYMENT_ROLE in ('all', 'inference'):
+        import core.predict_views  # noqa: F401 (starts local inference on import)
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Applies SQLITE_PRAGMAS to every new SQLite connection (the 'sqlite-wal' database profile)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .upload_validation import configure_pillow
+        configure_pillow()
+        if settings.DB_PROFILE == 'sqlite-wal':
+            connection_created.connect(apply_sqlite_pragmas, dispatch_uid='core.apply_sqlite_pragmas')
@@ -0,0 +1,99 @@
+import logging
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import DiseaseHistory, EditHistory, DeleteHistory, Plant, Disease
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk_update / bulk_create statement; stays under SQLite's 999 bound parameters per query
+BULK_BATCH_SIZE = 100
+
+
+def _missing_ids(requested, found):
+    """Return the requested IDs that were not found, in request order."""
+    return [pk for pk in requested if pk not in found]
+
+
+def apply_bulk_edits(user, edits):
+    """
+    Applies a batch of edits to DiseaseHistory records in a single transaction.
+    Writes one EditHistory audit row per edited record with bulk_create.
+    Runs a fixed number of lookups plus one UPDATE and one INSERT per BULK_BATCH_SIZE
+    records, so n edits cost about 4 + 2 * ceil(n / BULK_BATCH_SIZE) queries.
+    """
+    history_ids = [edit['historyID'] for edit in edits]
+    plant_ids = {edit['plantID'] for edit in edits if 'plantID' in edit}
+    disease_ids = {edit['diseaseID'] for edit in edits if edit.get('diseaseID') is not None}
+
+    with transaction.atomic():
+        records = DiseaseHistory.objects.select_for_update().in_bulk(history_ids)
+        missing = _missing_ids(history_ids, records)
+        if missing:
+            raise ValidationError({"historyID": f"DiseaseHistory records not found: {missing}"})
+
+        plants = Plant.objects.in_bulk(plant_ids) if plant_ids else {}
+        missing = _missing_ids(plant_ids, plants)
+        if missing:
+            raise ValidationError({"plantID": f"Plants not found: {missing}"})
+
+        diseases = Disease.objects.in_bulk(disease_ids) if disease_ids else {}
+        missing = _missing_ids(disease_ids, diseases)
+        if missing:
+            raise ValidationError({"diseaseID": f"Diseases not found: {missing}"})
+
+        changed_fields = set()
+        for edit in edits:
+            record = records[edit['historyID']]
+            if 'plantID' in edit:
+                record.plantID = plants[edit['plantID']]
+                changed_fields.add('plantID')
+            if 'diseaseID' in edit:
+                disease_id = edit['diseaseID']
+                record.diseaseID = diseases[disease_id] if disease_id is not None else None
+                changed_fields.add('diseaseID')
+            if 'status' in edit:
+                record.status = edit['status']
+                changed_fields.add('status')
+
+        if changed_fields:
+            DiseaseHistory.objects.bulk_update(
+                records.values(), fields=sorted(changed_fields), batch_size=BULK_BATCH_SIZE
+            )
+        EditHistory.objects.bulk_create(
+            [EditHistory(user=user, history_id=history_id) for history_id in history_ids],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+    logger.info("User %s bulk-edited %s DiseaseHistory records", user.pk, len(history_ids))
+    return len(history_ids)
+
+
+def apply_bulk_deletes(user, history_ids):
+    """
+    Deletes a batch of DiseaseHistory records in a single transaction.
+    Writes one DeleteHistory audit row per deleted record with bulk_create.
+    The delete goes through Django's collector: one SELECT of the records, then the
+    cascaded EditHistory and the DiseaseHistory DELETEs, each chunked by the backend
+    (100 primary keys per DELETE). DeleteHistory is not collected (DO_NOTHING), so n
+    deletes cost a few queries plus about 2 * ceil(n / 100) of them.
+    """
+    history_ids = list(dict.fromkeys(history_ids))  # Drop duplicates, keep order
+
+    with transaction.atomic():
+        found = set(
+            DiseaseHistory.objects.filter(historyID__in=history_ids).values_list('historyID', flat=True)
+        )
+        missing = _missing_ids(history_ids, found)
+        if missing:
+            raise ValidationError({"historyIDs": f"DiseaseHistory records not found: {missing}"})
+
+        DeleteHistory.objects.bulk_create(
+            [DeleteHistory(user=user, history_id=history_id) for history_id in history_ids],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        DiseaseHistory.objects.filter(historyID__in=history_ids).delete()
+
+    logger.info("User %s bulk-deleted %s DiseaseHistory records", user.pk, len(history_ids))
+    return len(history_ids)
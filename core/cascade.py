@@ -0,0 +1,134 @@
+"""
+Two-stage inference cascade.
+
+A tiny TriageNet looks at a 64 x 64 downsample of the preprocessed image and
+predicts (crop, healthy/diseased). When it is confident that the leaf is healthy
+(and the crop has a healthy class), its answer is returned directly; everything
+else escalates to the full ResNet9.
+"""
+import json
+import logging
+import os
+
+import torch
+import torch.nn.functional as F
+from django.conf import settings
+
+from core.model_architecture import TriageNet
+
+logger = logging.getLogger(__name__)
+
+TRIAGE_INPUT_SIZE = 64
+TRIAGE_WEIGHTS_FILE = 'triage-model.pth'
+TRIAGE_CONFIG_FILE = 'triage.json'
+
+
+def crop_of(class_name):
+    return class_name.split('___')[0]
+
+
+def is_healthy(class_name):
+    return class_name.split('___')[-1].lower() == 'healthy'
+
+
+def triage_crops(class_names):
+    """Crops in the order they first appear in `class_names`."""
+    return list(dict.fromkeys(crop_of(name) for name in class_names))
+
+
+def triage_label(class_names, crops):
+    """Returns a function mapping a full class index to its triage index (crop * 2 + diseased)."""
+    labels = [crops.index(crop_of(name)) * 2 + (0 if is_healthy(name) else 1) for name in class_names]
+    return labels.__getitem__
+
+
+def downsample(image_tensor):
+    """Area-downsamples a (N,)3,H,W image tensor to the triage input size."""
+    return F.adaptive_avg_pool2d(image_tensor, TRIAGE_INPUT_SIZE)
+
+
+class TriageCascade:
+    """
+    First stage of the cascade. `classify` returns the full class name when the
+    triage model is confidently healthy, or None to escalate to the full model.
+    Answers are labels of `class_names`, or of the label set passed to classify()
+    (the classes of the model version being served, which a hot swap can change).
+    """
+    def __init__(self, model, crops, class_names, threshold, device):
+        self.model = model
+        self.crops = crops
+        self.threshold = threshold
+        self.device = device
+        self._healthy_by_classes = {}
+        self.healthy_class = self.healthy_classes(class_names)
+        self.shortcuts = 0
+        self.escalations = 0
+
+    def healthy_classes(self, class_names):
+        """Maps each crop to its healthy class in `class_names` (cached per label set)."""
+        key = tuple(class_names)
+        if key not in self._healthy_by_classes:
+            self._healthy_by_classes[key] = {crop_of(name): name for name in class_names if is_healthy(name)}
+        return self._healthy_by_classes[key]
+
+    def scores(self, image_tensor):
+        """Returns (confidence, triage index) for a batch of preprocessed image tensors."""
+        with torch.inference_mode():
+            probs = F.softmax(self.model(downsample(image_tensor.to(self.device))), dim=1)
+        return probs.max(dim=1)
+
+    def resolve(self, confidence, triage_index, threshold=None, class_names=None):
+        """Maps one triage prediction to a full class name, or None when it must escalate."""
+        crop, diseased = divmod(int(triage_index), 2)
+        if diseased or confidence < (self.threshold if threshold is None else threshold):
+            return None
+        healthy_class = self.healthy_class if class_names is None else self.healthy_classes(class_names)
+        return healthy_class.get(self.crops[crop])  # None (escalate) if that version has no such class
+
+    def classify(self, image_tensor, class_names=None):
+        confidence, triage_index = self.scores(image_tensor)
+        prediction = self.resolve(confidence.item(), triage_index.item(), class_names=class_names)
+        if prediction is None:
+            self.escalations += 1
+        else:
+            self.shortcuts += 1
+        return prediction
+
+    def stats(self):
+        total = self.shortcuts + self.escalations
+        return {
+            'threshold': self.threshold,
+            'shortcuts': self.shortcuts,
+            'escalations': self.escalations,
+            'shortcut_rate': round(self.shortcuts / total, 4) if total else None,
+        }
+
+
+def save_triage(model, crops, threshold, directory=None):
+    """Writes the triage weights and config (crops and calibrated threshold)."""
+    directory = str(directory or settings.TRIAGE_MODEL_DIR)
+    os.makedirs(directory, exist_ok=True)
+    torch.save(model.state_dict(), os.path.join(directory, TRIAGE_WEIGHTS_FILE))
+    with open(os.path.join(directory, TRIAGE_CONFIG_FILE), 'w') as f:
+        json.dump({'crops': crops, 'threshold': threshold}, f, indent=2)
+
+
+def load_triage(class_names, device, directory=None, threshold=None):
+    """
+    Loads the triage cascade from TRIAGE_MODEL_DIR.
+    Returns None when the triage artifacts are missing.
+    """
+    directory = str(directory or settings.TRIAGE_MODEL_DIR)
+    config_path = os.path.join(directory, TRIAGE_CONFIG_FILE)
+    if not os.path.exists(config_path):
+        logger.warning("Triage cascade unavailable: %s not found", config_path)
+        return None
+    with open(config_path) as f:
+        config = json.load(f)
+
+    crops = config['crops']
+    model = TriageNet(3, len(crops) * 2)
+    model.load_state_dict(torch.load(os.path.join(directory, TRIAGE_WEIGHTS_FILE), map_location=device))
+    model.to(device)
+    model.eval()
+    return TriageCascade(model, crops, class_names, config['threshold'] if threshold is None else threshold, device)
@@ -0,0 +1,87 @@
+"""
+How this worker process divides its CPUs between model replicas and password hashing.
+
+The plan is computed once from the CPUs the process may run on, the number of
+server processes sharing them, and the INFERENCE_* / AUTH_HASH_* settings.
+AUTH_HASH_CPUS cores are set aside for PBKDF2 (see userauths.hashing) and the
+model replicas are sized, and optionally pinned, on the remaining ones.
+It has no torch dependency, so the scheduler can size its worker threads from it.
+"""
+import logging
+import os
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus():
+    """CPUs this process may run on (its affinity mask), in ascending order."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS / Windows
+        return list(range(os.cpu_count() or 1))
+
+
+def reserve_cpus(cpus, count):
+    """Splits `cpus` into (remaining, reserved) with the last `count` CPUs reserved; at least one CPU remains."""
+    count = min(count, len(cpus) - 1)
+    if count <= 0:
+        return cpus, []
+    return cpus[:-count], cpus[-count:]
+
+
+def partition(cpus, parts, size):
+    """Splits `cpus` into `parts` contiguous chunks of `size` CPUs (wrapping around if there are too few)."""
+    return [[cpus[(part * size + i) % len(cpus)] for i in range(size)] for part in range(parts)]
+
+
+class InferencePlan:
+    """
+    `replicas` model replicas, each running forwards with `threads_per_replica`
+    intra-op threads and, when pinning is enabled, on its own CPU set.
+    """
+    def __init__(self, replicas, threads_per_replica, cpu_sets=None):
+        self.replicas = replicas
+        self.threads_per_replica = threads_per_replica
+        self.cpu_sets = cpu_sets
+
+    def stats(self):
+        return {
+            'replicas': self.replicas,
+            'threads_per_replica': self.threads_per_replica,
+            'cpu_sets': self.cpu_sets,
+        }
+
+
+def plan_inference(cpus, processes=1, replicas=0, threads_per_replica=0, pin=False):
+    """
+    Sizes the model pool of one process. Zero means "pick automatically":
+    the process's share of the cores (cores / processes) is split into replicas
+    of up to 4 threads each, a size where ResNet9 forwards still scale well.
+    """
+    share = max(1, len(cpus) // max(1, processes))
+    if not threads_per_replica:
+        threads_per_replica = max(1, min(4, share // (replicas or 1)))
+    if not replicas:
+        replicas = max(1, share // threads_per_replica)
+    cpu_sets = partition(cpus, replicas, threads_per_replica) if pin else None
+    return InferencePlan(replicas, threads_per_replica, cpu_sets)
+
+
+def plan_from_settings(cpus):
+    plan = plan_inference(
+        cpus,
+        processes=settings.INFERENCE_PROCESSES,
+        replicas=settings.INFERENCE_WORKERS,
+        threads_per_replica=settings.INFERENCE_THREADS_PER_REPLICA,
+        pin=settings.INFERENCE_PIN_CPUS,
+    )
+    logger.info("Inference plan: %s replicas x %s threads%s", plan.replicas, plan.threads_per_replica,
+                f", pinned to {plan.cpu_sets}" if plan.cpu_sets else "")
+    return plan
+
+
+# CPU plan of this worker process: cores reserved for password hashing, the rest for inference
+inference_cpus, auth_cpus = reserve_cpus(available_cpus(), settings.AUTH_HASH_CPUS)
+inference_plan = plan_from_settings(inference_cpus)
@@ -0,0 +1,186 @@
+"""
+Decoded uint8 image cache for training.
+
+An ImageFolder is decoded and resized once into `<cache>/images.npy`, a
+memory-mapped (N, size, size, 3) uint8 array, with labels in `labels.npy`.
+Every later epoch reads pixels straight from the page cache instead of
+re-decoding JPEGs. Augmentation runs on whole batches with tensor ops in a
+small thread pool (PyTorch releases the GIL), a few batches ahead of training.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from django.conf import settings
+from PIL import Image
+from torchvision import datasets
+
+from core.model_utils import classes
+from core.training_utils import folder_class_indices
+
+logger = logging.getLogger(__name__)
+
+IMAGES_FILE = 'images.npy'
+LABELS_FILE = 'labels.npy'
+META_FILE = 'meta.json'
+
+
+def cache_dir_for(root, size):
+    """One cache per dataset folder and resolution under DATASET_CACHE_DIR."""
+    key = hashlib.sha256(os.path.abspath(root).encode()).hexdigest()[:16]
+    return os.path.join(settings.DATASET_CACHE_DIR, f"{key}-{size}")
+
+
+def _fingerprint(samples, size, class_names):
+    """Identifies a dataset by its files, their sizes and mtimes, the cache resolution and the label order."""
+    digest = hashlib.sha256(f"{size}:{','.join(class_names)}".encode())
+    for path, _ in samples:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _decode(path, size):
+    with Image.open(path) as image:
+        image.draft('RGB', (size, size))  # Let JPEG decode at a reduced scale when possible
+        return np.asarray(image.convert('RGB').resize((size, size), Image.BILINEAR))
+
+
+def build_cache(root, cache_dir, size=256, threads=None, class_names=classes):
+    """
+    Decodes the ImageFolder at `root` into `cache_dir` unless an up-to-date cache exists.
+    Labels are indices in `class_names` (default core.model_utils.classes). Returns the cache directory.
+    """
+    folder = datasets.ImageFolder(root)
+    folder_to_class = folder_class_indices(folder, class_names)
+    fingerprint = _fingerprint(folder.samples, size, class_names)
+
+    meta_path = os.path.join(cache_dir, META_FILE)
+    try:
+        with open(meta_path) as f:
+            if json.load(f)['fingerprint'] == fingerprint:
+                logger.info("Using dataset cache %s", cache_dir)
+                return cache_dir
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # Invalidate first, so an interrupted rebuild is never trusted
+    count = len(folder.samples)
+    images = np.lib.format.open_memmap(
+        os.path.join(cache_dir, IMAGES_FILE), mode='w+', dtype=np.uint8, shape=(count, size, size, 3)
+    )
+    labels = np.array([folder_to_class[target] for _, target in folder.samples], dtype=np.int64)
+
+    def decode_into(index):
+        images[index] = _decode(folder.samples[index][0], size)
+
+    with ThreadPoolExecutor(threads or os.cpu_count()) as pool:
+        for done, _ in enumerate(pool.map(decode_into, range(count)), start=1):
+            if done % 1000 == 0:
+                logger.info("Decoded %s/%s images into %s", done, count, cache_dir)
+    images.flush()
+    del images
+    np.save(os.path.join(cache_dir, LABELS_FILE), labels)
+    with open(meta_path, 'w') as f:
+        json.dump({'root': str(root), 'size': size, 'count': count, 'fingerprint': fingerprint}, f)
+    logger.info("Built dataset cache %s (%s images at %spx)", cache_dir, count, size)
+    return cache_dir
+
+
+def augment(images):
+    """
+    Random flips, 90-degree rotations and brightness/contrast jitter on a float
+    (N, 3, H, W) batch in [0, 1]. Leaf photos have no canonical orientation.
+    """
+    n = images.shape[0]
+    flip = torch.rand(n) < 0.5
+    images[flip] = images[flip].flip(-1)
+    quarter_turns = torch.randint(0, 4, (n,))
+    for k in range(1, 4):
+        selected = quarter_turns == k
+        if selected.any():
+            images[selected] = torch.rot90(images[selected], k, dims=(-2, -1))
+
+    brightness = torch.empty(n, 1, 1, 1).uniform_(0.8, 1.2)
+    contrast = torch.empty(n, 1, 1, 1).uniform_(0.8, 1.2)
+    mean = images.mean(dim=(1, 2, 3), keepdim=True)
+    return ((images - mean) * contrast + mean * brightness).clamp_(0, 1)
+
+
+class CachedLoader:
+    """
+    Iterates (images, labels) batches from a dataset cache. Batches are gathered
+    from the memmap, converted to float and augmented by `threads` worker threads,
+    `prefetch` batches ahead of the consumer; images are moved to `device` in
+    channels_last layout when requested.
+    """
+    def __init__(self, cache_dir, batch_size=64, shuffle=False, augment=False, device='cpu',
+                 channels_last=False, threads=4, prefetch=4):
+        self.images = np.load(os.path.join(cache_dir, IMAGES_FILE), mmap_mode='r')
+        self.labels = torch.from_numpy(np.load(os.path.join(cache_dir, LABELS_FILE)))
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.augment = augment
+        self.device = device
+        self.channels_last = channels_last
+        self.threads = threads
+        self.prefetch = prefetch
+
+    def __len__(self):
+        return (len(self.labels) + self.batch_size - 1) // self.batch_size
+
+    def _batch(self, indices):
+        indices = np.sort(indices)  # Sequential reads from the memmap
+        images = torch.from_numpy(self.images[indices]).permute(0, 3, 1, 2).float().div_(255)
+        if self.augment:
+            images = augment(images)
+        memory_format = torch.channels_last if self.channels_last else torch.contiguous_format
+        return images.contiguous(memory_format=memory_format), self.labels[indices]
+
+    def __iter__(self):
+        order = np.random.permutation(len(self.labels)) if self.shuffle else np.arange(len(self.labels))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def produce():
+            try:
+                with ThreadPoolExecutor(self.threads) as pool:
+                    pending = queue.Queue()
+                    for indices in batches:
+                        if stop.is_set():
+                            break
+                        pending.put(pool.submit(self._batch, indices))
+                        # Keep at most `threads` batches in flight beyond the ones already handed over
+                        while pending.qsize() >= self.threads:
+                            ready.put(pending.get().result())
+                    while not pending.empty() and not stop.is_set():
+                        ready.put(pending.get().result())
+            except Exception as e:
+                ready.put(e)
+                return
+            ready.put(None)
+
+        producer = threading.Thread(target=produce, name='dataset-cache-loader', daemon=True)
+        producer.start()
+        try:
+            while (batch := ready.get()) is not None:
+                if isinstance(batch, Exception):
+                    raise batch
+                images, labels = batch
+                yield images.to(self.device, non_blocking=True), labels.to(self.device, non_blocking=True)
+        finally:
+            stop.set()
+            while producer.is_alive():  # Unblock the producer if the consumer stopped early
+                try:
+                    ready.get_nowait()
+                except queue.Empty:
+                    producer.join(0.1)
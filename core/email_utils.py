@@ -4,7 +4,9 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils.timezone import now
 from django.conf import settings
+import asyncio
 import logging
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +50,29 @@ def send_detection_report_email(user, crop, disease_name, health_status, message
             sib_api_v3_sdk.ApiClient(configuration)
         )
         api_instance.send_transac_email(send_smtp_email)
-        logger.info(f"Disease report email sent to {user.email}")
+        logger.info("Disease report email sent to %s", user.email)
     except ApiException as e:
-        logger.error(f"Error sending detection report via Brevo to {user.email}: {e}")
+        logger.error("Error sending detection report via Brevo to %s: %s", user.email, e)
+
+
+async def asend_detection_report_email(**kwargs):
+    """
+    Async wrapper around send_detection_report_email: the Brevo SDK call runs on a
+    worker thread so the event loop keeps serving other requests. Errors are logged.
+    """
+    try:
+        await sync_to_async(send_detection_report_email, thread_sensitive=False)(**kwargs)
+    except Exception as e:
+        logger.error("Failed to send detection email: %s", e)
+
+
+# References to fire-and-forget tasks, so they aren't garbage-collected before they finish
+_background_tasks = set()
+
+
+def send_in_background(coroutine):
+    """Schedules `coroutine` on the running event loop without awaiting it."""
+    task = asyncio.ensure_future(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
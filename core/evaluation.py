@@ -0,0 +1,99 @@
+"""
+Streaming evaluation of a classifier over a labelled dataset.
+
+Everything is accumulated on the model's device with vectorized ops (bincount),
+so the loop never syncs to Python per batch; numbers are read back once at the end.
+"""
+import time
+
+import torch
+import torch.nn.functional as F
+
+
+class EvaluationAccumulator:
+    """
+    Accumulates a confusion matrix (rows: true class, columns: predicted class)
+    and reliability-diagram bins for the expected calibration error.
+    """
+    def __init__(self, num_classes, device, calibration_bins=15):
+        self.num_classes = num_classes
+        self.calibration_bins = calibration_bins
+        self.confusion = torch.zeros(num_classes * num_classes, dtype=torch.int64, device=device)
+        self.bin_counts = torch.zeros(calibration_bins, dtype=torch.int64, device=device)
+        self.bin_confidence = torch.zeros(calibration_bins, dtype=torch.float64, device=device)
+        self.bin_correct = torch.zeros(calibration_bins, dtype=torch.float64, device=device)
+
+    def update(self, logits, labels):
+        confidence, preds = F.softmax(logits.float(), dim=1).max(dim=1)
+        self.confusion += torch.bincount(labels * self.num_classes + preds, minlength=self.num_classes ** 2)
+
+        bins = (confidence * self.calibration_bins).long().clamp_(max=self.calibration_bins - 1)
+        correct = (preds == labels).double()
+        self.bin_counts += torch.bincount(bins, minlength=self.calibration_bins)
+        self.bin_confidence += torch.bincount(bins, weights=confidence.double(), minlength=self.calibration_bins)
+        self.bin_correct += torch.bincount(bins, weights=correct, minlength=self.calibration_bins)
+
+    def confusion_matrix(self):
+        return self.confusion.view(self.num_classes, self.num_classes).cpu()
+
+    def expected_calibration_error(self):
+        counts = self.bin_counts.double()
+        total = counts.sum()
+        if not total:
+            return 0.0
+        gaps = (self.bin_confidence - self.bin_correct).abs()  # = count * |avg confidence - accuracy| per bin
+        return float(gaps.sum() / total)
+
+    def metrics(self, class_names):
+        """Returns overall and per-class metrics as plain Python values."""
+        matrix = self.confusion_matrix().double()
+        true_positives = matrix.diag()
+        support = matrix.sum(dim=1)
+        predicted = matrix.sum(dim=0)
+        precision = torch.where(predicted > 0, true_positives / predicted.clamp(min=1), torch.zeros_like(predicted))
+        recall = torch.where(support > 0, true_positives / support.clamp(min=1), torch.zeros_like(support))
+        f1 = torch.where(precision + recall > 0,
+                         2 * precision * recall / (precision + recall).clamp(min=1e-12),
+                         torch.zeros_like(precision))
+        present = support > 0
+        total = support.sum()
+
+        return {
+            'images': int(total),
+            'accuracy': float(true_positives.sum() / total) if total else 0.0,
+            'macro_precision': float(precision[present].mean()) if present.any() else 0.0,
+            'macro_recall': float(recall[present].mean()) if present.any() else 0.0,
+            'macro_f1': float(f1[present].mean()) if present.any() else 0.0,
+            'ece': self.expected_calibration_error(),
+            'per_class': {
+                name: {
+                    'precision': float(precision[i]),
+                    'recall': float(recall[i]),
+                    'f1': float(f1[i]),
+                    'support': int(support[i]),
+                }
+                for i, name in enumerate(class_names)
+            },
+            'confusion_matrix': matrix.long().tolist(),
+        }
+
+
+def evaluate_stream(model, loader, class_names, device, autocast_dtype=None):
+    """
+    Runs `model` over every (images, labels) batch of `loader` and returns its metrics
+    plus throughput (images per second, including data loading).
+    """
+    model.eval()
+    accumulator = EvaluationAccumulator(len(class_names), device)
+    device_type = torch.device(device).type
+
+    start = time.perf_counter()
+    with torch.inference_mode(), torch.autocast(device_type, dtype=autocast_dtype, enabled=autocast_dtype is not None):
+        for images, labels in loader:
+            accumulator.update(model(images.to(device)), labels.to(device))
+    result = accumulator.metrics(class_names)  # Reads the counters back, i.e. waits for the device
+    elapsed = time.perf_counter() - start
+
+    result['seconds'] = elapsed
+    result['images_per_second'] = result['images'] / elapsed if elapsed else 0.0
+    return result
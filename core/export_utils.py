@@ -0,0 +1,73 @@
+import csv
+import logging
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import DiseaseHistory
+
+logger = logging.getLogger(__name__)
+
+# Columns written for every exported DiseaseHistory row (output name -> ORM lookup)
+EXPORT_COLUMNS = {
+    'historyID': 'historyID',
+    'user': 'user',
+    'plant_name': 'plantID__name',
+    'disease_name': 'diseaseID__name',
+    'status': 'status',
+    'date_detected': 'date_detected',
+    'model_version': 'model_version',
+}
+
+# Number of rows fetched from the database cursor per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: returns each written line instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def export_history_rows(start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields DiseaseHistory rows as plain dicts keyed by EXPORT_COLUMNS.
+    Rows are read with values() and a server-side iterator so memory stays flat.
+    """
+    queryset = DiseaseHistory.objects.order_by('historyID')
+    if start_date:
+        queryset = queryset.filter(date_detected__date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date_detected__date__lte=end_date)
+
+    lookups = list(EXPORT_COLUMNS.values())
+    names = list(EXPORT_COLUMNS.keys())
+    for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+
+
+def stream_history_csv(rows):
+    """
+    Yields the CSV header followed by one encoded line per row.
+    """
+    writer = csv.DictWriter(Echo(), fieldnames=list(EXPORT_COLUMNS.keys()))
+    yield writer.writerow(dict(zip(writer.fieldnames, writer.fieldnames)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_history_ndjson(rows):
+    """
+    Yields one JSON document per row, newline-delimited.
+    """
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+# Supported export formats: name -> (content type, stream function)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', stream_history_csv),
+    'ndjson': ('application/x-ndjson', stream_history_ndjson),
+}
@@ -0,0 +1,174 @@
+"""
+Binary fast path for trusted internal callers (e.g. our edge gateways).
+
+FastPredictMiddleware is the first middleware and answers POSTs to FAST_PREDICT_PATH
+itself, skipping the rest of the middleware stack, URL resolution, DRF content
+negotiation, multipart parsing, the upload serializer and the quality gate.
+Nothing is stored and no history is written: callers get the raw top-k.
+
+Request body, by Content-Type:
+    image/jpeg                - JPEG bytes, decoded at reduced scale and resized to 256 x 256
+    application/octet-stream  - an already-resized 256 x 256 x 3 uint8 RGB buffer (row-major), used as is
+Headers: X-Internal-Token (one of FAST_PREDICT_TOKENS), optional X-Client-ID (fair-queueing key),
+X-Priority-Class and the deadline headers. ?k= sets the number of results (default FAST_PREDICT_TOP_K).
+
+Response, by Accept:
+    application/octet-stream  - k little-endian records of (uint16 class index, float32 probability),
+                                best first; the model version is in X-Model-Version
+    anything else             - JSON {"model_version", "top_k": [{"index", "label", "score"}, ...]}
+
+Torch is only imported (through core.predict_views) on the first fast-path request.
+"""
+import hmac
+import io
+import logging
+import struct
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from PIL import Image
+
+from core.admission import AdmissionController, AdmissionRejected, parse_deadline
+from core.scheduler import priority_class
+
+logger = logging.getLogger(__name__)
+
+INPUT_SIZE = 256
+RAW_RGB_BYTES = INPUT_SIZE * INPUT_SIZE * 3
+RESULT_RECORD = struct.Struct('<Hf')
+BINARY_TYPE = 'application/octet-stream'
+
+# In-flight cap of the fast path; no per-client rate limit, the callers are our own gateways
+fast_admission = AdmissionController(max_in_flight=settings.FAST_PREDICT_MAX_IN_FLIGHT, rate=0, burst=0)
+
+
+class FastPathError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def json_response(data, status=200):
+    return HttpResponse(orjson.dumps(data), status=status, content_type='application/json')
+
+
+def authorized(request):
+    token = request.META.get('HTTP_X_INTERNAL_TOKEN', '').encode()
+    # Check every token (constant time) so the response time doesn't reveal which one matched
+    matches = [hmac.compare_digest(token, allowed.encode()) for allowed in settings.FAST_PREDICT_TOKENS]
+    return bool(token) and any(matches)
+
+
+def read_body(request):
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if length > settings.UPLOAD_MAX_BYTES:
+        raise FastPathError(413, f"Body larger than {settings.UPLOAD_MAX_BYTES} bytes.")
+    # Read the stream directly: request.body would apply DATA_UPLOAD_MAX_MEMORY_SIZE meant for forms
+    return request.read(settings.UPLOAD_MAX_BYTES)
+
+
+def decode_rgb(body, content_type):
+    """Returns the 256 x 256 x 3 uint8 RGB pixels of the request body."""
+    if content_type == BINARY_TYPE:
+        if len(body) != RAW_RGB_BYTES:
+            raise FastPathError(400, f"Raw input must be {INPUT_SIZE}x{INPUT_SIZE}x3 uint8 RGB ({RAW_RGB_BYTES} bytes).")
+        return body
+    if content_type != 'image/jpeg':
+        raise FastPathError(415, f"Send image/jpeg or {BINARY_TYPE}.")
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            if image.format != 'JPEG':
+                raise FastPathError(415, "Body is not a JPEG.")
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the image is much larger than the input
+            image.draft('RGB', (INPUT_SIZE, INPUT_SIZE))
+            return image.convert('RGB').resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR).tobytes()
+    except (OSError, Image.DecompressionBombError):
+        raise FastPathError(400, "Body is not a decodable JPEG.")
+
+
+def parse_k(request):
+    try:
+        k = int(request.GET.get('k', settings.FAST_PREDICT_TOP_K))
+    except ValueError:
+        raise FastPathError(400, "k must be an integer.")
+    if not 1 <= k <= settings.FAST_PREDICT_MAX_TOP_K:
+        raise FastPathError(400, f"k must be between 1 and {settings.FAST_PREDICT_MAX_TOP_K}.")
+    return k
+
+
+def encode_result(result, accept):
+    if BINARY_TYPE in accept:
+        body = b''.join(RESULT_RECORD.pack(index, score) for index, score in zip(result['indices'], result['scores']))
+        response = HttpResponse(body, content_type=BINARY_TYPE)
+        response['X-Model-Version'] = result['model_version']
+        return response
+    return json_response({
+        'model_version': result['model_version'],
+        'top_k': [{'index': index, 'label': label, 'score': score}
+                  for index, label, score in zip(result['indices'], result['labels'], result['scores'])],
+    })
+
+
+def fast_predict(request, deadline):
+    rgb = decode_rgb(read_body(request), request.META.get('CONTENT_TYPE', '').split(';')[0].strip())
+    k = parse_k(request)
+
+    from core import predict_views  # Loads torch and the model on first use
+    img_tensor = predict_views.rgb_to_tensor(rgb, INPUT_SIZE)
+    client = f"internal:{request.META.get('HTTP_X_CLIENT_ID', '-')}"
+    result = predict_views.submit_topk(client, priority_class(request, trusted=True), img_tensor, k, deadline).result()
+    return encode_result(result, request.META.get('HTTP_ACCEPT', ''))
+
+
+def handle_fast_predict(request):
+    if request.method != 'POST':
+        return json_response({"error": "Method not allowed."}, status=405)
+    if not authorized(request):
+        return json_response({"error": "Invalid internal token."}, status=401)
+    try:
+        deadline = parse_deadline(request)
+        with fast_admission.admit('internal', deadline):
+            return fast_predict(request, deadline)
+    except AdmissionRejected as e:
+        return e.as_json_response()
+    except FastPathError as e:
+        return json_response({"error": e.message}, status=e.status_code)
+    except Exception as e:
+        logger.error("Fast-path prediction failed: %s", e)
+        return json_response({"error": str(e)}, status=500)
+
+
+class FastPredictMiddleware:
+    """
+    Answers FAST_PREDICT_PATH before any other middleware runs; passes every other request on.
+    Removed from the stack (MiddlewareNotUsed) when no tokens are configured or this
+    process doesn't serve inference. Sync and async capable: under ASGI other requests
+    pass through on the event loop and fast-path requests run on a worker thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.FAST_PREDICT_TOKENS or settings.DEPLOYMENT_ROLE not in ('all', 'inference'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path = settings.FAST_PREDICT_PATH
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path_info == self.path:
+            return handle_fast_predict(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path_info == self.path:
+            return await sync_to_async(handle_fast_predict, thread_sensitive=False)(request)
+        return await self.get_response(request)
@@ -0,0 +1,111 @@
+from rest_framework.exceptions import ValidationError
+
+from .models import DiseaseHistory, FeedbackRating, EditHistory, DeleteHistory, Disease
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer that builds responses from values_list() rows
+    instead of model instances, for large list responses.
+
+    Subclasses declare `fields` as an ordered mapping of output name -> ORM lookup,
+    and may define `transform_<name>(value)` to post-process a column.
+    Supports sparse fieldsets through the `?fields=a,b,c` query parameter.
+    """
+    model = None
+    fields = {}
+
+    def __init__(self, queryset=None, request=None):
+        self.queryset = queryset if queryset is not None else self.model.objects.all()
+        self.request = request
+
+    def get_field_names(self):
+        """Returns the output fields, limited to ?fields= when present."""
+        requested = self.request.query_params.get('fields') if self.request is not None else None
+        if not requested:
+            return list(self.fields)
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}. "
+                                             f"Available: {', '.join(self.fields)}."})
+        return names
+
+    @property
+    def data(self):
+        names = self.get_field_names()
+        lookups = [self.fields[name] for name in names]
+        transforms = [(i, getattr(self, f'transform_{name}'))
+                      for i, name in enumerate(names) if hasattr(self, f'transform_{name}')]
+
+        rows = self.queryset.values_list(*lookups)
+        if not transforms:
+            return [dict(zip(names, row)) for row in rows]
+
+        data = []
+        for row in rows:
+            row = list(row)
+            for i, transform in transforms:
+                row[i] = transform(row[i])
+            data.append(dict(zip(names, row)))
+        return data
+
+
+class DiseaseHistoryValuesSerializer(ValuesSerializer):
+    """Fast read counterpart of DiseaseHistorySerializer."""
+    model = DiseaseHistory
+    fields = {
+        'historyID': 'historyID',
+        'plant_name': 'plantID__name',
+        'disease_name': 'diseaseID__name',
+        'date_detected': 'date_detected',
+        'status': 'status',
+        'model_version': 'model_version',
+        'user': 'user',
+    }
+
+
+class FeedbackRatingValuesSerializer(ValuesSerializer):
+    """Fast read counterpart of FeedbackRatingSerializer."""
+    model = FeedbackRating
+    fields = {
+        'feedbackID': 'feedbackID',
+        'feedbackText': 'feedbackText',
+        'rating': 'rating',
+        'user': 'user',
+    }
+
+
+class EditHistoryValuesSerializer(ValuesSerializer):
+    """Fast read counterpart of EditHistorySerializer."""
+    model = EditHistory
+    fields = {
+        'editID': 'editID',
+        'user': 'user',
+        'history': 'history',
+    }
+
+
+class DeleteHistoryValuesSerializer(ValuesSerializer):
+    """Fast read counterpart of DeleteHistorySerializer."""
+    model = DeleteHistory
+    fields = {
+        'deleteID': 'deleteID',
+        'user': 'user',
+        'history': 'history',
+    }
+
+
+class CropLibraryValuesSerializer(ValuesSerializer):
+    """Fast read counterpart of CropLibrarySerializer."""
+    model = Disease
+    fields = {
+        'plant_name': 'plant__name',
+        'disease_name': 'name',
+        'sample_image_url': 'image',
+    }
+
+    def transform_sample_image_url(self, name):
+        if not name:
+            return None
+        return self.request.build_absolute_uri(Disease._meta.get_field('image').storage.url(name))
@@ -0,0 +1,200 @@
+"""
+Cheap image quality gate, run before preprocessing and inference.
+
+The upload is decoded once into a small thumbnail (JPEGs decode directly at a
+reduced scale via Image.draft), and all checks are vectorized NumPy over that
+thumbnail: resolution (from the header), brightness, exposure clipping,
+Laplacian-variance sharpness and green-vegetation coverage in HSV.
+Every failed check is reported with a stable reason code.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Reason codes returned to clients (and counted in the stats)
+LOW_RESOLUTION = 'low_resolution'
+TOO_DARK = 'too_dark'
+UNDEREXPOSED = 'underexposed'
+OVEREXPOSED = 'overexposed'
+BLURRY = 'blurry'
+NO_VEGETATION = 'no_vegetation'
+UNREADABLE = 'unreadable'
+
+REASON_MESSAGES = {
+    LOW_RESOLUTION: 'The image resolution is too low.',
+    TOO_DARK: 'The image is too dark.',
+    UNDEREXPOSED: 'Too much of the image is crushed to black.',
+    OVEREXPOSED: 'Too much of the image is blown out to white.',
+    BLURRY: 'The image is blurry, please hold the camera steady and focus on the leaf.',
+    NO_VEGETATION: 'No leaf was found in the image, please photograph the affected leaf.',
+    UNREADABLE: 'The image could not be read.',
+}
+
+
+class QualityResult:
+    """
+    Outcome of the quality gate: the failed reason codes (empty when the image passed)
+    and the measured metrics. Truthy when the image passed.
+    """
+    def __init__(self, reasons, metrics):
+        self.reasons = reasons
+        self.metrics = metrics
+
+    def __bool__(self):
+        return not self.reasons
+
+    def as_error(self):
+        """Response body for a rejected image."""
+        return {
+            "error": "Image quality insufficient, please upload a clearer image.",
+            "reasons": [{"code": code, "message": REASON_MESSAGES[code]} for code in self.reasons],
+        }
+
+
+def load_thumbnail(image_file, size):
+    """Returns (original (width, height), RGB uint8 array no larger than size x size)."""
+    with Image.open(image_file) as image:
+        original_size = image.size
+        image.draft('RGB', (size, size))  # JPEG: decode at 1/2, 1/4 or 1/8 scale
+        thumbnail = image.convert('RGB')
+        thumbnail.thumbnail((size, size))
+        return original_size, np.asarray(thumbnail)
+
+
+def laplacian_variance(gray):
+    """Variance of the 4-neighbour Laplacian; low values mean few edges, i.e. blur."""
+    laplacian = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]
+                 - 4 * gray[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+def vegetation_mask(rgb, hue_range, min_saturation, min_value):
+    """Pixels whose HSV hue lies in `hue_range` (degrees) and that are saturated and bright enough."""
+    rgb = rgb.astype(np.float32) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    delta = value - rgb.min(axis=-1)
+    saturation = np.divide(delta, value, out=np.zeros_like(value), where=value > 0)
+
+    safe_delta = np.where(delta > 0, delta, 1)
+    hue = np.select(
+        [value == r, value == g],
+        [(g - b) / safe_delta % 6, (b - r) / safe_delta + 2],
+        (r - g) / safe_delta + 4,
+    ) * 60
+
+    return ((delta > 0) & (hue >= hue_range[0]) & (hue <= hue_range[1])
+            & (saturation >= min_saturation) & (value >= min_value))
+
+
+def vegetation_coverage(rgb, hue_range, min_saturation, min_value):
+    """Fraction of vegetation pixels (see vegetation_mask)."""
+    return float(vegetation_mask(rgb, hue_range, min_saturation, min_value).mean())
+
+
+class QualityGate:
+    """
+    Runs the thumbnail checks against configured thresholds and counts rejections per reason.
+    """
+    def __init__(self, thumbnail_size, min_resolution, min_brightness, max_clipped_fraction,
+                 min_sharpness, min_vegetation_coverage, vegetation_hue_range,
+                 vegetation_min_saturation, vegetation_min_value):
+        self.thumbnail_size = thumbnail_size
+        self.min_resolution = min_resolution
+        self.min_brightness = min_brightness
+        self.max_clipped_fraction = max_clipped_fraction
+        self.min_sharpness = min_sharpness
+        self.min_vegetation_coverage = min_vegetation_coverage
+        self.vegetation_hue_range = vegetation_hue_range
+        self.vegetation_min_saturation = vegetation_min_saturation
+        self.vegetation_min_value = vegetation_min_value
+        self.checked = 0
+        self.rejections = {code: 0 for code in REASON_MESSAGES}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            thumbnail_size=settings.IMAGE_QUALITY_THUMBNAIL_SIZE,
+            min_resolution=settings.IMAGE_QUALITY_MIN_RESOLUTION,
+            min_brightness=settings.IMAGE_QUALITY_MIN_BRIGHTNESS,
+            max_clipped_fraction=settings.IMAGE_QUALITY_MAX_CLIPPED_FRACTION,
+            min_sharpness=settings.IMAGE_QUALITY_MIN_SHARPNESS,
+            min_vegetation_coverage=settings.IMAGE_QUALITY_MIN_VEGETATION_COVERAGE,
+            vegetation_hue_range=settings.IMAGE_QUALITY_VEGETATION_HUE_RANGE,
+            vegetation_min_saturation=settings.IMAGE_QUALITY_VEGETATION_MIN_SATURATION,
+            vegetation_min_value=settings.IMAGE_QUALITY_VEGETATION_MIN_VALUE,
+        )
+
+    def measure(self, image_file):
+        """Returns the quality metrics of an image file (path or file object)."""
+        (width, height), rgb = load_thumbnail(image_file, self.thumbnail_size)
+        gray = rgb.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        return {
+            'width': width,
+            'height': height,
+            'brightness': float(gray.mean()),
+            'dark_fraction': float((gray <= 5).mean()),
+            'bright_fraction': float((gray >= 250).mean()),
+            'sharpness': laplacian_variance(gray),
+            'vegetation_coverage': vegetation_coverage(
+                rgb, self.vegetation_hue_range, self.vegetation_min_saturation, self.vegetation_min_value
+            ),
+        }
+
+    def check(self, image_file):
+        """Runs all checks and returns a QualityResult."""
+        try:
+            metrics = self.measure(image_file)
+        except Exception as e:
+            logger.warning("Failed to read image for quality checks: %s", e)
+            return self._record(QualityResult([UNREADABLE], {}))
+
+        reasons = []
+        if metrics['width'] < self.min_resolution[0] or metrics['height'] < self.min_resolution[1]:
+            reasons.append(LOW_RESOLUTION)
+        if metrics['brightness'] < self.min_brightness:
+            reasons.append(TOO_DARK)
+        if metrics['dark_fraction'] > self.max_clipped_fraction:
+            reasons.append(UNDEREXPOSED)
+        if metrics['bright_fraction'] > self.max_clipped_fraction:
+            reasons.append(OVEREXPOSED)
+        if metrics['sharpness'] < self.min_sharpness:
+            reasons.append(BLURRY)
+        if metrics['vegetation_coverage'] < self.min_vegetation_coverage:
+            reasons.append(NO_VEGETATION)
+        return self._record(QualityResult(reasons, metrics))
+
+    def _record(self, result):
+        with self._lock:
+            self.checked += 1
+            for code in result.reasons:
+                self.rejections[code] += 1
+        return result
+
+    def stats(self):
+        return {'checked': self.checked, 'rejections': dict(self.rejections)}
+
+
+# Quality gate shared by the predict views of this worker process
+quality_gate = QualityGate.from_settings()
+
+
+def store_upload(image, check_quality=True):
+    """
+    Runs the quality gate on an uploaded image and, if it passes, stores it under detection/.
+    Returns (quality result, stored filename or None).
+    `check_quality=False` stores the image unchecked (the result is then an empty pass).
+    """
+    quality = quality_gate.check(image) if check_quality else QualityResult([], {})
+    if not quality:
+        logger.warning("Image quality insufficient: %s (%s)", image.name, ', '.join(quality.reasons))
+        return quality, None
+    image.seek(0)
+    return quality, default_storage.save(f"detection/{image.name}", image)
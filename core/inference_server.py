@@ -0,0 +1,190 @@
+"""
+Standalone inference servers (the run_inference_server command).
+
+A server owns the model and serves forwards to the web workers on this host over
+a Unix socket. Each client connection creates one shared-memory segment and
+announces it once; for every request the client writes the preprocessed float32
+tensor into the segment and sends a small length-prefixed JSON header (shape,
+priority, deadline). The server wraps the segment in a tensor without copying,
+runs the forward and replies with the predicted class, the model version and its
+current load, which clients use for least-loaded routing (see
+core.model_utils.RemoteInferenceClient).
+
+Messages (4-byte big-endian length + JSON):
+    {'op': 'attach', 'name': <segment>}              -> {'ok': true}
+    {'op': 'predict', 'shape': [...], 'client': ..., 'priority': ..., 'deadline': ...,
+     'top_k': k or null, 'batch': bool}
+        -> {'prediction': ..., 'model_version': ..., 'load': n}
+         | {'model_version': ..., 'indices': [...], 'labels': [...], 'scores': [...], 'load': n}  (top_k)
+         | {'model_version': ..., 'labels': [...], 'scores': [...], 'disease_scores': [...], 'load': n}  (batch)
+         | {'rejected': {'status_code', 'reason', 'message', 'retry_after'}, 'load': n}
+         | {'error': ..., 'load': n}
+    {'op': 'stats'}                                  -> server stats
+"""
+import json
+import logging
+import math
+import os
+import socket
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import torch
+
+from core.admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('!I')
+
+
+def recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError('Inference socket closed')
+        received += count
+    return buffer
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    (size,) = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    return json.loads(recv_exactly(sock, size))
+
+
+def attach_shared_memory(name):
+    """Opens a segment created by a client without adopting it (the client unlinks it)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        # Otherwise this process's resource tracker would unlink it (and warn) at exit
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+def shared_tensor(segment, shape):
+    """A float32 tensor of `shape` backed by the segment's memory (no copy)."""
+    return torch.frombuffer(segment.buf, dtype=torch.float32, count=math.prod(shape)).view(shape)
+
+
+class InferenceServer:
+    """
+    Accepts connections on `path`, one thread per connection.
+    `forward(client, priority, image_tensor, deadline, top_k, batch)` returns the reply fields as a dict;
+    the tensor is only valid until it returns, since the client reuses the segment.
+    """
+    def __init__(self, path, forward, stats=None):
+        self.path = path
+        self.forward = forward
+        self.extra_stats = stats
+        self.in_flight = 0
+        self.connections = 0
+        self.served = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)  # Left behind by a server that didn't shut down cleanly
+        else:
+            raise RuntimeError(f"Another inference server is listening on {self.path}")
+        finally:
+            probe.close()
+
+    def serve_forever(self):
+        self._remove_stale_socket()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        os.chmod(self.path, 0o660)
+        listener.listen(128)
+        logger.info("Inference server listening on %s", self.path)
+        try:
+            while True:
+                conn, _ = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,),
+                                 name='inference-connection', daemon=True).start()
+        finally:
+            listener.close()
+            os.unlink(self.path)
+
+    def _serve_connection(self, conn):
+        segment = None
+        with self._lock:
+            self.connections += 1
+        try:
+            while True:
+                try:
+                    message = recv_message(conn)
+                except ConnectionError:
+                    return
+                if message['op'] == 'attach':
+                    self._close_segment(segment)
+                    segment = attach_shared_memory(message['name'])
+                    send_message(conn, {'ok': True})
+                elif message['op'] == 'predict':
+                    send_message(conn, self._predict(segment, message))
+                elif message['op'] == 'stats':
+                    send_message(conn, self.stats())
+                else:
+                    send_message(conn, {'error': f"Unknown op {message['op']!r}"})
+        except Exception as e:
+            logger.error("Inference connection failed: %s", e)
+        finally:
+            conn.close()
+            self._close_segment(segment)
+            with self._lock:
+                self.connections -= 1
+
+    def _close_segment(self, segment):
+        if segment is None:
+            return
+        try:
+            segment.close()
+        except BufferError:  # A tensor view is still referenced somewhere; freed with it
+            logger.warning("Shared memory segment %s still in use at disconnect", segment.name)
+
+    def _predict(self, segment, message):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            image_tensor = shared_tensor(segment, message['shape'])
+            reply = self.forward(message['client'], message['priority'], image_tensor,
+                                 message.get('deadline'), message.get('top_k'), message.get('batch', False))
+            self.served += 1
+        except AdmissionRejected as e:
+            reply = {'rejected': {'status_code': e.status_code, 'reason': e.reason,
+                                  'message': e.message, 'retry_after': e.retry_after}}
+        except Exception as e:
+            self.failed += 1
+            logger.error("Remote forward failed: %s", e)
+            reply = {'error': str(e)}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        reply['load'] = self.in_flight
+        return reply
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'connections': self.connections,
+            'in_flight': self.in_flight,
+            'served': self.served,
+            'failed': self.failed,
+            **(self.extra_stats() if self.extra_stats else {}),
+        }
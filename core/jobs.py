@@ -0,0 +1,234 @@
+"""
+Asynchronous prediction jobs.
+
+Web workers store the upload, create a PredictionJob row and hand its ID to a
+broker; inference workers (the run_prediction_worker command) claim jobs from
+the broker, run them and store the result on the row, where clients poll for
+it or get it POSTed to their callback URL.
+
+The row is always the source of truth: a job is claimed with a conditional
+UPDATE (queued -> running), so a job delivered twice still runs once, and the
+sweeper re-queues jobs whose worker died and expires old ones.
+
+Brokers:
+    'database' - workers poll the PredictionJob table (default, no extra services)
+    'redis'    - job IDs go through a Redis list, so idle workers block instead of polling
+"""
+import ipaddress
+import json
+import logging
+import os
+import socket
+import time
+import urllib.request
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import PredictionJob
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseBroker:
+    """Uses the queued PredictionJob rows as the queue, oldest first."""
+    def enqueue(self, job):
+        pass  # The queued row is the message
+
+    def next_job_id(self, timeout):
+        """
+        Returns the oldest queued job ID, or None after waiting `timeout` seconds.
+        Idle threads all get the same ID; claim_job() lets one of them have it.
+        """
+        job_id = (PredictionJob.objects.filter(status=PredictionJob.QUEUED)
+                  .order_by('created_at').values_list('jobID', flat=True).first())
+        if job_id is None:
+            time.sleep(timeout)
+        return job_id
+
+
+class RedisBroker:
+    """Pushes job IDs to a Redis list; workers block on BRPOP."""
+    def __init__(self, url, key):
+        import redis  # Optional dependency, only needed with PREDICTION_JOB_BROKER = 'redis'
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+
+    def enqueue(self, job):
+        self.client.lpush(self.key, str(job.jobID))
+
+    def next_job_id(self, timeout):
+        """Returns the next published job ID, or None if none arrived within `timeout` seconds."""
+        item = self.client.brpop(self.key, timeout=max(1, int(timeout)))
+        return item[1].decode() if item else None
+
+
+def get_broker():
+    if settings.PREDICTION_JOB_BROKER == 'redis':
+        return RedisBroker(settings.PREDICTION_JOB_REDIS_URL, settings.PREDICTION_JOB_REDIS_KEY)
+    return DatabaseBroker()
+
+
+def submit_job(user, image_name, image_url, priority, callback_url='', broker=None):
+    """Creates a queued job for a stored upload and publishes it. Returns the job."""
+    job = PredictionJob.objects.create(
+        user=user,
+        image_name=image_name,
+        image_url=image_url,
+        priority=priority,
+        callback_url=callback_url,
+        expires_at=timezone.now() + timedelta(seconds=settings.PREDICTION_JOB_QUEUE_TIMEOUT),
+    )
+    (broker or get_broker()).enqueue(job)
+    logger.info("Queued prediction job %s for user %s", job.jobID, user.pk)
+    return job
+
+
+def claim_job(job_id, worker):
+    """Moves a job from queued to running for `worker`. Returns the job, or None if another worker got it."""
+    claimed = PredictionJob.objects.filter(jobID=job_id, status=PredictionJob.QUEUED).update(
+        status=PredictionJob.RUNNING, worker=worker, started_at=timezone.now(), attempts=models.F('attempts') + 1,
+    )
+    return PredictionJob.objects.select_related('user').get(jobID=job_id) if claimed else None
+
+
+def finish_job(job, worker, result=None, error=''):
+    """
+    Stores the result (or error) of a job `worker` is running and schedules its deletion.
+    Conditional UPDATE: returns False, changing nothing, when this claim of the job is no
+    longer current (the sweeper re-queued it and another claim, possibly by another thread
+    of the same worker, owns it now). Each claim increments `attempts`, which identifies it.
+    """
+    now = timezone.now()
+    fields = {
+        'status': PredictionJob.FAILED if error else PredictionJob.SUCCEEDED,
+        'result': result,
+        'error': error,
+        'finished_at': now,
+        'expires_at': now + timedelta(seconds=settings.PREDICTION_JOB_RESULT_TTL),
+    }
+    finished = PredictionJob.objects.filter(
+        jobID=job.jobID, status=PredictionJob.RUNNING, worker=worker, attempts=job.attempts
+    ).update(**fields)
+    if not finished:
+        logger.warning("Prediction job %s was taken over by another worker, dropping this result", job.jobID)
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return True
+
+
+def job_payload(job, request=None):
+    """Client-facing representation of a job, including timings in milliseconds."""
+    def elapsed_ms(start, end):
+        return round((end - start).total_seconds() * 1000, 1) if start and end else None
+
+    payload = {
+        'job_id': str(job.jobID),
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'queued_ms': elapsed_ms(job.created_at, job.started_at),
+        'run_ms': elapsed_ms(job.started_at, job.finished_at),
+        'expires_at': job.expires_at,
+    }
+    if job.status == PredictionJob.SUCCEEDED:
+        payload['result'] = job.result
+    elif job.status in (PredictionJob.FAILED, PredictionJob.EXPIRED):
+        payload['error'] = job.error
+    return payload
+
+
+def callback_allowed(url):
+    """
+    Callback URLs must be http(s) on one of PREDICTION_JOB_CALLBACK_HOSTS.
+    Callbacks are disabled while that list is empty.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False
+    return parsed.hostname.lower() in settings.PREDICTION_JOB_CALLBACK_HOSTS
+
+
+def resolves_to_public_addresses(url):
+    """
+    True when every address the URL's host resolves to is a public unicast address,
+    so an allowed host name can't be pointed at loopback, link-local (cloud metadata)
+    or private services.
+    """
+    parsed = urlparse(url)
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        return False
+    addresses = {ipaddress.ip_address(info[4][0].split('%')[0]) for info in infos}
+    return bool(addresses) and all(address.is_global and not address.is_multicast for address in addresses)
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Refuses redirects, which could otherwise lead a checked callback to an internal address."""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+callback_opener = urllib.request.build_opener(NoRedirectHandler)
+
+
+def send_callback(job):
+    """POSTs the job payload to its callback URL. Failures are logged; clients can still poll."""
+    if not callback_allowed(job.callback_url) or not resolves_to_public_addresses(job.callback_url):
+        logger.warning("Callback for job %s to %s refused: host not allowed or not public",
+                       job.jobID, job.callback_url)
+        return
+    body = json.dumps(job_payload(job), default=str).encode()
+    request = urllib.request.Request(job.callback_url, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with callback_opener.open(request, timeout=settings.PREDICTION_JOB_CALLBACK_TIMEOUT) as response:
+            logger.info("Callback for job %s returned %s", job.jobID, response.status)
+    except (OSError, ValueError) as e:
+        logger.warning("Callback for job %s to %s failed: %s", job.jobID, job.callback_url, e)
+
+
+def sweep_jobs():
+    """
+    Expires jobs that waited too long, re-queues (or fails) running jobs whose worker
+    stopped responding, and deletes jobs past their retention. Returns the counts.
+    """
+    now = timezone.now()
+    expired = PredictionJob.objects.filter(status=PredictionJob.QUEUED, expires_at__lte=now).update(
+        status=PredictionJob.EXPIRED, error='Job expired before a worker picked it up.', finished_at=now,
+        expires_at=now + timedelta(seconds=settings.PREDICTION_JOB_RESULT_TTL),
+    )
+
+    stale = now - timedelta(seconds=settings.PREDICTION_JOB_RUNNING_TIMEOUT)
+    running = PredictionJob.objects.filter(status=PredictionJob.RUNNING, started_at__lte=stale)
+    failed = running.filter(attempts__gte=settings.PREDICTION_JOB_MAX_ATTEMPTS).update(
+        status=PredictionJob.FAILED, error='Job failed after repeated worker timeouts.', finished_at=now,
+        expires_at=now + timedelta(seconds=settings.PREDICTION_JOB_RESULT_TTL),
+    )
+    requeue_ids = list(running.values_list('jobID', flat=True))
+    requeued = PredictionJob.objects.filter(jobID__in=requeue_ids, status=PredictionJob.RUNNING).update(
+        status=PredictionJob.QUEUED, worker='', started_at=None,
+    )
+    if requeued and settings.PREDICTION_JOB_BROKER == 'redis':
+        broker = get_broker()
+        for job in PredictionJob.objects.filter(jobID__in=requeue_ids, status=PredictionJob.QUEUED):
+            broker.enqueue(job)
+
+    deleted, _ = PredictionJob.objects.filter(
+        status__in=[PredictionJob.SUCCEEDED, PredictionJob.FAILED, PredictionJob.EXPIRED], expires_at__lte=now
+    ).delete()
+    counts = {'expired': expired, 'failed': failed, 'requeued': requeued, 'deleted': deleted}
+    if any(counts.values()):
+        logger.info("Swept prediction jobs: %s", counts)
+    return counts
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
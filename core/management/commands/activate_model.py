@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.model_registry import activate_version, list_versions
+
+
+class Command(BaseCommand):
+    help = 'Activate a registered model version; workers hot-swap to it on their next poll or SIGHUP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', help='Registered version to activate')
+
+    def handle(self, *args, **options):
+        version = options['version']
+        if version not in list_versions():
+            raise CommandError(f"Unknown model version '{version}'. Registered: {', '.join(list_versions()) or 'none'}")
+        activate_version(version)
+        self.stdout.write(self.style.SUCCESS(f'Activated model version {version}.'))
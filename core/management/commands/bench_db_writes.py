@@ -0,0 +1,79 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction, OperationalError
+
+from core.models import Plant, DiseaseHistory
+
+
+class Command(BaseCommand):
+    help = ('Benchmark concurrent DiseaseHistory inserts against the local SQLite database. '
+            'Run once per DJANGO_DB_PROFILE (e.g. sqlite vs. sqlite-wal) to compare write contention.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--inserts', type=int, default=200, help='Inserts per thread')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"bench_db_writes targets SQLite, but the default database is {connection.vendor}.")
+
+        threads, inserts = options['threads'], options['inserts']
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+
+        user = get_user_model().objects.create(
+            email='bench-db-writes@example.com', phone_no='bench-db-writes', region='bench'
+        )
+        plant, _ = Plant.objects.get_or_create(name='Bench')
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def writer():
+            local_latencies, local_errors = [], []
+            barrier.wait()
+            for _ in range(inserts):
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        DiseaseHistory.objects.create(user=user, plantID=plant, status='Healthy')
+                    local_latencies.append(time.perf_counter() - start)
+                except OperationalError as e:  # e.g. "database is locked"
+                    local_errors.append(str(e))
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+        try:
+            workers = [threading.Thread(target=writer) for _ in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            user.delete()  # Cascades to the benchmark DiseaseHistory rows
+
+        self.stdout.write(f"Profile: {settings.DB_PROFILE} (journal_mode={journal_mode})")
+        self.stdout.write(f"Writers: {threads} x {inserts} inserts in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput: {len(latencies) / elapsed:.1f} inserts/s")
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"Latency: p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p99 {p99 * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"Failed inserts: {len(errors)} (first: {errors[0]})"))
+        else:
+            self.stdout.write(self.style.SUCCESS('All inserts succeeded.'))
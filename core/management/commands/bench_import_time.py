@@ -0,0 +1,66 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker imports before serving its first request: settings, apps, the WSGI handler and the URLconf
+STARTUP_SCRIPT = (
+    "import django; django.setup(); "
+    "from django.core.handlers.wsgi import WSGIHandler; WSGIHandler(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_import_time(stderr):
+    """Parses `python -X importtime` output into [(module, self_us, cumulative_us, depth)]."""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+class Command(BaseCommand):
+    help = ('Measure worker start-up imports with `python -X importtime` for a DEPLOYMENT_ROLE, '
+            'and fail when the budget is exceeded or a forbidden module (e.g. torch) is imported')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', choices=['all', 'api', 'inference'], default='api')
+        parser.add_argument('--max-ms', type=float, help='Fail if total import time exceeds this many milliseconds')
+        parser.add_argument('--forbid', action='append',
+                            help="Top-level module that must not be imported (default for the 'api' role: torch, torchvision)")
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest top-level imports to list')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DEPLOYMENT_ROLE': options['role'],
+               'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'plant_disease.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Start-up script failed:\n{result.stderr[-2000:]}")
+
+        entries = parse_import_time(result.stderr)
+        total_ms = sum(self_us for _, self_us, _, _ in entries) / 1000
+        imported = {module.split('.')[0] for module, _, _, _ in entries}
+
+        self.stdout.write(f"Role: {options['role']}  modules: {len(entries)}  total import time: {total_ms:.1f} ms")
+        top_level = sorted((e for e in entries if e[3] == 0), key=lambda e: e[2], reverse=True)
+        for module, _, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:>9.1f} ms  {module}")
+
+        forbidden = options['forbid'] or (['torch', 'torchvision'] if options['role'] == 'api' else [])
+        failures = [f"{module} was imported" for module in forbidden if module in imported]
+        if options['max_ms'] is not None and total_ms > options['max_ms']:
+            failures.append(f"total import time {total_ms:.1f} ms exceeds the {options['max_ms']:.1f} ms budget")
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Import budget OK.'))
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.fast_serializers import DiseaseHistoryValuesSerializer
+from core.models import Plant, DiseaseHistory
+from core.renderers import ORJSONRenderer
+from core.serializers import DiseaseHistorySerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DiseaseHistory list serialization: ModelSerializer + JSONRenderer vs values() + orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of DiseaseHistory rows to serialize')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant; the best run is reported')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+
+        # All benchmark rows are created inside a transaction that is rolled back
+        with transaction.atomic():
+            user = get_user_model().objects.create(
+                email='bench-serializers@example.com', phone_no='bench-serializers', region='bench'
+            )
+            plant, _ = Plant.objects.get_or_create(name='Bench')
+            DiseaseHistory.objects.bulk_create(
+                [DiseaseHistory(user=user, plantID=plant, status='Healthy') for _ in range(rows)],
+                batch_size=1000,
+            )
+            queryset = DiseaseHistory.objects.filter(user=user)
+
+            def model_serializer():
+                # Same path the list view used before the values() serializers
+                return JSONRenderer().render(DiseaseHistorySerializer(queryset.all(), many=True).data)
+
+            def values_serializer():
+                return ORJSONRenderer().render(DiseaseHistoryValuesSerializer(queryset).data)
+
+            results = {}
+            for name, func in (('ModelSerializer + JSONRenderer', model_serializer),
+                               ('values() + ORJSONRenderer', values_serializer)):
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - start)
+                results[name] = min(timings)
+
+            transaction.set_rollback(True)
+
+        per_10k = 10000 / rows
+        baseline = results['ModelSerializer + JSONRenderer']
+        for name, seconds in results.items():
+            self.stdout.write(
+                f"{name:<32} {seconds * 1000:9.1f} ms total  "
+                f"{seconds * per_10k * 1000:9.1f} ms / 10k rows  "
+                f"{baseline / seconds:5.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Serialized {rows} rows, best of {repeat} runs.'))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.model_utils import device, load_model
+from core.model_variants import save_variant_metrics
+from core.training_utils import (
+    DeviceLoader, count_flops, data_loader, evaluate, image_folder_dataset, measure_latency,
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure latency (and optionally accuracy) of the active model at each input-size variant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--val-dir', help='Validation ImageFolder for measuring accuracy per variant '
+                                              '(smaller variants are only served once their accuracy is measured)')
+        parser.add_argument('--runs', type=int, default=30, help='Timed single-image forwards per variant')
+        parser.add_argument('--batch-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        model = load_model()
+        metrics = {}
+
+        for size in settings.MODEL_VARIANT_SIZES:
+            metrics[size] = {
+                'latency_ms': round(measure_latency(model, size, options['runs']) * 1000, 2),
+                'mmacs': round(count_flops(model, size) / 1e6, 1),
+            }
+            if options['val_dir']:
+                loader = DeviceLoader(data_loader(image_folder_dataset(options['val_dir'], size=size),
+                                                  options['batch_size']), device)
+                metrics[size]['accuracy'] = round(float(evaluate(model, loader)['val_accuracy']), 4)
+
+            self.stdout.write(f"{size:>4}px  " + '  '.join(f"{k}={v}" for k, v in metrics[size].items()))
+
+        save_variant_metrics(metrics)
+        self.stdout.write(self.style.SUCCESS(f'Saved variant metrics to {settings.MODEL_VARIANTS_FILE}'))
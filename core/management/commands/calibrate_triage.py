@@ -0,0 +1,74 @@
+import json
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cascade import TRIAGE_INPUT_SIZE, is_healthy, load_triage, save_triage
+from core.model_architecture import ResNet9
+from core.model_utils import classes, device
+from core.training_utils import count_flops, data_loader, image_folder_dataset
+
+
+class Command(BaseCommand):
+    help = ('Pick the triage confidence threshold on a validation set and report the '
+            'precision / compute trade-off of the cascade')
+
+    def add_arguments(self, parser):
+        parser.add_argument('val_dir', help='Validation ImageFolder (sub-folders named as in core.model_utils.classes)')
+        parser.add_argument('--target-precision', type=float, default=0.995,
+                            help='Minimum accuracy of the answers the triage stage returns on its own')
+        parser.add_argument('--max-diseased-leak', type=float, default=0.002,
+                            help='Maximum fraction of diseased leaves allowed to be answered as healthy')
+        parser.add_argument('--batch-size', type=int, default=128)
+        parser.add_argument('--dry-run', action='store_true', help="Report only, don't save the threshold")
+
+    def handle(self, *args, **options):
+        cascade = load_triage(classes, device)
+        if cascade is None:
+            raise CommandError('No triage model found; run train_triage first.')
+
+        confidences, indices, labels = [], [], []
+        loader = data_loader(image_folder_dataset(options['val_dir']), options['batch_size'])
+        for images, targets in loader:
+            confidence, index = cascade.scores(images)
+            confidences.append(confidence.cpu())
+            indices.append(index.cpu())
+            labels.append(targets)
+        confidences, indices, labels = torch.cat(confidences), torch.cat(indices), torch.cat(labels)
+
+        true_names = [classes[i] for i in labels.tolist()]
+        diseased = torch.tensor([not is_healthy(name) for name in true_names])
+        total, total_diseased = len(true_names), max(1, int(diseased.sum()))
+
+        triage_flops = count_flops(cascade.model, TRIAGE_INPUT_SIZE)
+        full_flops = count_flops(ResNet9(3, len(classes)))
+
+        rows, chosen = [], None
+        thresholds = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99, 0.995, 0.999]
+        for threshold in thresholds:
+            answers = [cascade.resolve(c, i, threshold) for c, i in zip(confidences.tolist(), indices.tolist())]
+            shortcut = torch.tensor([answer is not None for answer in answers])
+            correct = torch.tensor([answer == name for answer, name in zip(answers, true_names)])
+
+            coverage = shortcut.float().mean().item()
+            precision = (correct.sum() / shortcut.sum()).item() if shortcut.any() else 1.0
+            leak = (shortcut & diseased).sum().item() / total_diseased
+            relative_compute = (triage_flops + (1 - coverage) * full_flops) / full_flops
+            rows.append((threshold, coverage, precision, leak, relative_compute))
+
+            if chosen is None and precision >= options['target_precision'] and leak <= options['max_diseased_leak']:
+                chosen = threshold
+
+        self.stdout.write(f"{total} validation images, triage {triage_flops / 1e6:.1f} MMACs vs "
+                          f"full model {full_flops / 1e6:.1f} MMACs")
+        self.stdout.write(f"{'threshold':>9} {'shortcut':>9} {'precision':>9} {'dis.leak':>9} {'compute':>8}")
+        for threshold, coverage, precision, leak, relative_compute in rows:
+            marker = '  <- chosen' if threshold == chosen else ''
+            self.stdout.write(f"{threshold:>9.3f} {coverage:>9.2%} {precision:>9.4f} {leak:>9.4f} "
+                              f"{relative_compute:>8.2%}{marker}")
+
+        if chosen is None:
+            raise CommandError('No threshold meets the precision / leak targets; the cascade would hurt accuracy.')
+        if not options['dry_run']:
+            save_triage(cascade.model, cascade.crops, chosen)
+        self.stdout.write(self.style.SUCCESS(json.dumps({'threshold': chosen})))
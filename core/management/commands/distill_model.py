@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from core.model_registry import ModelHandle, register_artifact
+from core.model_utils import device
+from core.pruning import prune_resnet9
+from core.training_utils import (
+    DeviceLoader, count_flops, count_parameters, data_loader, evaluate, fit_one_cycle,
+    image_folder_dataset, measure_latency,
+)
+
+
+@torch.no_grad()
+def top1_agreement(student, teacher, loader):
+    """Fraction of images on which the student's top-1 matches the teacher's."""
+    student.eval()
+    agreed = total = 0
+    for images, _ in loader:
+        agreed += (student(images).argmax(dim=1) == teacher(images).argmax(dim=1)).sum()
+        total += len(images)
+    return float(agreed) / total if total else 0.0
+
+
+class Command(BaseCommand):
+    help = ('Prune channels of the active ResNet9 and distill it into a compact student, '
+            'then register the student as a new model version')
+
+    def add_arguments(self, parser):
+        parser.add_argument('train_dir', help="ImageFolder with one sub-folder per class (named as in the teacher's manifest)")
+        parser.add_argument('val_dir', help='Validation ImageFolder with the same layout')
+        parser.add_argument('version', help='Registry version name for the student')
+        parser.add_argument('--prune-ratio', type=float, default=0.5, help='Fraction of channels removed per ConvBlock')
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--max-lr', type=float, default=0.005)
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--temperature', type=float, default=4.0)
+        parser.add_argument('--alpha', type=float, default=0.7, help='Weight of the distillation loss vs. cross entropy')
+        parser.add_argument('--runs', type=int, default=30, help='Timed single-image forwards for the latency report')
+        parser.add_argument('--activate', action='store_true', help='Make the student the active version')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['prune_ratio'] < 1:
+            raise CommandError('--prune-ratio must be in [0, 1).')
+
+        loaded = ModelHandle(device).load()
+        teacher, class_names = loaded.model, loaded.classes
+        for param in teacher.parameters():
+            param.requires_grad_(False)
+        student = prune_resnet9(teacher, options['prune_ratio'])
+        self.stdout.write(f"Student widths: {list(student.widths)} (teacher {list(teacher.widths)})")
+
+        # Label images in the teacher's class order; the student is registered with the same classes
+        try:
+            train_set = image_folder_dataset(options['train_dir'], class_names=class_names)
+            val_set = image_folder_dataset(options['val_dir'], class_names=class_names)
+        except ValueError as e:
+            raise CommandError(f"{e} (teacher version {loaded.version})")
+        train_loader = DeviceLoader(data_loader(train_set, options['batch_size'], shuffle=True), device)
+        val_loader = DeviceLoader(data_loader(val_set, options['batch_size']), device)
+
+        temperature, alpha = options['temperature'], options['alpha']
+        fit_one_cycle(
+            options['epochs'], options['max_lr'], student, train_loader, val_loader,
+            train_step=lambda batch: student.distillation_step(batch, teacher, temperature, alpha),
+        )
+        student.eval()
+
+        report = {}
+        for name, model in (('teacher', teacher), ('student', student)):
+            report[name] = {
+                'params': count_parameters(model),
+                'mmacs': count_flops(model) / 1e6,
+                'latency_ms': measure_latency(model, runs=options['runs']) * 1000,
+                'top1': float(evaluate(model, val_loader)['val_accuracy']),
+            }
+            self.stdout.write(
+                f"{name:>8}: {report[name]['params']:>10,} params  {report[name]['mmacs']:>8.1f} MMACs  "
+                f"{report[name]['latency_ms']:>7.2f} ms  top-1 {report[name]['top1']:.4f}"
+            )
+        self.stdout.write(
+            f"Speed-up {report['teacher']['latency_ms'] / report['student']['latency_ms']:.2f}x, "
+            f"top-1 delta {report['student']['top1'] - report['teacher']['top1']:+.4f}, "
+            f"agreement with teacher {top1_agreement(student, teacher, val_loader):.4f}"
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            weights_path = os.path.join(tmp_dir, 'plant-disease-model.pth')
+            torch.save(student.cpu().state_dict(), weights_path)
+            try:
+                manifest = register_artifact(
+                    weights_path, options['version'], class_names,
+                    architecture={'name': 'ResNet9', 'in_channels': 3, 'widths': list(student.widths)},
+                    activate=options['activate'],
+                )
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered student as model version {manifest['version']}"
+            + (' and activated it.' if options['activate'] else '.')
+        ))
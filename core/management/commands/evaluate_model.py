@@ -0,0 +1,57 @@
+import json
+import os
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dataset_cache import CachedLoader, build_cache, cache_dir_for
+from core.evaluation import evaluate_stream
+from core.model_registry import ModelHandle, load_version
+from core.model_utils import classes, device
+from core.training_utils import data_loader, image_folder_dataset
+
+
+class Command(BaseCommand):
+    help = ('Evaluate a model version on a labelled ImageFolder: confusion matrix, per-class '
+            'precision/recall/F1, calibration error and throughput, as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('data_dir', help='ImageFolder with one sub-folder per class (named as in core.model_utils.classes)')
+        parser.add_argument('--version', help='Registry version to evaluate (default: the active model)')
+        parser.add_argument('--size', type=int, default=256, help='Input resolution')
+        parser.add_argument('--batch-size', type=int, default=128)
+        parser.add_argument('--cache', action='store_true',
+                            help='Read images from the decoded uint8 dataset cache (built on first use)')
+        parser.add_argument('--bf16', action='store_true', help='Run under bfloat16 autocast')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            loaded = load_version(options['version'], device) if options['version'] else ModelHandle(device).load()
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        if loaded.classes != classes:
+            raise CommandError(f"Model version {loaded.version} was trained on different classes than the dataset labels.")
+
+        size, batch_size = options['size'], options['batch_size']
+        if options['cache']:
+            cache_dir = build_cache(options['data_dir'], cache_dir_for(options['data_dir'], size), size)
+            loader = CachedLoader(cache_dir, batch_size=batch_size)
+        else:
+            loader = data_loader(image_folder_dataset(options['data_dir'], size=size), batch_size,
+                                 num_workers=min(8, os.cpu_count() or 1))
+
+        report = evaluate_stream(loaded.model, loader, loaded.classes, device,
+                                 autocast_dtype=torch.bfloat16 if options['bf16'] else None)
+        report = {'version': loaded.version, 'input_size': size, **report}
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stderr.write(
+                f"{loaded.version}: accuracy {report['accuracy']:.4f}, macro F1 {report['macro_f1']:.4f}, "
+                f"ECE {report['ece']:.4f}, {report['images_per_second']:.1f} images/s -> {options['output']}"
+            )
+        else:
+            self.stdout.write(output)
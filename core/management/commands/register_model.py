@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.model_registry import register_artifact
+from core.model_utils import classes
+
+
+class Command(BaseCommand):
+    help = 'Register a model weights file as a new version in the model registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('weights', help='Path to the .pth state dict')
+        parser.add_argument('version', help='Version name, e.g. 2024-06-01')
+        parser.add_argument('--classes-file', help='JSON list of class labels (default: core.model_utils.classes)')
+        parser.add_argument('--activate', action='store_true', help='Make this the active version')
+
+    def handle(self, *args, **options):
+        class_names = classes
+        if options['classes_file']:
+            with open(options['classes_file']) as f:
+                class_names = json.load(f)
+
+        try:
+            manifest = register_artifact(
+                options['weights'], options['version'], class_names, activate=options['activate']
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered model version {manifest['version']} (sha256 {manifest['sha256']})"
+            + (' and activated it.' if options['activate'] else '.')
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Run a dedicated inference server on a Unix socket. Web workers with the socket in '
+            'INFERENCE_SERVERS send it preprocessed tensors through shared memory instead of loading the model.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', required=True, help='Unix socket path (listed in INFERENCE_SERVERS)')
+
+    def handle(self, *args, **options):
+        from core import predict_views as pv
+        from core.inference_server import InferenceServer
+
+        pv.start_local_inference()
+
+        def forward(client, priority, image_tensor, deadline, top_k=None, batch=False):
+            # Fair scheduling across all web workers' users, on this server's replica pool
+            if batch:
+                return pv.inference_scheduler.run(client, priority, pv.run_forward_batch, image_tensor, deadline,
+                                                  cost=len(image_tensor))
+            if top_k:
+                return pv.inference_scheduler.run(client, priority, pv.run_forward_topk, image_tensor, top_k, deadline)
+            prediction, model_version = pv.inference_scheduler.run(
+                client, priority, pv.run_forward, image_tensor, deadline
+            )
+            return {'prediction': prediction, 'model_version': model_version}
+
+        def stats():
+            return {
+                'scheduler': pv.inference_scheduler.stats(),
+                'model': pv.active_model.stats(),
+                'model_pool': pv.model_pool.stats(),
+            }
+
+        server = InferenceServer(options['socket'], forward, stats)
+        self.stdout.write(f"Inference server (model {pv.active_model.current.version}, "
+                          f"{pv.model_pool.plan.replicas} replicas) listening on {options['socket']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Inference server stopped.')
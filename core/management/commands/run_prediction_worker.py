@@ -0,0 +1,102 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from core.jobs import claim_job, finish_job, get_broker, send_callback, sweep_jobs, worker_name
+from core.models import DiseaseHistory
+
+logger = logging.getLogger(__name__)
+
+# A thread that lost a claim waits up to this long (random) before polling again. The database
+# broker hands the oldest queued job to every idle thread, so without it the losers would
+# re-poll in a tight loop and collide on the next job too.
+CLAIM_BACKOFF_SECONDS = 0.25
+
+
+class Command(BaseCommand):
+    help = 'Run asynchronous prediction jobs submitted to model/jobs/ (and sweep expired jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=0,
+                            help='Concurrent jobs (default: one per model replica)')
+        parser.add_argument('--sweep-seconds', type=float, default=60, help='Interval of the expiry sweeper')
+
+    def handle(self, *args, **options):
+        # Loads the model, and starts the scheduler, registry watcher and shadow evaluator
+        from core import predict_views
+
+        self.predict_views = predict_views
+        self.broker = get_broker()
+        self.name = worker_name()
+        self.stop = threading.Event()
+
+        threads = options['threads'] or predict_views.model_pool.plan.replicas
+        workers = [threading.Thread(target=self.work, name=f'prediction-job-{i}', daemon=True) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Prediction worker {self.name} running {threads} job threads "
+                          f"({settings.PREDICTION_JOB_BROKER} broker)")
+
+        try:
+            while True:
+                close_old_connections()
+                sweep_jobs()
+                time.sleep(options['sweep_seconds'])
+        except KeyboardInterrupt:
+            self.stop.set()
+            self.stdout.write('Stopping; running jobs finish on their threads or are re-queued by the sweeper.')
+
+    def work(self):
+        while not self.stop.is_set():
+            try:
+                job_id = self.broker.next_job_id(settings.PREDICTION_JOB_POLL_SECONDS)
+                if job_id is None:
+                    continue
+                job = claim_job(job_id, self.name)
+                if job is None:
+                    self.stop.wait(random.uniform(0, CLAIM_BACKOFF_SECONDS))
+                    continue
+                self.run_job(job)
+            except Exception:
+                logger.exception("Prediction worker error")
+                time.sleep(settings.PREDICTION_JOB_POLL_SECONDS)
+            finally:
+                close_old_connections()
+
+    def run_job(self, job):
+        pv = self.predict_views
+        try:
+            image_path = os.path.join(settings.MEDIA_ROOT, job.image_name)
+            input_size = pv.variant_selector.select(job.priority, pv.forward_queue_depth())
+            img_tensor = pv.preprocess_image(image_path, input_size)
+            prediction, model_version = pv.submit_forward(
+                f"user:{job.user_id}", job.priority, img_tensor
+            ).result()
+            outcome = pv.PredictionOutcome(prediction, model_version, input_size)
+            plant, disease_obj = pv.find_plant_and_disease(outcome)
+            # Only the worker that still owns the job records it, so a job re-queued
+            # by the sweeper while this forward ran doesn't get two histories
+            with transaction.atomic():
+                finished = finish_job(job, self.name, result=outcome.response_data(job.image_url))
+                if finished:
+                    DiseaseHistory.objects.create(user=job.user, **pv.history_relations(plant, outcome, disease_obj))
+        except Exception as e:  # Includes UnknownLabel
+            logger.exception("Prediction job %s failed", job.jobID)
+            finished = finish_job(job, self.name, error=str(e))
+        else:
+            if not finished:
+                return
+            try:
+                pv.send_detection_report_email(**outcome.email_kwargs(job.user, job.image_url))
+            except Exception:
+                logger.exception("Failed to send detection email")
+            logger.info("Prediction job %s finished: %s", job.jobID, prediction)
+
+        if finished and job.callback_url:
+            send_callback(job)
@@ -0,0 +1,98 @@
+import argparse
+import contextlib
+import os
+import tempfile
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dataset_cache import CachedLoader, build_cache, cache_dir_for
+from core.model_architecture import ResNet9
+from core.model_registry import ModelHandle, register_artifact
+from core.model_utils import classes, device
+from core.training_utils import fit_one_cycle
+
+
+class Command(BaseCommand):
+    help = ('Fine-tune (or train from scratch) the disease classifier from a decoded uint8 dataset cache, '
+            'then register the result as a new model version')
+
+    def add_arguments(self, parser):
+        parser.add_argument('train_dir', help='ImageFolder with one sub-folder per class (named as in the classes '
+                                              'of the active version, or core.model_utils.classes with --from-scratch)')
+        parser.add_argument('val_dir', help='Validation ImageFolder with the same layout')
+        parser.add_argument('version', help='Registry version name for the trained model')
+        parser.add_argument('--size', type=int, default=256, help='Input resolution of the cache and the model')
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--max-lr', type=float, default=0.01)
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--weight-decay', type=float, default=1e-4)
+        parser.add_argument('--grad-clip', type=float, default=0.1)
+        parser.add_argument('--threads', type=int, default=4, help='Augmentation threads')
+        parser.add_argument('--bf16', action='store_true', help='Run forward passes under bfloat16 autocast')
+        parser.add_argument('--channels-last', action=argparse.BooleanOptionalAction, default=True,
+                            help='Use the channels_last memory format (faster convolutions on CPU)')
+        parser.add_argument('--from-scratch', action='store_true',
+                            help='Start from random weights instead of the active model')
+        parser.add_argument('--activate', action='store_true', help='Make the trained model the active version')
+
+    def handle(self, *args, **options):
+        # Fine-tuning keeps the active version's classes (and their order); from scratch uses the global ones
+        if options['from_scratch']:
+            class_names = classes
+            model = ResNet9(3, len(class_names)).to(device)
+        else:
+            loaded = ModelHandle(device).load()
+            class_names, model = loaded.classes, loaded.model
+
+        size = options['size']
+        try:
+            train_cache = build_cache(options['train_dir'], cache_dir_for(options['train_dir'], size), size,
+                                      class_names=class_names)
+            val_cache = build_cache(options['val_dir'], cache_dir_for(options['val_dir'], size), size,
+                                    class_names=class_names)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        loader_options = {'batch_size': options['batch_size'], 'device': device,
+                          'channels_last': options['channels_last'], 'threads': options['threads']}
+        train_loader = CachedLoader(train_cache, shuffle=True, augment=True, **loader_options)
+        val_loader = CachedLoader(val_cache, **loader_options)
+
+        if options['channels_last']:
+            model = model.to(memory_format=torch.channels_last)
+
+        checkpoint_dir = os.path.join(settings.DATASET_CACHE_DIR, 'checkpoints')
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint_path = os.path.join(checkpoint_dir, f"{options['version']}.pth")
+        if os.path.exists(checkpoint_path):
+            self.stdout.write(f"Resuming from checkpoint {checkpoint_path}")
+
+        history = fit_one_cycle(
+            options['epochs'], options['max_lr'], model, train_loader, val_loader,
+            weight_decay=options['weight_decay'], grad_clip=options['grad_clip'],
+            autocast_dtype=torch.bfloat16 if options['bf16'] else None,
+            checkpoint_path=checkpoint_path,
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            weights_path = os.path.join(tmp_dir, 'plant-disease-model.pth')
+            model = model.to(memory_format=torch.contiguous_format).cpu()
+            torch.save(model.state_dict(), weights_path)
+            try:
+                manifest = register_artifact(
+                    weights_path, options['version'], class_names,
+                    architecture={'name': 'ResNet9', 'in_channels': 3, 'widths': list(model.widths)},
+                    activate=options['activate'],
+                )
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+        with contextlib.suppress(FileNotFoundError):  # Not written when no epoch ran (e.g. --epochs 0)
+            os.remove(checkpoint_path)
+
+        accuracy = f" (val accuracy {float(history[-1]['val_accuracy']):.4f})" if history else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered model version {manifest['version']}{accuracy}"
+            + (' and activated it.' if options['activate'] else '.')
+        ))
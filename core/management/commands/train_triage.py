@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from core.cascade import downsample, save_triage, triage_crops, triage_label
+from core.model_architecture import TriageNet
+from core.model_utils import classes, device
+from core.training_utils import DeviceLoader, data_loader, fit_one_cycle, image_folder_dataset
+
+
+class Command(BaseCommand):
+    help = 'Train the low-resolution triage model (crop + healthy/diseased) for the inference cascade'
+
+    def add_arguments(self, parser):
+        parser.add_argument('train_dir', help='ImageFolder with one sub-folder per class (named as in core.model_utils.classes)')
+        parser.add_argument('val_dir', help='Validation ImageFolder with the same layout')
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--max-lr', type=float, default=0.01)
+        parser.add_argument('--batch-size', type=int, default=128)
+        parser.add_argument('--threshold', type=float, default=0.95,
+                            help='Initial confidence threshold; refine it with calibrate_triage')
+
+    def handle(self, *args, **options):
+        crops = triage_crops(classes)
+        label = triage_label(classes, crops)
+
+        # Same preprocessing as serving: resize to 256 x 256, then area-downsample to 64 x 64
+        def dataset(root):
+            return image_folder_dataset(root, extra_transforms=[downsample], target_transform=label)
+
+        train_loader = DeviceLoader(data_loader(dataset(options['train_dir']), options['batch_size'], shuffle=True), device)
+        val_loader = DeviceLoader(data_loader(dataset(options['val_dir']), options['batch_size']), device)
+
+        model = TriageNet(3, len(crops) * 2).to(device)
+        history = fit_one_cycle(options['epochs'], options['max_lr'], model, train_loader, val_loader)
+        save_triage(model.cpu(), crops, options['threshold'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved triage model (val accuracy {history[-1]['val_accuracy']:.4f}). "
+            f"Run calibrate_triage to pick the confidence threshold."
+        ))
@@ -5,16 +5,15 @@ import torch.nn.functional as F # Functional module for loss and activation func
 import torchvision.transforms as transforms # For preprocessing and data augmentation
 import logging  # Standard logging module
 
-# Configure logging format and level
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # for calculating the accuracy
 def accuracy(outputs, labels):
     """
     Computes the accuracy by comparing predicted and actual labels.
     """
-    _, preds = torch.max(outputs, dim=1)
-    return torch.tensor(torch.sum(preds == labels).item() / len(preds))
+    preds = outputs.argmax(dim=1)
+    return (preds == labels).float().mean()  # Stays a tensor: no device sync per batch
 
 
 # base class for the model
@@ -29,41 +28,63 @@ class ImageClassificationBase(nn.Module):
         images, labels = batch
         out = self(images)                  # Generate predictions
         loss = F.cross_entropy(out, labels) # Calculate loss
-        logging.debug(f"Training step completed with loss: {loss.item():.4f}")
+        if logger.isEnabledFor(logging.DEBUG):  # .item() syncs with the device, only pay for it when logged
+            logger.debug("Training step completed with loss: %.4f", loss.item())
         return loss
     
+    def distillation_step(self, batch, teacher, temperature=4.0, alpha=0.7):
+        """
+        Knowledge-distillation loss against a frozen teacher: KL divergence between the
+        temperature-softened outputs (scaled by T^2) blended with the usual cross entropy.
+        """
+        images, labels = batch
+        out = self(images)
+        with torch.no_grad():
+            teacher_out = teacher(images)
+        soft_loss = F.kl_div(
+            F.log_softmax(out / temperature, dim=1),
+            F.softmax(teacher_out / temperature, dim=1),
+            reduction='batchmean',
+        ) * temperature ** 2
+        loss = alpha * soft_loss + (1 - alpha) * F.cross_entropy(out, labels)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Distillation step completed with loss: %.4f", loss.item())
+        return loss
+
     def validation_step(self, batch):
         """
         Evaluates the model on the validation batch.
-        Returns loss and accuracy.
+        Returns loss, accuracy and the batch size (for weighting the epoch average).
         """
         images, labels = batch
         out = self(images)                   # Generate prediction
         loss = F.cross_entropy(out, labels)  # Calculate loss
         acc = accuracy(out, labels)          # Calculate accuracy
-        logging.debug(f"Validation step - Loss: {loss.item():.4f}, Accuracy: {acc.item():.4f}")
-        return {"val_loss": loss.detach(), "val_accuracy": acc}
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Validation step - Loss: %.4f, Accuracy: %.4f", loss.item(), acc.item())
+        return {"val_loss": loss.detach(), "val_accuracy": acc, "batch_size": len(labels)}
     
     def validation_epoch_end(self, outputs):
         """
-        Aggregates validation loss and accuracy across all batches.
+        Aggregates validation loss and accuracy across all batches,
+        weighted by batch size so a short last batch doesn't skew the result.
         """
-        batch_losses = [x["val_loss"] for x in outputs]
-        batch_accuracy = [x["val_accuracy"] for x in outputs]
-        epoch_loss = torch.stack(batch_losses).mean()       # Combine loss  
-        epoch_accuracy = torch.stack(batch_accuracy).mean()
-        logging.info(f"Validation - Epoch Loss: {epoch_loss:.4f}, Accuracy: {epoch_accuracy:.4f}")
+        sizes = torch.tensor([x["batch_size"] for x in outputs], dtype=torch.float32)
+        sizes = sizes.to(outputs[0]["val_loss"].device) / sizes.sum()
+        batch_losses = torch.stack([x["val_loss"] for x in outputs]).float()
+        batch_accuracy = torch.stack([x["val_accuracy"] for x in outputs])
+        epoch_loss = (batch_losses * sizes).sum()       # Combine loss  
+        epoch_accuracy = (batch_accuracy * sizes).sum()
+        logger.info("Validation - Epoch Loss: %.4f, Accuracy: %.4f", epoch_loss, epoch_accuracy)
         return {"val_loss": epoch_loss, "val_accuracy": epoch_accuracy} # Combine accuracies
     
     def epoch_end(self, epoch, result):
         """
         Logs the metrics at the end of each epoch.
         """
-        logging.info(
-            f"Epoch [{epoch}], Last LR: {result['lrs'][-1]:.5f}, "
-            f"Train Loss: {result['train_loss']:.4f}, "
-            f"Validation Loss: {result['val_loss']:.4f}, "
-            f"Validation Accuracy: {result['val_accuracy']:.4f}"
+        logger.info(
+            "Epoch [%s], Last LR: %.5f, Train Loss: %.4f, Validation Loss: %.4f, Validation Accuracy: %.4f",
+            epoch, result['lrs'][-1], result['train_loss'], result['val_loss'], result['val_accuracy']
         )
         
 
@@ -81,38 +102,47 @@ def ConvBlock(in_channels, out_channels, pool=False):
         layers.append(nn.MaxPool2d(4))
     return nn.Sequential(*layers)
 
+# Output channels of conv1, conv2, res1 (inner), conv3, conv4, res2 (inner)
+RESNET9_WIDTHS = (64, 128, 128, 256, 512, 512)
+
+
 class ResNet9(ImageClassificationBase):
     """
     A simplified ResNet-9 architecture with residual connections.
-    Suitable for classification tasks.
+    Suitable for classification tasks. Input sizes divisible by 64 are supported (e.g. 128, 192, 256).
+    `widths` allows pruned/compact students; the default is the original full-size network.
     """
-    def __init__(self, in_channels, num_diseases):
+    def __init__(self, in_channels, num_diseases, widths=RESNET9_WIDTHS):
         super().__init__()
+        c1, c2, r1, c3, c4, r2 = widths
+        self.widths = tuple(widths)
+
         # Initial convolutional layers
-        self.conv1 = ConvBlock(in_channels, 64)
-        self.conv2 = ConvBlock(64, 128, pool=True) # out_dim : 128 x 64 x 64 
+        self.conv1 = ConvBlock(in_channels, c1)
+        self.conv2 = ConvBlock(c1, c2, pool=True) # out_dim : 128 x 64 x 64 
         
         # First residual block
         self.res1 = nn.Sequential(
-            ConvBlock(128, 128), 
-            ConvBlock(128, 128)
+            ConvBlock(c2, r1), 
+            ConvBlock(r1, c2)
         )
 
         # Deeper convolutional layers
-        self.conv3 = ConvBlock(128, 256, pool=True) # out_dim : 256 x 16 x 16
-        self.conv4 = ConvBlock(256, 512, pool=True) # out_dim : 512 x 4 x 44
+        self.conv3 = ConvBlock(c2, c3, pool=True) # out_dim : 256 x 16 x 16
+        self.conv4 = ConvBlock(c3, c4, pool=True) # out_dim : 512 x 4 x 4 (for 256 x 256 input)
         
         # Second residual block
         self.res2 = nn.Sequential(
-            ConvBlock(512, 512), 
-            ConvBlock(512, 512)
+            ConvBlock(c4, r2), 
+            ConvBlock(r2, c4)
         )
 
-        # Final classification layer
+        # Final classification layer; adaptive pooling accepts any input size
+        # (equivalent to MaxPool2d(4) for 256 x 256 input, so existing checkpoints load unchanged)
         self.classifier = nn.Sequential(
-            nn.MaxPool2d(4),
+            nn.AdaptiveMaxPool2d(1),
             nn.Flatten(),
-            nn.Linear(512, num_diseases)
+            nn.Linear(c4, num_diseases)
         )
         
     def forward(self, xb): # xb is the loaded batch
@@ -128,4 +158,38 @@ class ResNet9(ImageClassificationBase):
         out = self.res2(out) + out # Residual connection
         
         out = self.classifier(out)
-        return out   
\ No newline at end of file
+        return out   
+
+class TriageNet(ImageClassificationBase):
+    """
+    A tiny low-resolution classifier (64 x 64 input) used as the first stage of the
+    inference cascade. Predicts (crop, healthy/diseased) pairs so confident healthy
+    leaves can skip the full ResNet9 forward.
+    """
+    def __init__(self, in_channels, num_outputs):
+        super().__init__()
+        self.features = nn.Sequential(
+            nn.Conv2d(in_channels, 16, kernel_size=3, stride=2, padding=1), # out_dim : 16 x 32 x 32
+            nn.BatchNorm2d(16),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(16, 32, kernel_size=3, stride=2, padding=1),          # out_dim : 32 x 16 x 16
+            nn.BatchNorm2d(32),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(32, 64, kernel_size=3, stride=2, padding=1),          # out_dim : 64 x 8 x 8
+            nn.BatchNorm2d(64),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(64, 128, kernel_size=3, stride=2, padding=1),         # out_dim : 128 x 4 x 4
+            nn.BatchNorm2d(128),
+            nn.ReLU(inplace=True),
+        )
+        self.classifier = nn.Sequential(
+            nn.AdaptiveAvgPool2d(1),
+            nn.Flatten(),
+            nn.Linear(128, num_outputs)
+        )
+
+    def forward(self, xb):
+        """
+        Defines the forward pass of the network.
+        """
+        return self.classifier(self.features(xb))
@@ -0,0 +1,109 @@
+"""
+Pool of model replicas for threaded and ASGI workers.
+
+Each request checks a replica out for its forward and returns it afterwards, so
+at most `replicas` forwards run at once. The calling thread is configured on
+first use with the plan's intra-op thread budget and, when pinning is enabled,
+its CPU set. Whether torch.set_num_threads applies to the calling thread only
+depends on the parallel backend (OpenMP builds keep a per-thread team size;
+others share one intra-op pool per process), so with other backends the last
+configured budget applies to every replica.
+"""
+import copy
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+from core.model_registry import LoadedModel
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """
+    One copy of the served model. Follows hot swaps of the ModelHandle: the first
+    checkout after a swap picks up the copy the pool prepared for this replica.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.loaded = None
+
+    def sync(self, current, prepared):
+        if self.loaded is None or self.loaded.version != current.version:
+            models = prepared.get(current.version)
+            if models is not None:
+                model = models[self.index]
+            else:  # Only if a swap lands between a request reading `current` and its checkout
+                model = current.model if self.index == 0 else copy.deepcopy(current.model)
+            self.loaded = LoadedModel(current.version, model, current.classes, current.manifest)
+        return self.loaded
+
+
+class ModelPool:
+    def __init__(self, handle, plan):
+        self.handle = handle
+        self.plan = plan
+        self.checkouts = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self._free = queue.Queue()
+        for index in range(plan.replicas):
+            self._free.put(Replica(index))
+        self._prepared = {}  # version -> one model per replica, for the latest loaded version
+        self._lanes = itertools.count()
+        self._local = threading.local()
+        handle.add_load_hook(self._prepare_replicas)
+
+    def _prepare_replicas(self, loaded):
+        """
+        Copies a newly loaded version for every replica. Runs on the loading thread
+        (start-up or the registry watcher) before the handle swaps it in, so no request
+        pays for the copies. Replica 0 serves the handle's own instance.
+        """
+        models = [loaded.model] + [copy.deepcopy(loaded.model) for _ in range(1, self.plan.replicas)]
+        self._prepared = {loaded.version: models}
+
+    def _configure_thread(self):
+        if getattr(self._local, 'lane', None) is not None:
+            return
+        self._local.lane = lane = next(self._lanes)
+        torch.set_num_threads(self.plan.threads_per_replica)
+        if self.plan.cpu_sets:
+            cpus = self.plan.cpu_sets[lane % len(self.plan.cpu_sets)]
+            try:
+                # Linux: a thread ID pins just this thread; intra-op threads it starts inherit the mask
+                os.sched_setaffinity(threading.get_native_id(), cpus)
+            except (AttributeError, OSError) as e:
+                logger.warning("Could not pin inference thread to CPUs %s: %s", cpus, e)
+
+    @contextmanager
+    def checkout(self):
+        """Yields a LoadedModel replica of the active version for the duration of one forward."""
+        self._configure_thread()
+        try:
+            replica = self._free.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            replica = self._free.get()
+            self.waits += 1
+            self.total_wait += time.perf_counter() - start
+        self.checkouts += 1
+        try:
+            yield replica.sync(self.handle.current, self._prepared)
+        finally:
+            self._free.put(replica)
+
+    def stats(self):
+        return {
+            **self.plan.stats(),
+            'idle_replicas': self._free.qsize(),
+            'checkouts': self.checkouts,
+            'waits': self.waits,
+            'avg_wait_ms': round(1000 * self.total_wait / self.waits, 2) if self.waits else 0.0,
+        }
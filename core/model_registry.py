@@ -0,0 +1,258 @@
+"""
+Versioned model artifacts with checksums and class manifests.
+
+Layout of MODEL_REGISTRY_DIR:
+    <version>/manifest.json   - version, weights file, sha256, classes, architecture (incl. widths)
+    <version>/<weights>.pth
+    CURRENT                   - name of the active version
+
+Each worker keeps the active model in a ModelHandle. A background thread polls
+CURRENT (or is woken by SIGHUP), loads and warms up the new version, then swaps
+the reference atomically; in-flight requests finish on the model they started with.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import threading
+import time
+from collections import Counter
+
+import torch
+from django.conf import settings
+
+from core.model_architecture import RESNET9_WIDTHS, ResNet9
+
+logger = logging.getLogger(__name__)
+
+LEGACY_VERSION = 'legacy'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    """Returns the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def registry_dir():
+    return str(settings.MODEL_REGISTRY_DIR)
+
+
+def list_versions():
+    """Returns the registered versions, oldest first."""
+    root = registry_dir()
+    if not os.path.isdir(root):
+        return []
+    versions = [name for name in os.listdir(root)
+                if os.path.isfile(os.path.join(root, name, MANIFEST_FILE))]
+    return sorted(versions, key=lambda name: os.path.getmtime(os.path.join(root, name, MANIFEST_FILE)))
+
+
+def read_manifest(version):
+    with open(os.path.join(registry_dir(), version, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def active_version():
+    """Returns the version named in CURRENT, or None when the registry is empty."""
+    try:
+        with open(os.path.join(registry_dir(), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate_version(version):
+    """Points CURRENT at `version` (atomic rename, so workers never read a partial file)."""
+    read_manifest(version)  # Fails early for unknown versions
+    path = os.path.join(registry_dir(), CURRENT_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    logger.info("Activated model version %s", version)
+
+
+def register_artifact(weights_path, version, classes, architecture=None, activate=False):
+    """
+    Copies a weights file into the registry and writes its manifest.
+    Returns the manifest.
+    """
+    target_dir = os.path.join(registry_dir(), version)
+    if os.path.exists(target_dir):
+        raise ValueError(f"Model version '{version}' is already registered.")
+    os.makedirs(target_dir)
+
+    weights_file = os.path.basename(weights_path)
+    shutil.copyfile(weights_path, os.path.join(target_dir, weights_file))
+    manifest = {
+        'version': version,
+        'weights': weights_file,
+        'sha256': sha256_file(os.path.join(target_dir, weights_file)),
+        'classes': list(classes),
+        'architecture': architecture or {'name': 'ResNet9', 'in_channels': 3},
+        'created_at': time.time(),
+    }
+    with open(os.path.join(target_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Registered model version %s (%s)", version, manifest['sha256'])
+
+    if activate:
+        activate_version(version)
+    return manifest
+
+
+class LoadedModel:
+    """
+    A model instance together with the version and class labels it was loaded from.
+    """
+    def __init__(self, version, model, classes, manifest=None):
+        self.version = version
+        self.model = model
+        self.classes = classes
+        self.manifest = manifest or {}
+        self.loaded_at = time.time()
+
+
+def build_model(manifest, num_classes):
+    """Instantiates the architecture described in a manifest."""
+    architecture = manifest.get('architecture', {})
+    return ResNet9(architecture.get('in_channels', 3), num_classes,
+                   widths=architecture.get('widths', RESNET9_WIDTHS))
+
+
+def warm_up(model, device, input_size=256):
+    """Runs one dummy forward so the first real request doesn't pay for lazy initialisation."""
+    with torch.inference_mode():
+        model(torch.zeros(1, 3, input_size, input_size, device=device))
+
+
+def load_version(version, device):
+    """Loads a registered version, verifying its checksum, and warms it up."""
+    manifest = read_manifest(version)
+    weights_path = os.path.join(registry_dir(), version, manifest['weights'])
+    checksum = sha256_file(weights_path)
+    if checksum != manifest['sha256']:
+        raise ValueError(f"Checksum mismatch for model version '{version}': {checksum} != {manifest['sha256']}")
+
+    classes = manifest['classes']
+    model = build_model(manifest, len(classes))
+    model.load_state_dict(torch.load(weights_path, map_location=device))
+    model.to(device)
+    model.eval()
+    warm_up(model, device)
+    logger.info("Loaded model version %s", version)
+    return LoadedModel(version, model, classes, manifest)
+
+
+def load_legacy(device):
+    """Loads the unversioned core/model/plant-disease-model.pth used before the registry."""
+    from core.model_utils import classes, legacy_model_path
+    model = ResNet9(3, len(classes))
+    model.load_state_dict(torch.load(legacy_model_path(), map_location=device))
+    model.to(device)
+    model.eval()
+    warm_up(model, device)
+    logger.info("Loaded legacy model %s", legacy_model_path())
+    return LoadedModel(LEGACY_VERSION, model, classes)
+
+
+class ModelHandle:
+    """
+    Holds the active model of this worker and hot-swaps it when CURRENT changes.
+    Readers take `handle.current` once per request; the swap is a single reference assignment.
+    Load hooks run on the loading thread with each new version before it is swapped in.
+    """
+    def __init__(self, device, poll_seconds=0):
+        self.device = device
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self.swaps = 0
+        self.predictions = Counter()  # version -> number of predictions served
+        self._load_hooks = []
+        self._reload = threading.Event()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # Not self._lock, which is held while a new version loads
+        self._watcher = None
+
+    def add_load_hook(self, hook):
+        """Calls hook(loaded) for every version this handle loads, before it becomes `current`."""
+        self._load_hooks.append(hook)
+
+    def _prepare(self, loaded):
+        for hook in self._load_hooks:
+            hook(loaded)
+        return loaded
+
+    def load(self):
+        """Loads the active version synchronously (used at worker start-up)."""
+        version = active_version()
+        self.current = self._prepare(load_version(version, self.device) if version else load_legacy(self.device))
+        return self.current
+
+    def reload_if_changed(self):
+        """Loads and swaps in the active version if it differs from the one being served."""
+        with self._lock:
+            version = active_version()
+            if not version or (self.current and version == self.current.version):
+                return False
+            try:
+                loaded = self._prepare(load_version(version, self.device))
+            except Exception as e:
+                logger.error("Failed to load model version %s, keeping %s: %s",
+                             version, self.current and self.current.version, e)
+                return False
+            previous = self.current
+            self.current = loaded
+            self.swaps += 1
+            logger.info("Swapped model %s -> %s", previous and previous.version, loaded.version)
+            return True
+
+    def start(self):
+        """Loads the active model and starts the background watcher."""
+        if self.current is None:
+            self.load()
+        if self._watcher is None:
+            self._install_signal_handler()
+            self._watcher = threading.Thread(target=self._watch, name='model-registry-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def _install_signal_handler(self):
+        try:
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._reload.set())
+        except (ValueError, AttributeError) as e:  # Not the main thread (e.g. runserver), or no SIGHUP
+            if self.poll_seconds:
+                logger.warning("SIGHUP model reload unavailable (%s); new versions are picked up by "
+                               "polling CURRENT every %s s only", e, self.poll_seconds)
+            else:
+                logger.warning("SIGHUP model reload unavailable (%s) and polling is disabled; "
+                               "new versions are only picked up on restart", e)
+
+    def _watch(self):
+        while True:
+            self._reload.wait(self.poll_seconds or None)
+            self._reload.clear()
+            self.reload_if_changed()
+
+    def record_prediction(self, version):
+        with self._stats_lock:
+            self.predictions[version] += 1
+
+    def stats(self):
+        current = self.current
+        with self._stats_lock:
+            predictions = dict(self.predictions)
+        return {
+            'version': current and current.version,
+            'loaded_at': current and current.loaded_at,
+            'swaps': self.swaps,
+            'predictions': predictions,
+        }
@@ -1,12 +1,25 @@
 import os
+import time
+import queue
+import socket
 import logging
-from PIL import Image, ImageStat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from PIL import Image
 import torch
+from django.conf import settings
 from torchvision import transforms
 from core.model_architecture import ResNet9
+from core.model_registry import ModelHandle
+from core.model_pool import ModelPool
+from core.cpu_plan import inference_plan
+from core.image_quality import quality_gate
+from core.admission import AdmissionRejected
+from core.cascade import is_healthy
+from core.inference_server import recv_message, send_message, shared_tensor
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # Device configuration (use GPU if available)
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -14,89 +27,330 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 # Class labels (for output interpretation)
 classes = ['Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy', 'Blueberry___healthy', 'Cherry_(including_sour)___healthy', 'Cherry_(including_sour)___Powdery_mildew', 'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_', 'Corn_(maize)___healthy', 'Corn_(maize)___Northern_Leaf_Blight', 'Grape___Black_rot', 'Grape___Esca_(Black_Measles)', 'Grape___healthy', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot', 'Peach___healthy', 'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 'Potato___Early_blight', 'Potato___healthy', 'Potato___Late_blight', 'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew', 'Strawberry___healthy', 'Strawberry___Leaf_scorch', 'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___healthy', 'Tomato___Late_blight', 'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites Two-spotted_spider_mite', 'Tomato___Target_Spot', 'Tomato___Tomato_mosaic_virus', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus'] # example class names
 
-def is_image_quality_sufficient(image_path, min_resolution=(224, 224), min_brightness=40):
+def is_image_quality_sufficient(image_path):
     """
-    Validates image quality based on resolution and brightness.
-    Returns True if image is usable, False otherwise.
+    Validates image quality (resolution, exposure, sharpness, leaf coverage) with the quality gate.
+    Returns True if image is usable, False otherwise; use quality_gate.check() for the reasons.
     """
-    try:
-        img = Image.open(image_path)
-        
-        # Check resolution
-        if img.size[0] < min_resolution[0] or img.size[1] < min_resolution[1]:
-            logging.warning(f"Image {image_path} has insufficient resolution: {img.size}")
-            return False
-
-        # Check brightness
-        stat = ImageStat.Stat(img.convert('L'))  # convert to grayscale
-        brightness = stat.mean[0]
-        if brightness < min_brightness:
-            logging.warning(f"Image {image_path} is too dark (brightness: {brightness:.2f})")
-            return False
-        logging.info(f"Image {image_path} passed quality checks.")
-        return True
-    except Exception as e:
-        logging.error(f"Failed to check image quality for {image_path}: {e}")
-        return False
+    result = quality_gate.check(image_path)
+    if not result:
+        logger.warning("Image %s failed quality checks: %s", image_path, ', '.join(result.reasons))
+    return bool(result)
+
 
+def legacy_model_path():
+    """
+    Path of the unversioned checkpoint served when the model registry is empty.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))  # This gives the path to core/
+    return os.path.join(base_dir, 'model', 'plant-disease-model.pth')
 
 
 # Load model
 def load_model():
     """
-    Loads the trained model with weights and returns it in evaluation mode.
+    Loads the active registry version (or the legacy checkpoint) and returns it in evaluation mode.
     """
     try:
-        model = ResNet9(3, len(classes))
-        base_dir = os.path.dirname(os.path.abspath(__file__))  # This gives the path to core/
-        model_path = os.path.join(base_dir, 'model', 'plant-disease-model.pth')  # adjust if needed
-
-        model.load_state_dict(torch.load(model_path, map_location=device))
-        model.to(device)
-        model.eval()
-        logging.info("Model loaded successfully.")
+        model = ModelHandle(device).load().model
+        logger.info("Model loaded successfully.")
         return model
     except Exception as e:
-        logging.error(f"Failed to load model: {e}")
+        logger.error("Failed to load model: %s", e)
         raise
 
+
+# Active model of this worker, hot-swapped when a new registry version is activated
+active_model = ModelHandle(device, poll_seconds=settings.MODEL_REGISTRY_POLL_SECONDS)
+
+# Replicas of the active model, sized from this process's share of the cores
+model_pool = ModelPool(active_model, inference_plan)
+
+
+class RemoteInferenceError(RuntimeError):
+    """A forward that failed on the inference server (the server itself is healthy)."""
+
+
+class ServerConnection:
+    """
+    One socket to an inference server and the shared-memory segment its tensors travel in.
+    The segment is created on first use and replaced by a larger one when an input doesn't fit.
+    """
+    def __init__(self, path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.segment = None
+
+    def _ensure_capacity(self, size):
+        if self.segment is not None and self.segment.size >= size:
+            return
+        previous = self.segment
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            send_message(self.sock, {'op': 'attach', 'name': self.segment.name})
+            recv_message(self.sock)
+        finally:
+            # The server detaches from the previous segment on attach; close() takes care of the new one
+            if previous is not None:
+                previous.close()
+                previous.unlink()
+
+    def predict(self, client, priority, image_tensor, deadline, timeout, top_k=None, batch=False):
+        image_tensor = image_tensor.detach().to('cpu', torch.float32)
+        shape = list(image_tensor.shape)
+        self._ensure_capacity(image_tensor.numel() * image_tensor.element_size())
+        shared_tensor(self.segment, shape).copy_(image_tensor)  # The only copy; nothing is pickled
+        self.sock.settimeout(timeout)
+        send_message(self.sock, {'op': 'predict', 'shape': shape, 'client': client,
+                                 'priority': priority, 'deadline': deadline, 'top_k': top_k, 'batch': batch})
+        return recv_message(self.sock)
+
+    def request(self, message):
+        send_message(self.sock, message)
+        return recv_message(self.sock)
+
+    def close(self):
+        self.sock.close()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+
+
+class RemoteServer:
+    """
+    Client-side view of one inference server: idle connections and its estimated load
+    (this process's requests in flight + the load the server reported in its last reply).
+    """
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self.in_flight = 0
+        self.reported_load = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._idle = queue.LifoQueue()
+
+    @property
+    def load(self):
+        return self.in_flight + self.reported_load
+
+    def available(self, now):
+        return now >= self.down_until
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return ServerConnection(self.path, self.timeout)
+
+    def release(self, connection):
+        self._idle.put(connection)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'available': self.available(time.monotonic()),
+            'in_flight': self.in_flight,
+            'reported_load': self.reported_load,
+            'idle_connections': self._idle.qsize(),
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+
+class RemoteInferenceClient:
+    """
+    Runs forwards on dedicated inference servers (run_inference_server) instead of in this process.
+    Each request goes to the available server with the lowest estimated load; a server
+    that can't be reached is skipped for `retry_seconds` and the request fails over
+    to the next one. Scheduling across users and priority classes happens on the server.
+    """
+    def __init__(self, paths, timeout, retry_seconds, max_concurrency):
+        self.servers = [RemoteServer(path, timeout) for path in paths]
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix='remote-inference')
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            paths=settings.INFERENCE_SERVERS,
+            timeout=settings.INFERENCE_SERVER_TIMEOUT,
+            retry_seconds=settings.INFERENCE_SERVER_RETRY_SECONDS,
+            max_concurrency=settings.INFERENCE_SERVER_MAX_CONCURRENCY,
+        )
+
+    def _pick(self, exclude):
+        """Reserves the least-loaded available server, or returns None."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [s for s in self.servers if s not in exclude and s.available(now)]
+            if not candidates:
+                return None
+            server = min(candidates, key=lambda s: s.load)
+            server.in_flight += 1
+            return server
+
+    def _mark_down(self, server, error):
+        server.failures += 1
+        server.down_until = time.monotonic() + self.retry_seconds
+        logger.warning("Inference server %s unavailable: %s", server.path, error)
+
+    def _request_timeout(self, deadline):
+        if deadline is None:
+            return self.timeout
+        return max(0.1, min(self.timeout, deadline - time.time() + 1))
+
+    def predict(self, client, priority, image_tensor, deadline=None, top_k=None, batch=False):
+        """
+        Runs one forward remotely. Returns (prediction, model_version), or the result dict of
+        run_forward_topk (with `top_k`) or run_forward_batch (with `batch`).
+        """
+        tried = set()
+        while True:
+            server = self._pick(tried)
+            if server is None:
+                raise RemoteInferenceError('No inference server available')
+            tried.add(server)
+            try:
+                try:
+                    connection = server.acquire()
+                except OSError as e:  # Refused, missing socket, or a connect timeout on a backlogged server
+                    self._mark_down(server, e)
+                    continue
+                try:
+                    reply = connection.predict(client, priority, image_tensor, deadline,
+                                               self._request_timeout(deadline), top_k, batch)
+                except TimeoutError:
+                    # The server is alive but slow; retrying elsewhere would only run the forward twice
+                    connection.close()
+                    raise RemoteInferenceError(f"Inference server {server.path} timed out")
+                except OSError as e:  # The server died mid-request
+                    connection.close()
+                    self._mark_down(server, e)
+                    continue
+                except BaseException:
+                    # E.g. a malformed reply: the stream is out of sync, don't reuse it (or leak its segment)
+                    connection.close()
+                    raise
+            finally:
+                with self._lock:
+                    server.in_flight -= 1
+
+            server.requests += 1
+            server.reported_load = reply.get('load', 0)
+            server.release(connection)
+            if 'rejected' in reply:
+                raise AdmissionRejected(**reply['rejected'])
+            if 'error' in reply:
+                raise RemoteInferenceError(reply['error'])
+            if top_k or batch:
+                return {key: value for key, value in reply.items() if key != 'load'}
+            return reply['prediction'], reply['model_version']
+
+    def submit(self, client, priority, image_tensor, deadline=None, top_k=None, batch=False):
+        """Same as predict(), on the client's thread pool. Returns a Future."""
+        return self._executor.submit(self.predict, client, priority, image_tensor, deadline, top_k, batch)
+
+    def queue_depth(self):
+        """Estimated load of the server the next request would go to."""
+        now = time.monotonic()
+        loads = [s.load for s in self.servers if s.available(now)]
+        return min(loads) if loads else 0
+
+    def stats(self):
+        return {'servers': [s.stats() for s in self.servers]}
+
+
+# Dedicated inference servers, when configured; the model then isn't loaded in this process
+remote_inference = RemoteInferenceClient.from_settings() if settings.INFERENCE_SERVERS else None
+
+
 # Preprocess image
-def preprocess_image(image_file):
+def preprocess_image(image_file, size=256):
     """
     Applies preprocessing transformations to the input image.
-    Returns a tensor ready for model input.
+    Returns a tensor of size x size ready for model input.
     """
     try:
         transform = transforms.Compose([
-            transforms.Resize((256, 256)),
+            transforms.Resize((size, size)),
             transforms.ToTensor(),
         ])
         image = Image.open(image_file).convert("RGB")
         image_tensor = transform(image).unsqueeze(0)  # Add batch dimension
-        logging.info(f"Image {image_file} preprocessed successfully.")
+        logger.info("Image %s preprocessed successfully.", image_file)
         return image_tensor
     except Exception as e:
-        logging.error(f"Error preprocessing image {image_file}: {e}")
+        logger.error("Error preprocessing image %s: %s", image_file, e)
         raise
 
 # Predict function
-def predict_image(image_tensor, model):
+def predict_image(image_tensor, model, class_names=None):
     """
     Runs inference on the preprocessed image tensor.
-    Returns the predicted class label.
+    Returns the predicted class label from `class_names` (default: `classes`).
     """
     try:
         image_tensor = image_tensor.to(device)
-        outputs = model(image_tensor)
+        with torch.inference_mode():
+            outputs = model(image_tensor)
         _, predicted = torch.max(outputs, 1)
-        predicted_class = classes[predicted.item()]
-        logging.info(f"Prediction completed: {predicted_class}")
+        predicted_class = (class_names or classes)[predicted.item()]
+        logger.info("Prediction completed: %s", predicted_class)
         return predicted_class
     except Exception as e:
-        logging.error(f"Error during prediction: {e}")
+        logger.error("Error during prediction: %s", e)
         return None
 
 
+def pixels_to_tensor(pixels):
+    """
+    Converts N x H x W x 3 uint8 RGB pixels (tensor or NumPy array, not copied)
+    into the N x 3 x H x W float tensor in [0, 1] that preprocess_image would produce.
+    """
+    return torch.as_tensor(pixels).permute(0, 3, 1, 2).to(torch.float32, memory_format=torch.contiguous_format).div_(255)
+
+
+def rgb_to_tensor(rgb, size=256):
+    """Converts a size x size x 3 uint8 RGB buffer (row-major) into a (1, 3, size, size) model input."""
+    return pixels_to_tensor(torch.frombuffer(bytearray(rgb), dtype=torch.uint8).view(1, size, size, 3))
+
+
+def predict_topk(image_tensor, model, k, class_names=None):
+    """
+    Runs inference on one preprocessed image tensor.
+    Returns the top-k class indices, their labels and softmax probabilities, best first.
+    """
+    names = class_names or classes
+    with torch.inference_mode():
+        probabilities = torch.softmax(model(image_tensor.to(device)), dim=1)[0]
+    scores, indices = probabilities.topk(min(k, len(names)))
+    indices = indices.tolist()
+    return indices, [names[i] for i in indices], scores.tolist()
+
+
+def classify_batch(image_tensor, model, class_names=None):
+    """
+    Runs inference on a batch of preprocessed images. For each image, returns the predicted
+    label, its probability and the total probability of the diseased (non-healthy) classes.
+    """
+    names = class_names or classes
+    healthy = torch.tensor([is_healthy(name) for name in names], device=device)
+    with torch.inference_mode():
+        probabilities = torch.softmax(model(image_tensor.to(device)), dim=1)
+    scores, indices = probabilities.max(dim=1)
+    disease_scores = 1 - probabilities[:, healthy].sum(dim=1)
+    return [names[i] for i in indices.tolist()], scores.tolist(), disease_scores.tolist()
+
+
 def parse_prediction(prediction):
     """
     Parses prediction string into crop and disease components.
@@ -119,6 +373,6 @@ def parse_prediction(prediction):
             "disease": disease
         }
     except Exception as e:
-        logging.error(f"Error parsing prediction string '{prediction}': {e}")
+        logger.error("Error parsing prediction string '%s': %s", prediction, e)
         return {"crop": "-", "disease": "-"}
 
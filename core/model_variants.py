@@ -0,0 +1,92 @@
+"""
+Input-resolution variants of the served model.
+
+ResNet9 is fully convolutional up to an adaptive pool, so the same weights can
+run at 128, 192 or 256 pixels; compute scales roughly with the pixel count.
+Each variant's accuracy and latency are measured by the benchmark_variants
+command and stored in MODEL_VARIANTS_FILE. The serving path picks a size per
+priority class and degrades to smaller inputs when the inference queue is deep,
+but only to variants whose measured accuracy loss against the largest size is
+within INFERENCE_VARIANT_MAX_ACCURACY_LOSS.
+"""
+import json
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def load_variant_metrics():
+    """Returns the measured metrics per input size ({size: {...}}), or {} when not benchmarked yet."""
+    try:
+        with open(settings.MODEL_VARIANTS_FILE) as f:
+            return {int(size): metrics for size, metrics in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def save_variant_metrics(metrics):
+    with open(settings.MODEL_VARIANTS_FILE, 'w') as f:
+        json.dump({str(size): values for size, values in sorted(metrics.items())}, f, indent=2)
+
+
+def usable_sizes(sizes, metrics, max_accuracy_loss):
+    """
+    The sizes that may be served: the largest one, plus every smaller one whose measured
+    accuracy is within `max_accuracy_loss` of the largest size's accuracy.
+    """
+    full_size = max(sizes)
+    full_accuracy = metrics.get(full_size, {}).get('accuracy')
+    if full_accuracy is None:
+        return [full_size]
+    return sorted(size for size in sizes if size == full_size or (
+        metrics.get(size, {}).get('accuracy') is not None
+        and full_accuracy - metrics[size]['accuracy'] <= max_accuracy_loss
+    ))
+
+
+class VariantSelector:
+    """
+    Picks the input size for a request from its priority class and the current queue depth,
+    among the sizes whose measured accuracy loss is acceptable (see usable_sizes).
+    """
+    def __init__(self, sizes, class_sizes, degrade_steps, default_size=256, max_accuracy_loss=0.0, metrics=None):
+        self.class_sizes = class_sizes
+        self.degrade_steps = sorted(degrade_steps)  # [(queue depth, max size), ...]
+        self.default_size = default_size
+        self.metrics = load_variant_metrics() if metrics is None else metrics
+        self.sizes = usable_sizes(sizes, self.metrics, max_accuracy_loss)
+        if len(self.sizes) < len(sizes):
+            logger.info("Input-size variants in use: %s (of %s; others unmeasured or over the accuracy loss limit)",
+                        self.sizes, sorted(sizes))
+        self.selected = {size: 0 for size in self.sizes}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            sizes=settings.MODEL_VARIANT_SIZES,
+            class_sizes=settings.INFERENCE_CLASS_INPUT_SIZE,
+            degrade_steps=settings.INFERENCE_DEGRADE_STEPS,
+            max_accuracy_loss=settings.INFERENCE_VARIANT_MAX_ACCURACY_LOSS,
+        )
+
+    def select(self, priority, queue_depth=0):
+        size = self.class_sizes.get(priority, self.default_size)
+        for depth, max_size in self.degrade_steps:
+            if queue_depth >= depth:
+                size = min(size, max_size)
+        # Snap to the largest usable variant that isn't bigger than the requested size
+        size = max((s for s in self.sizes if s <= size), default=self.sizes[0])
+        self.selected[size] = self.selected.get(size, 0) + 1
+        return size
+
+    def stats(self):
+        return {
+            'selected': dict(self.selected),
+            'measured': self.metrics,
+        }
+
+
+# Variant selector shared by the predict views of this worker process
+variant_selector = VariantSelector.from_settings()
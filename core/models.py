@@ -1,4 +1,5 @@
 import logging
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
@@ -7,8 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 # Get the custom user model (to allow easy reference to the user model).
 User = get_user_model()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class Plant(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -37,17 +37,18 @@ class DiseaseHistory(models.Model):
     diseaseID = models.ForeignKey(Disease, on_delete=models.SET_NULL, null=True, blank=True) 
     date_detected = models.DateTimeField(auto_now_add=True)  # Timestamp when the disease is detected
     status = models.CharField(max_length=10) # Status of the disease (e.g., "active", "resolved")
+    model_version = models.CharField(max_length=64, blank=True, default='') # Registry version of the model that made the prediction
 
     def __str__(self):
         """Return a string representation of the disease history entry."""
-        return f"History {self.historyID} for User {self.user.id}"
+        return f"History {self.historyID} for User {self.user_id}"
 
     def save(self, *args, **kwargs):
         """Override save method to log when a DiseaseHistory is created or updated."""
         if not self.pk:  # If it's a new record
-            logging.info(f"Creating DiseaseHistory for user {self.user.id} with plantID {self.plantID} and diseaseID {self.diseaseID}")
+            logger.info("Creating DiseaseHistory for user %s with plantID %s and diseaseID %s", self.user_id, self.plantID_id, self.diseaseID_id)
         else:  # If it's an update
-            logging.info(f"Updating DiseaseHistory {self.historyID} for user {self.user.id}")
+            logger.info("Updating DiseaseHistory %s for user %s", self.historyID, self.user_id)
         super().save(*args, **kwargs)
                      
 class FeedbackRating(models.Model):
@@ -61,11 +62,11 @@ class FeedbackRating(models.Model):
 
     def __str__(self):
         """Return a string representation of the feedback entry."""
-        return f"Feedback {self.feedbackID} by User {self.user.userID}"
+        return f"Feedback {self.feedbackID} by User {self.user_id}"
     
     def save(self, *args, **kwargs):
         """Override save method to log feedback creation."""
-        logging.info(f"User {self.user.id} provided feedback with rating {self.rating}")
+        logger.info("User %s provided feedback with rating %s", self.user_id, self.rating)
         super().save(*args, **kwargs)
 
 class EditHistory(models.Model):
@@ -78,11 +79,11 @@ class EditHistory(models.Model):
 
     def __str__(self):
         """Return a string representation of the edit history entry."""
-        return f"Edit {self.editID} by User {self.user.id}"
+        return f"Edit {self.editID} by User {self.user_id}"
 
     def save(self, *args, **kwargs):
         """Override save method to log when an edit history record is created."""
-        logging.info(f"User {self.user.id} made an edit on DiseaseHistory {self.history.historyID}")
+        logger.info("User %s made an edit on DiseaseHistory %s", self.user_id, self.history_id)
         super().save(*args, **kwargs)
 
 class DeleteHistory(models.Model):
@@ -91,13 +92,66 @@ class DeleteHistory(models.Model):
     """
     deleteID = models.AutoField(primary_key=True) # Auto-incrementing ID for delete history
     user = models.ForeignKey(User, on_delete=models.CASCADE) # Link to the user who made the deletion
-    history = models.ForeignKey(DiseaseHistory, on_delete=models.CASCADE) # Link to the deleted DiseaseHistory
+    # Link to the deleted DiseaseHistory; kept without a DB constraint so the audit row outlives the record
+    history = models.ForeignKey(DiseaseHistory, on_delete=models.DO_NOTHING, db_constraint=False)
 
     def __str__(self):
         """Return a string representation of the delete history entry."""
-        return f"Delete {self.deleteID} by User {self.user.id}"
+        return f"Delete {self.deleteID} by User {self.user_id}"
     
     def save(self, *args, **kwargs):
         """Override save method to log when a deletion history record is created."""
-        logging.info(f"User {self.user.id} deleted DiseaseHistory {self.history.historyID}")
-        super().save(*args, **kwargs)
\ No newline at end of file
+        logger.info("User %s deleted DiseaseHistory %s", self.user_id, self.history_id)
+        super().save(*args, **kwargs)
+
+
+class ShadowPrediction(models.Model):
+    """
+    Model to store the production and candidate model predictions for one sampled request.
+    Used to compare a candidate checkpoint against production before promoting it.
+    """
+    primary_version = models.CharField(max_length=64) # Registry version serving production traffic
+    candidate_version = models.CharField(max_length=64) # Registry version evaluated in shadow mode
+    primary_prediction = models.CharField(max_length=100)
+    candidate_prediction = models.CharField(max_length=100)
+    agrees = models.BooleanField() # Whether both models predicted the same class
+    primary_latency_ms = models.FloatField()
+    candidate_latency_ms = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Return a string representation of the shadow prediction."""
+        return f"Shadow {self.candidate_version} vs {self.primary_version}: {'agree' if self.agrees else 'disagree'}"
+
+
+class PredictionJob(models.Model):
+    """
+    Model to track an asynchronous prediction: the stored upload, its processing status,
+    timings and the result payload (same format as the synchronous predict response).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, SUCCEEDED, FAILED, EXPIRED)]
+
+    jobID = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False) # Unguessable ID returned to the client
+    user = models.ForeignKey(User, on_delete=models.CASCADE) # Link to the user who submitted the job
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    image_name = models.CharField(max_length=255) # Stored upload, relative to MEDIA_ROOT
+    image_url = models.URLField(max_length=500) # Public URL of the upload, included in the result
+    priority = models.CharField(max_length=20) # Inference priority class
+    callback_url = models.URLField(blank=True, default='') # Optional URL notified with the result
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='') # Worker that claimed the job
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True) # When the sweeper expires or deletes the job
+
+    def __str__(self):
+        """Return a string representation of the prediction job."""
+        return f"Job {self.jobID} ({self.status}) for User {self.user_id}"
@@ -0,0 +1,483 @@
+"""
+Prediction views. Importing this module imports torch and loads the model, so
+core.urls only references these views lazily; workers that never serve a
+prediction (DEPLOYMENT_ROLE = 'api') never pay for it.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .email_utils import asend_detection_report_email, send_detection_report_email, send_in_background
+from .admission import AdmissionRejected, predict_admission, parse_deadline, client_key
+from .scheduler import inference_scheduler, priority_class
+from .shadow import shadow_evaluator
+from .cascade import load_triage
+from .model_variants import variant_selector
+from .image_quality import quality_gate, store_upload
+from .fast_predict import fast_admission
+from .tiling import TILE_SIZE, TileGrid, load_rgb, summarize_tiles
+from userauths.authentication import CachedJWTAuthentication
+from userauths.hashing import password_hashing
+from .models import *
+from .serializers import *
+from .model_utils import *
+
+logger = logging.getLogger(__name__)
+
+# Optional cheap first stage that answers confidently-healthy leaves without the full model
+triage_cascade = None
+
+
+def start_local_inference():
+    """
+    Loads the plant disease detection model (and the shadow candidate and triage stage)
+    to run forwards in this process, and watches the registry for new versions.
+    """
+    global triage_cascade
+    active_model.start()
+    shadow_evaluator.start()
+    if settings.TRIAGE_ENABLED and triage_cascade is None:
+        triage_cascade = load_triage(active_model.current.classes, device)
+
+
+# With INFERENCE_SERVERS set, forwards run in the inference servers and the model isn't loaded here
+if remote_inference is None:
+    start_local_inference()
+
+
+def run_forward(img_tensor, deadline=None):
+    """
+    Scheduled inference job: drops the work if the client's deadline passed
+    while it was queued, otherwise runs the model forward.
+    Returns the predicted class and the registry version being served; triage
+    shortcuts are counted in the triage stats, not in the version string.
+    """
+    predict_admission.check_deadline(deadline)
+    with model_pool.checkout() as loaded:  # One replica, pinned to one version for the whole request
+        if triage_cascade is not None:
+            prediction = triage_cascade.classify(img_tensor, loaded.classes)
+            if prediction is not None:
+                active_model.record_prediction(loaded.version)
+                return prediction, loaded.version
+
+        start = time.perf_counter()
+        prediction = predict_image(img_tensor, loaded.model, loaded.classes)
+        latency = time.perf_counter() - start
+    active_model.record_prediction(loaded.version)
+    shadow_evaluator.maybe_submit(img_tensor, prediction, loaded.version, latency, inference_scheduler.queue_depth())
+    return prediction, loaded.version
+
+def run_forward_topk(img_tensor, k, deadline=None):
+    """
+    Scheduled job of the binary fast path: the full model's top-k classes (no triage shortcut,
+    which has no class distribution). Returns model_version, indices, labels and scores.
+    """
+    predict_admission.check_deadline(deadline)
+    with model_pool.checkout() as loaded:
+        indices, labels, scores = predict_topk(img_tensor, loaded.model, k, loaded.classes)
+    active_model.record_prediction(loaded.version)
+    return {'model_version': loaded.version, 'indices': indices, 'labels': labels, 'scores': scores}
+
+
+def run_forward_batch(img_tensor, deadline=None):
+    """
+    Scheduled job of tiled inference: classifies a batch of tiles with the full model.
+    Returns model_version and per-tile labels, scores and disease_scores.
+    """
+    predict_admission.check_deadline(deadline)
+    with model_pool.checkout() as loaded:
+        labels, scores, disease_scores = classify_batch(img_tensor, loaded.model, loaded.classes)
+    active_model.record_prediction(loaded.version)
+    return {'model_version': loaded.version, 'labels': labels, 'scores': scores, 'disease_scores': disease_scores}
+
+
+def submit_forward(client, priority, img_tensor, deadline=None):
+    """
+    Queues the forward on an inference server, or on this process's scheduler when none are configured.
+    Returns a Future of (prediction, model_version).
+    """
+    if remote_inference is not None:
+        return remote_inference.submit(client, priority, img_tensor, deadline)
+    return inference_scheduler.submit(client, priority, run_forward, img_tensor, deadline)
+
+
+def submit_topk(client, priority, img_tensor, k, deadline=None):
+    """Like submit_forward, for run_forward_topk."""
+    if remote_inference is not None:
+        return remote_inference.submit(client, priority, img_tensor, deadline, top_k=k)
+    return inference_scheduler.submit(client, priority, run_forward_topk, img_tensor, k, deadline)
+
+
+def submit_batch(client, priority, img_tensor, deadline=None):
+    """Like submit_forward, for run_forward_batch; the batch costs one scheduling unit per image."""
+    if remote_inference is not None:
+        return remote_inference.submit(client, priority, img_tensor, deadline, batch=True)
+    return inference_scheduler.submit(client, priority, run_forward_batch, img_tensor, deadline, cost=len(img_tensor))
+
+
+def tiled_inference(image_path, client, deadline=None):
+    """
+    Classifies the vegetation tiles of a high-resolution image in batches and
+    summarizes them (see core.tiling). At most TILED_MAX_PENDING_BATCHES batches are
+    queued at a time, which bounds the memory of float tensors per request.
+    """
+    grid = TileGrid(load_rgb(image_path, settings.TILED_MAX_SIDE), TILE_SIZE, settings.TILED_TILE_STRIDE)
+    cells = grid.vegetation_cells(
+        settings.TILED_MIN_VEGETATION,
+        settings.IMAGE_QUALITY_VEGETATION_HUE_RANGE,
+        settings.IMAGE_QUALITY_VEGETATION_MIN_SATURATION,
+        settings.IMAGE_QUALITY_VEGETATION_MIN_VALUE,
+    )
+
+    results, model_version, pending = {}, None, deque()
+
+    def collect():
+        nonlocal model_version
+        batch_cells, future = pending.popleft()
+        batch = future.result()
+        model_version = batch['model_version']
+        results.update(zip(batch_cells, zip(batch['labels'], batch['scores'], batch['disease_scores'])))
+
+    for batch_cells, pixels in grid.batches(cells, settings.TILED_BATCH_SIZE):
+        if len(pending) >= settings.TILED_MAX_PENDING_BATCHES:
+            collect()
+        img_tensor = pixels_to_tensor(pixels)
+        pending.append((batch_cells, submit_batch(client, settings.TILED_PRIORITY, img_tensor, deadline)))
+    while pending:
+        collect()
+    return summarize_tiles(grid, results, model_version)
+
+
+def forward_queue_depth():
+    """Depth of the queue the next forward joins (drives input-size degradation under load)."""
+    if remote_inference is not None:
+        return remote_inference.queue_depth()
+    return inference_scheduler.queue_depth()
+
+
+class PredictionOutcome:
+    """
+    Crop, disease and health status derived from a predicted class label,
+    shared by the sync and async predict views.
+    """
+    def __init__(self, prediction, model_version, input_size):
+        self.prediction = prediction
+        self.model_version = model_version
+        self.input_size = input_size
+
+        # Parse the prediction into crop and disease
+        parsed_prediction = parse_prediction(prediction)
+        self.crop = parsed_prediction["crop"]
+        disease = parsed_prediction["disease"]
+
+        # Determine health status based on the prediction
+        if disease == "Healthy":
+            self.health_status = "Healthy"
+            self.disease_name = None
+            self.message = "The plant is healthy."
+        elif disease == "Unknown":
+            self.health_status = "Unhealthy"
+            self.disease_name = None
+            self.message = "The plant is not healthy, but the disease could not be identified."
+        else:
+            self.health_status = "Unhealthy"
+            self.disease_name = disease
+            self.message = f"The plant is not healthy and is affected by {disease}."
+
+    def response_data(self, image_url):
+        return {
+            'condition_status': self.health_status,
+            'crop': self.crop,
+            'disease_name': self.disease_name,
+            'prediction_raw': self.prediction,
+            'model_version': self.model_version,
+            'input_size': self.input_size,
+            'message': self.message,
+            'image_url': image_url
+        }
+
+    def email_kwargs(self, user, image_url):
+        return {
+            'user': user,
+            'crop': self.crop,
+            'disease_name': self.disease_name,
+            'health_status': self.health_status,
+            'message': self.message,
+            'image_url': image_url,
+        }
+
+
+class UnknownLabel(Exception):
+    """The predicted crop or disease has no row in the database (404)."""
+
+
+def history_relations(plant, outcome, disease_obj):
+    """DiseaseHistory fields for an outcome whose plant and disease rows were found."""
+    return {
+        'plantID': plant,
+        'diseaseID': disease_obj,
+        'status': outcome.health_status,
+        'model_version': outcome.model_version,
+    }
+
+
+def find_plant_and_disease(outcome):
+    try:
+        plant = Plant.objects.get(name=outcome.crop)
+    except Plant.DoesNotExist:
+        logger.error("Plant not found in DB: %s", outcome.crop)
+        raise UnknownLabel(f"Plant '{outcome.crop}' not found in database.")
+    disease_obj = None  # If healthy or unknown
+    if outcome.disease_name:
+        try:
+            disease_obj = Disease.objects.get(name=outcome.disease_name, plant=plant)
+        except Disease.DoesNotExist:
+            logger.error("Disease '%s' not found for plant '%s'", outcome.disease_name, plant.name)
+            raise UnknownLabel(f"Disease '{outcome.disease_name}' not found for plant '{plant.name}'.")
+    return plant, disease_obj
+
+
+async def afind_plant_and_disease(outcome):
+    """Async ORM version of find_plant_and_disease."""
+    try:
+        plant = await Plant.objects.aget(name=outcome.crop)
+    except Plant.DoesNotExist:
+        logger.error("Plant not found in DB: %s", outcome.crop)
+        raise UnknownLabel(f"Plant '{outcome.crop}' not found in database.")
+    disease_obj = None
+    if outcome.disease_name:
+        try:
+            disease_obj = await Disease.objects.aget(name=outcome.disease_name, plant=plant)
+        except Disease.DoesNotExist:
+            logger.error("Disease '%s' not found for plant '%s'", outcome.disease_name, plant.name)
+            raise UnknownLabel(f"Disease '{outcome.disease_name}' not found for plant '{plant.name}'.")
+    return plant, disease_obj
+
+
+class PredictImageView(APIView):
+    """
+    View for predicting plant disease from an uploaded image.
+    - Validates image format and quality
+    - Predicts the disease and sends an email report
+    - Sheds load with a fast 429/503 when the worker or the client is over its limits
+    """
+    def post(self, request, format=None):
+        try:
+            deadline = parse_deadline(request)
+            with predict_admission.admit(client_key(request), deadline):
+                return self.predict(request, deadline)
+        except AdmissionRejected as e:
+            return e.as_response()
+
+    def predict(self, request, deadline=None):
+        serializer = ImageUploadSerializer(data=request.data)
+
+        # Validate image upload
+        if serializer.is_valid():
+            image = serializer.validated_data['image']
+
+            # Reject blurry, badly exposed or non-leaf photos before storing or running the model
+            quality, filename = store_upload(image)
+            if not quality:
+                return Response(quality.as_error(), status=status.HTTP_400_BAD_REQUEST)
+            image_path = os.path.join(settings.MEDIA_ROOT, filename)
+            image_url = request.build_absolute_uri(settings.MEDIA_URL + filename)
+
+            # Process the image and predict the disease
+            try:
+                # Pick the input resolution for this request class, smaller when the queue is deep
+                priority = priority_class(request)
+                input_size = variant_selector.select(priority, forward_queue_depth())
+                img_tensor = preprocess_image(image_path, input_size)
+                # Queue the forward fairly across users and priority classes
+                prediction, model_version = submit_forward(
+                    client_key(request), priority, img_tensor, deadline
+                ).result()
+                outcome = PredictionOutcome(prediction, model_version, input_size)
+
+                try:
+                    plant, disease_obj = find_plant_and_disease(outcome)
+                except UnknownLabel as e:
+                    return Response({"error": str(e)}, status=404)
+
+                # Save the disease detection history to the database
+                DiseaseHistory.objects.create(user=request.user, **history_relations(plant, outcome, disease_obj))
+                # Send email with detection results
+                try:
+                    send_detection_report_email(**outcome.email_kwargs(request.user, image_url))
+                except Exception as e:
+                    logger.error("Failed to send detection email: %s", e)
+
+                # Return the prediction result as a response
+                return Response(outcome.response_data(image_url))
+
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                logger.error("Error during prediction: %s", e)
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # If the serializer is invalid, return the errors
+        logger.warning("Invalid image upload: %s", serializer.errors)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Bounded pool for the CPU stages of async predictions (multipart parsing, header checks,
+# quality gate, storage, decode + preprocess), so the event loop never blocks on them
+predict_cpu_executor = ThreadPoolExecutor(settings.PREDICT_ASYNC_CPU_WORKERS, thread_name_prefix='predict-cpu')
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(predict_cpu_executor, fn, *args)
+
+
+def parse_upload(request):
+    """Parses the multipart body (already buffered by the ASGI handler) and validates the image field."""
+    serializer = ImageUploadSerializer(data=request.FILES)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return serializer.validated_data['image'], None
+
+
+def authenticate_jwt(request):
+    """Resolves the bearer token to a user (DRF authentication isn't async). Returns None when missing or invalid."""
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
+
+
+async def predict_image_async(request):
+    """
+    Async version of PredictImageView for ASGI deployments.
+    Waiting on the upload, the inference queue, the database and the email API
+    doesn't hold a thread; CPU stages run on predict_cpu_executor and the
+    forward on the inference scheduler, awaited through its Future.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    user = await sync_to_async(authenticate_jwt)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+    request.user = user
+
+    try:
+        deadline = parse_deadline(request)
+        with predict_admission.admit(client_key(request), deadline):
+            return await predict_async(request, deadline)
+    except AdmissionRejected as e:
+        return e.as_json_response()
+
+
+async def predict_async(request, deadline=None):
+    image, errors = await run_cpu(parse_upload, request)
+    if errors:
+        logger.warning("Invalid image upload: %s", errors)
+        return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    quality, filename = await run_cpu(store_upload, image)
+    if not quality:
+        return JsonResponse(quality.as_error(), status=status.HTTP_400_BAD_REQUEST)
+    image_path = os.path.join(settings.MEDIA_ROOT, filename)
+    image_url = request.build_absolute_uri(settings.MEDIA_URL + filename)
+
+    try:
+        priority = priority_class(request)
+        input_size = variant_selector.select(priority, forward_queue_depth())
+        img_tensor = await run_cpu(preprocess_image, image_path, input_size)
+        prediction, model_version = await asyncio.wrap_future(submit_forward(
+            client_key(request), priority, img_tensor, deadline
+        ))
+        outcome = PredictionOutcome(prediction, model_version, input_size)
+
+        try:
+            plant, disease_obj = await afind_plant_and_disease(outcome)
+        except UnknownLabel as e:
+            return JsonResponse({"error": str(e)}, status=404)
+
+        await DiseaseHistory.objects.acreate(user=request.user, **history_relations(plant, outcome, disease_obj))
+        email = asend_detection_report_email(**outcome.email_kwargs(request.user, image_url))
+        if isinstance(request, ASGIRequest):
+            send_in_background(email)  # The ASGI event loop outlives the request, so don't delay the response
+        else:
+            await email
+        return JsonResponse(outcome.response_data(image_url))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error("Error during prediction: %s", e)
+        return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PredictTiledView(APIView):
+    """
+    View for predicting plant diseases across a high-resolution drone or field-camera image.
+    - Cuts the image into overlapping model-sized tiles and skips tiles without vegetation
+    - Classifies the remaining tiles in batches at the TILED_PRIORITY class
+    - Returns a per-tile disease heatmap and the diseases found, with their share of the plot
+    - health_status is 'no_vegetation' (and model_version null) when no tile had enough vegetation
+    """
+    def post(self, request, format=None):
+        try:
+            deadline = parse_deadline(request)
+            with predict_admission.admit(client_key(request), deadline):
+                return self.predict(request, deadline)
+        except AdmissionRejected as e:
+            return e.as_response()
+
+    def predict(self, request, deadline=None):
+        serializer = ImageUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning("Invalid image upload: %s", serializer.errors)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # No quality gate: a whole-plot image is judged tile by tile by the vegetation filter
+        _, filename = store_upload(serializer.validated_data['image'], check_quality=False)
+        image_url = request.build_absolute_uri(settings.MEDIA_URL + filename)
+        try:
+            result = tiled_inference(os.path.join(settings.MEDIA_ROOT, filename), client_key(request), deadline)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.error("Error during tiled prediction: %s", e)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'image_url': image_url, **result})
+
+
+class InferenceStatsAPIView(APIView):
+    """
+    Admission, scheduler and model metrics for this worker: in-flight requests,
+    rejections, queue depth / wait time per priority class, and the served model version.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'admission': predict_admission.stats(),
+            'fast_path_admission': fast_admission.stats(),
+            'scheduler': inference_scheduler.stats(),
+            'model': active_model.stats(),
+            'model_pool': model_pool.stats(),
+            'remote_inference': remote_inference.stats() if remote_inference is not None else None,
+            'password_hashing': password_hashing.stats(),  # Shares the host's cores with inference
+            'shadow': shadow_evaluator.stats(),
+            'triage': triage_cascade.stats() if triage_cascade is not None else None,
+            'variants': variant_selector.stats(),
+            'quality_gate': quality_gate.stats(),
+        })
@@ -0,0 +1,81 @@
+"""
+Structured channel pruning of ResNet9.
+
+Channels are ranked by the magnitude of their BatchNorm scale (|gamma|), the usual
+"network slimming" criterion. Channels tied together by a residual connection
+(conv2 + res1's second block, conv4 + res2's second block) are ranked jointly and
+kept or dropped together. The result is a dense, narrower ResNet9 (no masks), so
+every forward is cheaper, and its weights start from the teacher's.
+"""
+import torch
+
+from core.model_architecture import ResNet9
+
+# Blocks whose output channels share one width, in RESNET9_WIDTHS order
+WIDTH_GROUPS = (
+    ('conv1',),
+    ('conv2', 'res1.1'),
+    ('res1.0',),
+    ('conv3',),
+    ('conv4', 'res2.1'),
+    ('res2.0',),
+)
+
+
+def _round_channels(channels, divisor=8):
+    """Rounds to a multiple of `divisor` (SIMD-friendly on CPU), never below `divisor`."""
+    return max(divisor, int(channels + divisor / 2) // divisor * divisor)
+
+
+def _block(model, name):
+    return model.get_submodule(name)
+
+
+def _keep_indices(model, group, keep):
+    importance = sum(_block(model, name)[1].weight.detach().abs() for name in group)
+    return importance.argsort(descending=True)[:keep].sort().values
+
+
+def _copy_block(src, dst, in_idx, out_idx):
+    src_conv, src_bn = src[0], src[1]
+    dst_conv, dst_bn = dst[0], dst[1]
+    dst_conv.weight.copy_(src_conv.weight[out_idx][:, in_idx])
+    dst_conv.bias.copy_(src_conv.bias[out_idx])
+    for name in ('weight', 'bias', 'running_mean', 'running_var'):
+        getattr(dst_bn, name).copy_(getattr(src_bn, name)[out_idx])
+    dst_bn.num_batches_tracked.copy_(src_bn.num_batches_tracked)
+
+
+@torch.no_grad()
+def prune_resnet9(model, ratio):
+    """
+    Returns a new ResNet9 with roughly `ratio` of the channels of every ConvBlock removed,
+    initialised from the most important channels of `model`.
+    """
+    widths = [_round_channels(width * (1 - ratio)) if ratio else width for width in model.widths]
+    widths = [min(new, old) for new, old in zip(widths, model.widths)]
+    keep = [_keep_indices(model, group, width) for group, width in zip(WIDTH_GROUPS, widths)]
+    c1, c2, r1, c3, c4, r2 = keep
+
+    in_channels = model.conv1[0].in_channels
+    num_classes = model.classifier[-1].out_features
+    device = model.conv1[0].weight.device
+    student = ResNet9(in_channels, num_classes, widths=widths).to(device)
+
+    all_inputs = torch.arange(in_channels, device=device)
+    for name, in_idx, out_idx in (
+        ('conv1', all_inputs, c1),
+        ('conv2', c1, c2),
+        ('res1.0', c2, r1),
+        ('res1.1', r1, c2),
+        ('conv3', c2, c3),
+        ('conv4', c3, c4),
+        ('res2.0', c4, r2),
+        ('res2.1', r2, c4),
+    ):
+        _copy_block(_block(model, name), _block(student, name), in_idx, out_idx)
+
+    linear, student_linear = model.classifier[-1], student.classifier[-1]
+    student_linear.weight.copy_(linear.weight[:, c4])
+    student_linear.bias.copy_(linear.bias)
+    return student
@@ -0,0 +1,53 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer
+
+try:
+    import msgpack
+except ImportError:  # MessagePack output is optional
+    msgpack = None
+
+
+def _default(obj):
+    """Fallback for types orjson / msgpack don't encode natively (Decimal, lazy strings, ...)."""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson.
+    Datetimes are written in the same ISO 8601 'Z' form as DRF's DateTimeField.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default, option=self.options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack renderer for clients that send Accept: application/msgpack.
+    Requires the optional `msgpack` package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+# Renderers for the read-heavy list endpoints, in content-negotiation order
+FAST_RENDERER_CLASSES = [ORJSONRenderer]
+if msgpack is not None:
+    FAST_RENDERER_CLASSES.append(MessagePackRenderer)
+FAST_RENDERER_CLASSES.append(BrowsableAPIRenderer)
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from core.cpu_plan import inference_plan
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A unit of inference work waiting in the scheduler.
+    """
+    __slots__ = ('fn', 'args', 'kwargs', 'cost', 'future', 'enqueued_at')
+
+    def __init__(self, fn, args, kwargs, cost):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cost = cost
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class PriorityClass:
+    """
+    Per-class queues: one FIFO per user, served with deficit round-robin
+    so a single heavy user can't starve the others in the same class.
+    """
+    def __init__(self, name, weight, quantum):
+        self.name = name
+        self.weight = weight
+        self.quantum = quantum
+        self.users = OrderedDict()  # user key -> deque of jobs, in round-robin order
+        self.deficits = {}
+        self.current_weight = 0     # Smooth weighted round-robin state across classes
+        self.depth = 0
+        self.submitted = 0
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.ewma_wait = 0.0
+
+    def push(self, user_key, job):
+        self.users.setdefault(user_key, deque()).append(job)
+        self.depth += 1
+        self.submitted += 1
+
+    def pop(self):
+        """Returns the next job by deficit round-robin across users. The class must not be empty."""
+        while True:
+            user_key, jobs = next(iter(self.users.items()))
+            deficit = self.deficits.get(user_key, 0)
+            if deficit >= jobs[0].cost:
+                job = jobs.popleft()
+                self.deficits[user_key] = deficit - job.cost
+                if not jobs:
+                    del self.users[user_key]
+                    del self.deficits[user_key]
+                self.depth -= 1
+                return job
+            self.deficits[user_key] = deficit + self.quantum
+            self.users.move_to_end(user_key)
+
+    def record_wait(self, wait):
+        self.started += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.ewma_wait = wait if self.started == 1 else 0.9 * self.ewma_wait + 0.1 * wait
+
+    def stats(self):
+        return {
+            'weight': self.weight,
+            'queue_depth': self.depth,
+            'waiting_users': len(self.users),
+            'submitted': self.submitted,
+            'started': self.started,
+            'avg_wait_ms': round(1000 * self.total_wait / self.started, 2) if self.started else 0.0,
+            'ewma_wait_ms': round(1000 * self.ewma_wait, 2),
+            'max_wait_ms': round(1000 * self.max_wait, 2),
+        }
+
+
+class FairScheduler:
+    """
+    Runs inference jobs on a fixed set of worker threads.
+    Classes are picked by smooth weighted round-robin (e.g. interactive vs. bulk),
+    and users within a class by deficit round-robin.
+    """
+    def __init__(self, classes, default_class, workers=1, quantum=1):
+        self.classes = {name: PriorityClass(name, weight, quantum) for name, weight in classes.items()}
+        self.default_class = default_class
+        self.workers = workers
+        self._condition = threading.Condition()
+        self._threads = []
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            classes=settings.INFERENCE_PRIORITY_CLASSES,
+            default_class=settings.INFERENCE_DEFAULT_PRIORITY,
+            workers=inference_plan.replicas,  # One forward per model replica at a time
+        )
+
+    def resolve_class(self, name):
+        """Returns `name` if it is a configured class, otherwise the default class."""
+        return name if name in self.classes else self.default_class
+
+    def submit(self, user_key, priority, fn, *args, cost=1, **kwargs):
+        """Queues fn(*args, **kwargs) for `user_key` in class `priority`. Returns a Future."""
+        job = Job(fn, args, kwargs, cost)
+        with self._condition:
+            self._start_workers()
+            self.classes[self.resolve_class(priority)].push(user_key, job)
+            self._condition.notify()
+        return job.future
+
+    def run(self, user_key, priority, fn, *args, cost=1, **kwargs):
+        """Queues the job and blocks until it has run. Returns its result or re-raises its exception."""
+        return self.submit(user_key, priority, fn, *args, cost=cost, **kwargs).result()
+
+    def queue_depth(self):
+        return sum(c.depth for c in self.classes.values())
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f'inference-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self):
+        """Picks the next job by smooth weighted round-robin over non-empty classes. Caller holds the lock."""
+        ready = [c for c in self.classes.values() if c.depth]
+        if not ready:
+            return None
+        total = sum(c.weight for c in ready)
+        for c in ready:
+            c.current_weight += c.weight
+        chosen = max(ready, key=lambda c: c.current_weight)
+        chosen.current_weight -= total
+        job = chosen.pop()
+        chosen.record_wait(time.monotonic() - job.enqueued_at)
+        return job
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                job.future.set_result(job.fn(*job.args, **job.kwargs))
+            except BaseException as e:
+                job.future.set_exception(e)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth(),
+                'classes': {name: c.stats() for name, c in self.classes.items()},
+            }
+
+
+def priority_class(request, ceiling=None, trusted=False):
+    """
+    Priority class of the request, decided server-side. The endpoint's class (`ceiling`,
+    INFERENCE_DEFAULT_PRIORITY by default) applies unless the client asks for a configured
+    class (X-Priority-Class header or ?priority=) of no greater weight. Staff users and
+    `trusted` callers may ask for any configured class; unknown names are ignored.
+    """
+    classes = settings.INFERENCE_PRIORITY_CLASSES
+    ceiling = ceiling or settings.INFERENCE_DEFAULT_PRIORITY
+    requested = request.headers.get('X-Priority-Class') or request.GET.get('priority')
+    if requested not in classes:
+        return ceiling
+    user = getattr(request, 'user', None)
+    if trusted or (user is not None and user.is_staff) or classes[requested] <= classes[ceiling]:
+        return requested
+    return ceiling
+
+
+# Scheduler shared by the predict views of this worker process
+inference_scheduler = FairScheduler.from_settings()
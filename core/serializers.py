@@ -1,9 +1,11 @@
 import logging
+from django.conf import settings
 from rest_framework import serializers
 from .models import DiseaseHistory, FeedbackRating, EditHistory, DeleteHistory, Plant, Disease
+from .upload_validation import validate_upload
+from .jobs import callback_allowed
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class DiseaseHistorySerializer(serializers.ModelSerializer):
     """
@@ -24,7 +26,7 @@ class DiseaseHistorySerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Custom validation for DiseaseHistory model fields."""
-        logging.info("Validating DiseaseHistory data")
+        logger.info("Validating DiseaseHistory data")
         # You can add more custom validation logic here if needed
         return data
 
@@ -40,7 +42,7 @@ class FeedbackRatingSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Custom validation for FeedbackRating fields."""
-        logging.info("Validating FeedbackRating data")
+        logger.info("Validating FeedbackRating data")
         # Custom logic for feedback validation can go here
         return data
 
@@ -56,7 +58,7 @@ class EditHistorySerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Custom validation for EditHistory model fields."""
-        logging.info("Validating EditHistory data")
+        logger.info("Validating EditHistory data")
         # Custom validation for the EditHistory model can go here
         return data
 
@@ -72,7 +74,7 @@ class DeleteHistorySerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Custom validation for DeleteHistory model fields."""
-        logging.info("Validating DeleteHistory data")
+        logger.info("Validating DeleteHistory data")
         # Custom logic for validating delete history fields
         return data
 
@@ -80,31 +82,37 @@ class DeleteHistorySerializer(serializers.ModelSerializer):
 class ImageUploadSerializer(serializers.Serializer):
     """
     Serializer for handling image uploads.
-    Validates uploaded image files and ensures the correct format.
+    Validates uploaded image files from their header only, before anything is decoded.
     """
-    image = serializers.ImageField()
+    image = serializers.FileField()
 
     def validate_image(self, image):
         """
         Custom validation for uploaded images:
-        - Ensures the image is either JPEG or PNG.
-        - Logs invalid image formats for further review.
+        - Sniffs the format from the magic bytes (JPEG or PNG), ignoring the client's content type.
+        - Rejects files over the byte, pixel or decode memory budgets.
         """
-        valid_mime_types = ['image/jpeg', 'image/png']
-
-        # Log the type of image being validated
-        logging.info(f"Validating image with MIME type: {image.content_type}")
-
-        # Check if the image content type is valid
-        if image.content_type not in valid_mime_types:
-            # Log the error if the MIME type is invalid
-            logging.error(f"Unsupported image format: {image.content_type} (only JPEG and PNG are supported)")
-            raise serializers.ValidationError("Unsupported file format")
+        header = validate_upload(image)
+        image.image_header = header  # Dimensions for later stages, without re-reading the file
 
         # Log successful validation
-        logging.info(f"Image validated successfully: {image.name}")
+        logger.info("Image validated successfully: %s (%s %sx%s)", image.name, header.format, header.width, header.height)
         return image
 
+class PredictionJobSubmitSerializer(ImageUploadSerializer):
+    """
+    Serializer for submitting an asynchronous prediction job:
+    the image upload plus an optional URL notified when the job finishes.
+    """
+    callback_url = serializers.URLField(required=False, allow_blank=True, default='')
+
+    def validate_callback_url(self, value):
+        if value and not settings.PREDICTION_JOB_CALLBACK_HOSTS:
+            raise serializers.ValidationError("Callbacks are not enabled on this server; poll the status URL.")
+        if value and not callback_allowed(value):
+            raise serializers.ValidationError("Callback URL must be http(s) on an allowed host.")
+        return value
+
 class CropLibrarySerializer(serializers.ModelSerializer):
     plant_name = serializers.CharField(source='plant.name', read_only=True)
     disease_name = serializers.CharField(source='name', read_only=True)
@@ -118,4 +126,35 @@ class CropLibrarySerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if obj.image and hasattr(obj.image, 'url'):
             return request.build_absolute_uri(obj.image.url)
-        return None
\ No newline at end of file
+        return None
+
+class BulkHistoryEditItemSerializer(serializers.Serializer):
+    """
+    A single edit within a bulk edit request.
+    Only the fields that are present are applied to the DiseaseHistory record.
+    """
+    historyID = serializers.IntegerField()
+    plantID = serializers.IntegerField(required=False)
+    diseaseID = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.CharField(max_length=10, required=False)
+
+
+class BulkHistoryEditSerializer(serializers.Serializer):
+    """
+    Serializer for editing many DiseaseHistory records in one request.
+    """
+    edits = BulkHistoryEditItemSerializer(many=True, allow_empty=False)
+
+    def validate_edits(self, edits):
+        """Reject duplicate historyIDs so each record is edited once per batch."""
+        history_ids = [edit['historyID'] for edit in edits]
+        if len(history_ids) != len(set(history_ids)):
+            raise serializers.ValidationError("Each historyID may only appear once per batch.")
+        return edits
+
+
+class BulkHistoryDeleteSerializer(serializers.Serializer):
+    """
+    Serializer for deleting many DiseaseHistory records in one request.
+    """
+    historyIDs = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
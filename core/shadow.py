@@ -0,0 +1,126 @@
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.model_registry import load_version
+from core.model_utils import device, predict_image
+from core.models import ShadowPrediction
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """
+    Scores a sample of production traffic with a candidate model in the background.
+
+    The request thread only does a non-blocking put of the already-preprocessed tensor;
+    a single low-priority thread runs the candidate and records agreement and latency.
+    Work is dropped (never queued) when the shadow queue is full or the primary
+    inference queue is deeper than `max_primary_queue_depth`.
+    """
+    def __init__(self, version, sample_rate, queue_size, max_primary_queue_depth, device):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.max_primary_queue_depth = max_primary_queue_depth
+        self.device = device
+        self.candidate = None
+        self.counters = {'sampled': 0, 'scored': 0, 'agreed': 0,
+                         'dropped_full': 0, 'dropped_load': 0, 'failed': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls, device):
+        return cls(
+            version=settings.SHADOW_MODEL_VERSION,
+            sample_rate=settings.SHADOW_SAMPLE_RATE,
+            queue_size=settings.SHADOW_QUEUE_SIZE,
+            max_primary_queue_depth=settings.SHADOW_MAX_PRIMARY_QUEUE_DEPTH,
+            device=device,
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.version) and self.sample_rate > 0
+
+    def start(self):
+        """Starts the background thread; the candidate is loaded there, off the request path."""
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='shadow-evaluator', daemon=True)
+            self._thread.start()
+        return self
+
+    def maybe_submit(self, image_tensor, primary_prediction, primary_version, primary_latency, primary_queue_depth):
+        """Samples the request for shadow scoring. Never blocks."""
+        if self.candidate is None or random.random() >= self.sample_rate:
+            return
+        self.counters['sampled'] += 1
+        if primary_queue_depth > self.max_primary_queue_depth:
+            self.counters['dropped_load'] += 1
+            return
+        try:
+            # Cloned: the caller may reuse the tensor's memory (e.g. an inference server's shared-memory segment)
+            self._queue.put_nowait((image_tensor.clone(), primary_prediction, primary_version, primary_latency))
+        except queue.Full:
+            self.counters['dropped_full'] += 1
+
+    def _lower_priority(self):
+        # On Linux, setpriority on a thread ID renices only this thread (and threads it spawns)
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+    def _run(self):
+        self._lower_priority()
+        try:
+            self.candidate = load_version(self.version, self.device)
+        except Exception as e:
+            logger.error("Shadow evaluation disabled, failed to load candidate %s: %s", self.version, e)
+            return
+        logger.info("Shadow evaluation of model %s started", self.version)
+
+        while True:
+            image_tensor, primary_prediction, primary_version, primary_latency = self._queue.get()
+            try:
+                start = time.perf_counter()
+                candidate_prediction = predict_image(image_tensor, self.candidate.model, self.candidate.classes)
+                candidate_latency = time.perf_counter() - start
+
+                agrees = candidate_prediction == primary_prediction
+                self.counters['scored'] += 1
+                self.counters['agreed'] += agrees
+
+                close_old_connections()
+                ShadowPrediction.objects.create(
+                    primary_version=primary_version,
+                    candidate_version=self.candidate.version,
+                    primary_prediction=primary_prediction or '',
+                    candidate_prediction=candidate_prediction or '',
+                    agrees=agrees,
+                    primary_latency_ms=primary_latency * 1000,
+                    candidate_latency_ms=candidate_latency * 1000,
+                )
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error("Shadow evaluation failed: %s", e)
+
+    def stats(self):
+        scored = self.counters['scored']
+        return {
+            'candidate_version': self.version if self.enabled else None,
+            'loaded': self.candidate is not None,
+            'queue_depth': self._queue.qsize(),
+            'agreement': round(self.counters['agreed'] / scored, 4) if scored else None,
+            **self.counters,
+        }
+
+
+# Shadow evaluator of this worker process (inactive unless SHADOW_MODEL_VERSION is set)
+shadow_evaluator = ShadowEvaluator.from_settings(device)
@@ -1,3 +1,722 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import struct
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from core import jobs
+from core.admission import AdmissionController, AdmissionRejected, TokenBucket
+from core.bulk_utils import apply_bulk_deletes, apply_bulk_edits
+from core.cpu_plan import partition, plan_inference, reserve_cpus
+from core.fast_predict import RAW_RGB_BYTES, FastPredictMiddleware, handle_fast_predict
+from core.fast_serializers import CropLibraryValuesSerializer, DiseaseHistoryValuesSerializer
+from core.image_quality import QualityGate
+from core.models import DeleteHistory, Disease, DiseaseHistory, EditHistory, Plant, PredictionJob
+from core.scheduler import FairScheduler, priority_class
+from core.upload_validation import PNG_SIGNATURE, read_image_header, validate_upload
+
+HAS_TORCH = importlib.util.find_spec('torch') is not None
+
+
+def png_bytes(width, height, bit_depth=8, color_type=2):
+    ihdr = struct.pack('>I4sIIBBBBB', 13, b'IHDR', width, height, bit_depth, color_type, 0, 0, 0)
+    return PNG_SIGNATURE + ihdr + b'\x00' * 4
+
+
+def jpeg_bytes(width, height, components=3, prefix=b''):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 8 + 3 * components, 8, height, width, components)
+    return b'\xff\xd8' + app0 + prefix + sof0 + b'\x00' * 3 * components
+
+
+def image_file(rgb, format='PNG'):
+    buffer = io.BytesIO()
+    Image.fromarray(np.asarray(rgb, dtype=np.uint8)).save(buffer, format=format)
+    buffer.seek(0)
+    return buffer
+
+
+def checkerboard(size, first, second, square=8):
+    cells = (np.indices((size, size)) // square).sum(axis=0) % 2
+    return np.where(cells[..., None] == 0, first, second)
+
+
+def create_user(email='grower@example.com', phone_no='0700000000'):
+    return get_user_model().objects.create_user(email, 'Test', 'Grower', 'Central', phone_no)
+
+
+class ReadImageHeaderTests(SimpleTestCase):
+    def test_png(self):
+        header = read_image_header(io.BytesIO(png_bytes(640, 480)), 1024)
+        self.assertEqual((header.format, header.width, header.height), ('png', 640, 480))
+        self.assertEqual((header.channels, header.bit_depth), (3, 8))
+
+    def test_jpeg(self):
+        header = read_image_header(io.BytesIO(jpeg_bytes(1024, 768)), 1024)
+        self.assertEqual((header.format, header.width, header.height), ('jpeg', 1024, 768))
+        self.assertEqual(header.channels, 3)
+
+    def test_jpeg_fill_bytes_before_marker(self):
+        header = read_image_header(io.BytesIO(jpeg_bytes(32, 16, prefix=b'\xff\xff')), 1024)
+        self.assertEqual((header.width, header.height), (32, 16))
+
+    def test_restores_file_position(self):
+        f = io.BytesIO(b'junk' + png_bytes(10, 10))
+        f.seek(4)
+        read_image_header(f, 1024)
+        self.assertEqual(f.tell(), 4)
+
+    def test_rejects_other_formats(self):
+        with self.assertRaisesMessage(ValueError, 'not a PNG or JPEG file'):
+            read_image_header(io.BytesIO(b'GIF89a' + b'\x00' * 32), 1024)
+
+    def test_rejects_truncated_png(self):
+        for size in (len(PNG_SIGNATURE) + 4, len(PNG_SIGNATURE) + 17):
+            with self.subTest(size=size), self.assertRaises(ValueError):
+                read_image_header(io.BytesIO(png_bytes(10, 10)[:size]), 1024)
+
+    def test_rejects_truncated_jpeg(self):
+        data = jpeg_bytes(10, 10)
+        for size in (3, 20, len(data) - 12):
+            with self.subTest(size=size), self.assertRaises(ValueError):
+                read_image_header(io.BytesIO(data[:size]), 1024)
+
+    def test_rejects_invalid_png_chunk(self):
+        data = bytearray(png_bytes(10, 10))
+        data[len(PNG_SIGNATURE) + 4:len(PNG_SIGNATURE) + 8] = b'IDAT'
+        with self.assertRaisesMessage(ValueError, 'invalid IHDR chunk'):
+            read_image_header(io.BytesIO(bytes(data)), 1024)
+
+    def test_rejects_jpeg_without_frame_header(self):
+        sos = b'\xff\xda' + struct.pack('>H', 8) + b'\x00' * 6
+        with self.assertRaisesMessage(ValueError, 'no frame header'):
+            read_image_header(io.BytesIO(b'\xff\xd8' + sos), 1024)
+
+    def test_rejects_bad_segment_length(self):
+        with self.assertRaisesMessage(ValueError, 'invalid segment length'):
+            read_image_header(io.BytesIO(b'\xff\xd8\xff\xe1\x00\x01'), 1024)
+
+    def test_stops_at_scan_limit(self):
+        big_app = b'\xff\xe1' + struct.pack('>H', 2000) + b'\x00' * 1998
+        with self.assertRaisesMessage(ValueError, 'frame header not found'):
+            read_image_header(io.BytesIO(jpeg_bytes(10, 10, prefix=big_app)), 1024)
+
+
+@override_settings(UPLOAD_MAX_BYTES=1024, UPLOAD_MAX_PIXELS=10_000, UPLOAD_MAX_DECODE_BYTES=50_000,
+                   UPLOAD_HEADER_SCAN_BYTES=1024)
+class ValidateUploadTests(SimpleTestCase):
+    def assertRejected(self, data, code):
+        with self.assertRaises(ValidationError) as cm:
+            validate_upload(SimpleUploadedFile('leaf.jpg', data, content_type='image/jpeg'))
+        self.assertEqual(cm.exception.get_codes(), [code])
+
+    def test_accepts_small_image(self):
+        header = validate_upload(SimpleUploadedFile('leaf.png', png_bytes(50, 40), content_type='image/png'))
+        self.assertEqual((header.width, header.height), (50, 40))
+
+    def test_too_many_bytes(self):
+        self.assertRejected(png_bytes(10, 10) + b'\x00' * 1024, 'too_many_bytes')
+
+    def test_unsupported_format(self):
+        self.assertRejected(b'GIF89a' + b'\x00' * 32, 'unsupported_format')
+
+    def test_empty_image(self):
+        self.assertRejected(jpeg_bytes(0, 10), 'empty_image')
+
+    def test_too_many_pixels(self):
+        self.assertRejected(jpeg_bytes(200, 100), 'too_many_pixels')
+
+    def test_decode_memory_limit(self):
+        # 90 x 90 x (4 channels x 2 bytes + 3 for RGB) = 89,100 bytes, under the pixel budget
+        self.assertRejected(png_bytes(90, 90, bit_depth=16, color_type=6), 'decode_memory_limit')
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, burst=2)
+        bucket.updated = 0
+        self.assertEqual(bucket.take(0), 0)
+        self.assertEqual(bucket.take(0), 0)
+        self.assertAlmostEqual(bucket.take(0), 0.5)
+        self.assertEqual(bucket.take(0.5), 0)
+
+    def test_never_exceeds_burst(self):
+        bucket = TokenBucket(rate=10, burst=1)
+        bucket.updated = 0
+        self.assertTrue(bucket.is_full(100))
+        self.assertEqual(bucket.take(100), 0)
+        self.assertFalse(bucket.is_full(100))
+        self.assertGreater(bucket.take(100), 0)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def test_rate_limited(self):
+        controller = AdmissionController(max_in_flight=10, rate=0.01, burst=1)
+        with controller.admit('a'):
+            pass
+        with self.assertRaises(AdmissionRejected) as cm:
+            with controller.admit('a'):
+                pass
+        self.assertEqual((cm.exception.status_code, cm.exception.reason), (429, 'rate_limited'))
+        self.assertGreater(cm.exception.retry_after, 0)
+        with controller.admit('b'):  # Other clients have their own bucket
+            pass
+
+    def test_overloaded(self):
+        controller = AdmissionController(max_in_flight=1, rate=0, burst=0)
+        with controller.admit('a'):
+            with self.assertRaises(AdmissionRejected) as cm:
+                with controller.admit('b'):
+                    pass
+            self.assertEqual((cm.exception.status_code, cm.exception.reason), (503, 'overloaded'))
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(controller.stats()['rejected']['overloaded'], 1)
+
+    def test_overload_does_not_consume_token(self):
+        controller = AdmissionController(max_in_flight=1, rate=0.01, burst=1)
+        with controller.admit('a'):
+            with self.assertRaises(AdmissionRejected):
+                with controller.admit('b'):
+                    pass
+        with controller.admit('b'):
+            pass
+        self.assertEqual(controller.stats()['rejected']['rate_limited'], 0)
+
+    def test_releases_slot_on_error(self):
+        controller = AdmissionController(max_in_flight=1, rate=0, burst=0)
+        with self.assertRaises(RuntimeError):
+            with controller.admit('a'):
+                raise RuntimeError
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_deadline_exceeded(self):
+        controller = AdmissionController(max_in_flight=1, rate=0, burst=0)
+        with self.assertRaises(AdmissionRejected) as cm:
+            with controller.admit('a', deadline=time.time() - 1):
+                pass
+        self.assertEqual(cm.exception.reason, 'deadline_exceeded')
+        self.assertEqual(controller.stats()['rejected']['deadline_exceeded'], 1)
+
+    def test_forgets_idle_clients(self):
+        controller = AdmissionController(max_in_flight=10, rate=1000, burst=1, max_clients=2)
+        for key in ('a', 'b'):
+            with controller.admit(key):
+                pass
+        time.sleep(0.01)  # Both buckets refill
+        with controller.admit('c'):
+            pass
+        self.assertEqual(list(controller._buckets), ['c'])
+
+
+class FairSchedulerTests(SimpleTestCase):
+    """The scheduler runs without worker threads here; jobs are drawn with _next_job."""
+
+    def drain(self, scheduler):
+        order = []
+        with scheduler._condition:
+            job = scheduler._next_job()
+            while job is not None:
+                order.append(job.args[0])
+                job = scheduler._next_job()
+        return order
+
+    def test_weighted_round_robin_between_classes(self):
+        scheduler = FairScheduler({'interactive': 2, 'bulk': 1}, 'interactive', workers=0)
+        for i in range(3):
+            scheduler.submit('u', 'bulk', str, f'b{i}')
+            scheduler.submit('u', 'interactive', str, f'i{i}')
+        self.assertEqual(scheduler.queue_depth(), 6)
+        self.assertEqual(self.drain(scheduler), ['i0', 'b0', 'i1', 'i2', 'b1', 'b2'])
+
+    def test_round_robin_between_users(self):
+        scheduler = FairScheduler({'interactive': 1}, 'interactive', workers=0)
+        for i in range(3):
+            scheduler.submit('heavy', 'interactive', str, f'h{i}')
+        scheduler.submit('light', 'interactive', str, 'l0')
+        self.assertEqual(self.drain(scheduler), ['h0', 'l0', 'h1', 'h2'])
+
+    def test_cost_uses_deficit(self):
+        scheduler = FairScheduler({'interactive': 1}, 'interactive', workers=0)
+        scheduler.submit('batch', 'interactive', str, 'big', cost=3)
+        for i in range(3):
+            scheduler.submit('single', 'interactive', str, f's{i}')
+        self.assertEqual(self.drain(scheduler), ['s0', 's1', 'big', 's2'])
+
+    def test_unknown_class_uses_default(self):
+        scheduler = FairScheduler({'interactive': 1, 'bulk': 1}, 'bulk', workers=0)
+        self.assertEqual(scheduler.resolve_class('urgent'), 'bulk')
+        scheduler.submit('u', 'urgent', str, 'x')
+        self.assertEqual(scheduler.classes['bulk'].depth, 1)
+
+    def test_runs_jobs_on_workers(self):
+        scheduler = FairScheduler({'interactive': 1}, 'interactive', workers=1)
+        self.assertEqual(scheduler.run('u', 'interactive', sum, [1, 2, 3]), 6)
+        with self.assertRaises(ZeroDivisionError):
+            scheduler.run('u', 'interactive', divmod, 1, 0)
+
+
+@override_settings(INFERENCE_PRIORITY_CLASSES={'interactive': 8, 'bulk': 1},
+                   INFERENCE_DEFAULT_PRIORITY='interactive')
+class PriorityClassTests(SimpleTestCase):
+    def request(self, priority=None, is_staff=False):
+        headers = {'HTTP_X_PRIORITY_CLASS': priority} if priority else {}
+        request = RequestFactory().get('/', **headers)
+        request.user = SimpleNamespace(is_staff=is_staff)
+        return request
+
+    def test_endpoint_class_by_default(self):
+        self.assertEqual(priority_class(self.request()), 'interactive')
+        self.assertEqual(priority_class(self.request(), ceiling='bulk'), 'bulk')
+
+    def test_client_may_downgrade(self):
+        self.assertEqual(priority_class(self.request('bulk')), 'bulk')
+
+    def test_client_may_not_upgrade(self):
+        self.assertEqual(priority_class(self.request('interactive'), ceiling='bulk'), 'bulk')
+
+    def test_staff_and_trusted_may_upgrade(self):
+        self.assertEqual(priority_class(self.request('interactive', is_staff=True), ceiling='bulk'), 'interactive')
+        self.assertEqual(priority_class(self.request('interactive'), ceiling='bulk', trusted=True), 'interactive')
+
+    def test_unknown_class_ignored(self):
+        self.assertEqual(priority_class(self.request('urgent', is_staff=True), ceiling='bulk'), 'bulk')
+
+
+class CpuPlanTests(SimpleTestCase):
+    def test_reserve_cpus(self):
+        self.assertEqual(reserve_cpus([0, 1, 2, 3], 1), ([0, 1, 2], [3]))
+        self.assertEqual(reserve_cpus([0, 1, 2, 3], 0), ([0, 1, 2, 3], []))
+
+    def test_reserve_cpus_keeps_one_cpu(self):
+        self.assertEqual(reserve_cpus([0, 1], 5), ([0], [1]))
+        self.assertEqual(reserve_cpus([0], 2), ([0], []))
+
+    def test_partition_wraps_around(self):
+        self.assertEqual(partition([0, 1, 2], 2, 2), [[0, 1], [2, 0]])
+
+    def test_plan_automatic(self):
+        plan = plan_inference(list(range(8)))
+        self.assertEqual((plan.replicas, plan.threads_per_replica, plan.cpu_sets), (2, 4, None))
+
+    def test_plan_shares_cores_between_processes(self):
+        plan = plan_inference(list(range(8)), processes=4)
+        self.assertEqual((plan.replicas, plan.threads_per_replica), (1, 2))
+
+    def test_plan_fixed_replicas(self):
+        plan = plan_inference(list(range(8)), replicas=3)
+        self.assertEqual((plan.replicas, plan.threads_per_replica), (3, 2))
+
+    def test_plan_single_cpu(self):
+        plan = plan_inference([0], processes=4)
+        self.assertEqual((plan.replicas, plan.threads_per_replica), (1, 1))
+
+    def test_plan_pinned(self):
+        plan = plan_inference([0, 1, 2, 3], replicas=2, threads_per_replica=2, pin=True)
+        self.assertEqual(plan.cpu_sets, [[0, 1], [2, 3]])
+
+
+@unittest.skipUnless(HAS_TORCH, 'core.tiling needs torch')
+class TilingTests(SimpleTestCase):
+    def test_tile_positions(self):
+        from core.tiling import tile_positions
+        self.assertEqual(tile_positions(600, 256, 256), [0, 256, 344])
+        self.assertEqual(tile_positions(512, 256, 128), [0, 128, 256])
+        self.assertEqual(tile_positions(256, 256, 128), [0])
+
+    def test_vegetation_fractions(self):
+        import numpy as np
+
+        from core.tiling import TileGrid
+        rgb = np.zeros((512, 768, 3), dtype=np.uint8)  # Black: no vegetation
+        rgb[:256, :256] = (40, 180, 40)                # Green top-left tile
+        rgb[256:, 512:, 1] = 180
+        rgb[256:384, 512:] = (200, 40, 40)             # Bottom-right tile half red
+        grid = TileGrid(rgb, tile=256, stride=256)
+        fractions = grid.vegetation_fractions((20, 160), 0.15, 0.15)
+        np.testing.assert_allclose(fractions, [[1, 0, 0], [0, 0, 0.5]])
+        self.assertEqual(grid.vegetation_cells(0.5, (20, 160), 0.15, 0.15), [(0, 0), (1, 2)])
+        self.assertEqual(grid.bounds(1, 2), (512, 256, 768, 512))
+        self.assertEqual(grid.window(1, 2).shape, (256, 256, 3))
+
+    def test_summary_without_vegetation(self):
+        import numpy as np
+
+        from core.tiling import TileGrid, summarize_tiles
+        grid = TileGrid(np.zeros((256, 512, 3), dtype=np.uint8), tile=256, stride=256)
+        summary = summarize_tiles(grid, {}, 'v1')
+        self.assertEqual(summary['health_status'], 'no_vegetation')
+        self.assertEqual((summary['tiles_classified'], summary['tiles_skipped']), (0, 2))
+        self.assertEqual(summary['heatmap'], [[None, None]])
+
+
+class BulkHistoryTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.tomato = Plant.objects.create(name='Tomato')
+        self.potato = Plant.objects.create(name='Potato')
+        self.blight = Disease.objects.create(name='Late blight', plant=self.tomato)
+        self.records = [
+            DiseaseHistory.objects.create(user=self.user, plantID=self.tomato, status='active')
+            for _ in range(3)
+        ]
+
+    def test_bulk_edit_updates_records_and_writes_audit_rows(self):
+        first, second, _ = self.records
+        edits = [
+            {'historyID': first.pk, 'status': 'resolved'},
+            {'historyID': second.pk, 'plantID': self.potato.pk, 'diseaseID': self.blight.pk},
+        ]
+        self.assertEqual(apply_bulk_edits(self.user, edits), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'resolved')
+        self.assertEqual(first.plantID, self.tomato)
+        self.assertEqual((second.plantID, second.diseaseID, second.status), (self.potato, self.blight, 'active'))
+        self.assertEqual(
+            sorted(EditHistory.objects.filter(user=self.user).values_list('history_id', flat=True)),
+            [first.pk, second.pk],
+        )
+
+    def test_bulk_edit_with_missing_record_changes_nothing(self):
+        edits = [{'historyID': self.records[0].pk, 'status': 'resolved'}, {'historyID': 999999, 'status': 'resolved'}]
+        with self.assertRaises(ValidationError) as raised:
+            apply_bulk_edits(self.user, edits)
+        self.assertIn('historyID', raised.exception.detail)
+        self.assertFalse(DiseaseHistory.objects.filter(status='resolved').exists())
+        self.assertFalse(EditHistory.objects.exists())
+
+    def test_bulk_edit_with_missing_disease(self):
+        with self.assertRaises(ValidationError) as raised:
+            apply_bulk_edits(self.user, [{'historyID': self.records[0].pk, 'diseaseID': 999999}])
+        self.assertIn('diseaseID', raised.exception.detail)
+
+    def test_bulk_delete_removes_records_and_keeps_audit_rows(self):
+        first, second, third = self.records
+        apply_bulk_edits(self.user, [{'historyID': first.pk, 'status': 'resolved'}])
+        self.assertEqual(apply_bulk_deletes(self.user, [first.pk, second.pk, first.pk]), 2)
+        self.assertEqual(list(DiseaseHistory.objects.values_list('pk', flat=True)), [third.pk])
+        self.assertFalse(EditHistory.objects.exists())  # Cascaded with the record
+        self.assertEqual(
+            sorted(DeleteHistory.objects.filter(user=self.user).values_list('history_id', flat=True)),
+            [first.pk, second.pk],
+        )
+
+    def test_bulk_delete_with_missing_record_deletes_nothing(self):
+        with self.assertRaises(ValidationError):
+            apply_bulk_deletes(self.user, [self.records[0].pk, 999999])
+        self.assertEqual(DiseaseHistory.objects.count(), 3)
+        self.assertFalse(DeleteHistory.objects.exists())
+
+
+class DiseaseHistoryExportTests(TestCase):
+    def setUp(self):
+        user = create_user()
+        tomato = Plant.objects.create(name='Tomato')
+        blight = Disease.objects.create(name='Late blight', plant=tomato)
+        self.march = DiseaseHistory.objects.create(user=user, plantID=tomato, diseaseID=blight, status='active')
+        self.april = DiseaseHistory.objects.create(user=user, plantID=tomato, status='resolved')
+        # date_detected is auto_now_add, so backdate the rows with update()
+        DiseaseHistory.objects.filter(pk=self.march.pk).update(date_detected=datetime(2024, 3, 10, 12, tzinfo=timezone.utc))
+        DiseaseHistory.objects.filter(pk=self.april.pk).update(date_detected=datetime(2024, 4, 10, 12, tzinfo=timezone.utc))
+
+    def export(self, **params):
+        response = self.client.get(reverse('disease-history-export'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_by_default(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('disease-history.csv', response['Content-Disposition'])
+        lines = body.splitlines()
+        self.assertEqual(lines[0], 'historyID,user,plant_name,disease_name,status,date_detected,model_version')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(f'{self.march.pk},{self.march.user_id},Tomato,Late blight,active,'))
+        self.assertTrue(lines[2].startswith(f'{self.april.pk},{self.april.user_id},Tomato,,resolved,'))
+
+    def test_ndjson(self):
+        response, body = self.export(type='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['historyID'] for row in rows], [self.march.pk, self.april.pk])
+        self.assertEqual(rows[0]['disease_name'], 'Late blight')
+        self.assertIsNone(rows[1]['disease_name'])
+        self.assertTrue(rows[0]['date_detected'].startswith('2024-03-10T12:00:00'))
+
+    def test_date_range_is_inclusive(self):
+        _, body = self.export(type='ndjson', start_date='2024-04-10')
+        self.assertEqual([json.loads(line)['historyID'] for line in body.splitlines()], [self.april.pk])
+        _, body = self.export(type='ndjson', start_date='2024-03-01', end_date='2024-03-10')
+        self.assertEqual([json.loads(line)['historyID'] for line in body.splitlines()], [self.march.pk])
+        _, body = self.export(type='ndjson', end_date='2024-03-09')
+        self.assertEqual(body, '')
+
+    def test_rejects_unknown_type_and_bad_dates(self):
+        url = reverse('disease-history-export')
+        self.assertEqual(self.client.get(url, {'type': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start_date': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'end_date': 'yesterday'}).status_code, 400)
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.tomato = Plant.objects.create(name='Tomato')
+        self.blight = Disease.objects.create(name='Late blight', plant=self.tomato, image='disease_samples/blight.jpg')
+        Disease.objects.create(name='Leaf mold', plant=self.tomato)
+        self.record = DiseaseHistory.objects.create(
+            user=self.user, plantID=self.tomato, diseaseID=self.blight, status='active', model_version='v2'
+        )
+
+    def request(self, **params):
+        return Request(RequestFactory().get('/', params))
+
+    def test_all_fields_by_default(self):
+        data = DiseaseHistoryValuesSerializer(request=self.request()).data
+        self.assertEqual(len(data), 1)
+        self.assertEqual(list(data[0]), list(DiseaseHistoryValuesSerializer.fields))
+        self.assertEqual(
+            (data[0]['historyID'], data[0]['plant_name'], data[0]['disease_name'], data[0]['user']),
+            (self.record.pk, 'Tomato', 'Late blight', self.user.pk),
+        )
+
+    def test_sparse_fieldset_keeps_requested_order(self):
+        data = DiseaseHistoryValuesSerializer(request=self.request(fields='status, historyID,')).data
+        self.assertEqual(data, [{'status': 'active', 'historyID': self.record.pk}])
+
+    def test_unknown_field_is_rejected(self):
+        serializer = DiseaseHistoryValuesSerializer(request=self.request(fields='status,password'))
+        with self.assertRaises(ValidationError) as raised:
+            serializer.data
+        self.assertIn('password', str(raised.exception.detail['fields']))
+
+    def test_transform_runs_on_requested_column(self):
+        data = CropLibraryValuesSerializer(
+            Disease.objects.order_by('name'), request=self.request(fields='disease_name,sample_image_url')
+        ).data
+        self.assertEqual(data[0]['disease_name'], 'Late blight')
+        self.assertTrue(data[0]['sample_image_url'].startswith('http://testserver/'))
+        self.assertTrue(data[0]['sample_image_url'].endswith('disease_samples/blight.jpg'))
+        self.assertEqual(data[1], {'disease_name': 'Leaf mold', 'sample_image_url': None})
+
+
+@override_settings(
+    PREDICTION_JOB_BROKER='database',
+    PREDICTION_JOB_QUEUE_TIMEOUT=300,
+    PREDICTION_JOB_RUNNING_TIMEOUT=120,
+    PREDICTION_JOB_MAX_ATTEMPTS=2,
+    PREDICTION_JOB_RESULT_TTL=3600,
+    PREDICTION_JOB_CALLBACK_HOSTS=['hooks.example.com', 'localhost'],
+)
+class PredictionJobTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.job = jobs.submit_job(self.user, 'uploads/leaf.jpg', 'http://testserver/media/uploads/leaf.jpg',
+                                   'bulk', broker=jobs.DatabaseBroker())
+
+    def backdate_start(self, seconds):
+        PredictionJob.objects.filter(pk=self.job.pk).update(
+            started_at=datetime.now(timezone.utc) - timedelta(seconds=seconds)
+        )
+
+    def test_job_is_claimed_once(self):
+        self.assertEqual(jobs.DatabaseBroker().next_job_id(0), self.job.pk)
+        claimed = jobs.claim_job(self.job.pk, 'worker-a')
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), (PredictionJob.RUNNING, 'worker-a', 1))
+        self.assertIsNone(jobs.claim_job(self.job.pk, 'worker-b'))
+
+    def test_finish_stores_result(self):
+        claimed = jobs.claim_job(self.job.pk, 'worker-a')
+        self.assertTrue(jobs.finish_job(claimed, 'worker-a', result={'prediction': 'Tomato___healthy'}))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, PredictionJob.SUCCEEDED)
+        payload = jobs.job_payload(self.job)
+        self.assertEqual(payload['result'], {'prediction': 'Tomato___healthy'})
+        self.assertIsNotNone(payload['run_ms'])
+
+    def test_finish_records_error(self):
+        claimed = jobs.claim_job(self.job.pk, 'worker-a')
+        self.assertTrue(jobs.finish_job(claimed, 'worker-a', error='Unreadable image'))
+        self.assertEqual(jobs.job_payload(claimed)['error'], 'Unreadable image')
+        self.assertEqual(PredictionJob.objects.get(pk=self.job.pk).status, PredictionJob.FAILED)
+
+    def test_superseded_claim_cannot_finish(self):
+        stale_claim = jobs.claim_job(self.job.pk, 'worker-a')
+        self.backdate_start(600)
+        self.assertEqual(jobs.sweep_jobs()['requeued'], 1)
+        current_claim = jobs.claim_job(self.job.pk, 'worker-a')  # Same worker, new attempt
+        self.assertFalse(jobs.finish_job(stale_claim, 'worker-a', result={'stale': True}))
+        self.assertTrue(jobs.finish_job(current_claim, 'worker-a', result={'stale': False}))
+        self.assertEqual(PredictionJob.objects.get(pk=self.job.pk).result, {'stale': False})
+
+    def test_sweep_fails_job_after_max_attempts(self):
+        for _ in range(2):
+            jobs.claim_job(self.job.pk, 'worker-a')
+            self.backdate_start(600)
+            jobs.sweep_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, PredictionJob.FAILED)
+        self.assertEqual(self.job.attempts, 2)
+
+    def test_sweep_leaves_recent_running_job(self):
+        jobs.claim_job(self.job.pk, 'worker-a')
+        self.assertEqual(jobs.sweep_jobs(), {'expired': 0, 'failed': 0, 'requeued': 0, 'deleted': 0})
+
+    def test_sweep_expires_then_deletes(self):
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        PredictionJob.objects.filter(pk=self.job.pk).update(expires_at=past)
+        self.assertEqual(jobs.sweep_jobs()['expired'], 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, PredictionJob.EXPIRED)
+        self.assertIsNone(jobs.claim_job(self.job.pk, 'worker-a'))
+        PredictionJob.objects.filter(pk=self.job.pk).update(expires_at=past)
+        self.assertEqual(jobs.sweep_jobs()['deleted'], 1)
+        self.assertFalse(PredictionJob.objects.exists())
+
+    def test_callback_allowed(self):
+        self.assertTrue(jobs.callback_allowed('https://hooks.example.com/predictions'))
+        self.assertTrue(jobs.callback_allowed('http://HOOKS.example.com:8080/'))
+        self.assertFalse(jobs.callback_allowed('https://evil.example.com/'))
+        self.assertFalse(jobs.callback_allowed('ftp://hooks.example.com/'))
+        self.assertFalse(jobs.callback_allowed('https:///no-host'))
+        with override_settings(PREDICTION_JOB_CALLBACK_HOSTS=[]):
+            self.assertFalse(jobs.callback_allowed('https://hooks.example.com/'))
+
+    def test_callback_to_private_address_is_refused(self):
+        self.assertFalse(jobs.resolves_to_public_addresses('http://localhost/hook'))
+        self.assertFalse(jobs.resolves_to_public_addresses('http://10.0.0.5/hook'))
+        self.job.callback_url = 'http://localhost/hook'
+        with mock.patch.object(jobs.callback_opener, 'open') as opened:
+            jobs.send_callback(self.job)
+        opened.assert_not_called()
+
+
+@override_settings(FAST_PREDICT_TOKENS=['edge-secret', 'edge-next'], UPLOAD_MAX_BYTES=1024 * 1024, DEPLOYMENT_ROLE='all')
+class FastPredictTests(SimpleTestCase):
+    path = '/model/predict/fast/'
+
+    def post(self, body=b'', content_type='image/jpeg', token='edge-secret', query=''):
+        extra = {'HTTP_X_INTERNAL_TOKEN': token} if token is not None else {}
+        return RequestFactory().post(self.path + query, data=body, content_type=content_type, **extra)
+
+    def assertError(self, response, status_code):
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('error', json.loads(response.content))
+
+    def test_only_post(self):
+        self.assertError(handle_fast_predict(RequestFactory().get(self.path)), 405)
+
+    def test_requires_internal_token(self):
+        self.assertError(handle_fast_predict(self.post(token=None)), 401)
+        self.assertError(handle_fast_predict(self.post(token='wrong')), 401)
+        self.assertError(handle_fast_predict(self.post(token='')), 401)
+
+    def test_any_configured_token_is_accepted(self):
+        # Passes authorization and fails later, on the empty body
+        self.assertError(handle_fast_predict(self.post(token='edge-next', content_type='text/plain')), 415)
+
+    @override_settings(UPLOAD_MAX_BYTES=1000)
+    def test_body_too_large(self):
+        self.assertError(handle_fast_predict(self.post(b'\xff' * 1001)), 413)
+
+    def test_unsupported_content_type(self):
+        self.assertError(handle_fast_predict(self.post(png_bytes(256, 256), content_type='image/png')), 415)
+
+    def test_raw_input_must_be_exact_size(self):
+        response = handle_fast_predict(self.post(b'\x00' * (RAW_RGB_BYTES - 1), content_type='application/octet-stream'))
+        self.assertError(response, 400)
+
+    def test_bad_k(self):
+        request = self.post(b'\x00' * RAW_RGB_BYTES, content_type='application/octet-stream', query='?k=0')
+        self.assertError(handle_fast_predict(request), 400)
+
+    def test_undecodable_jpeg(self):
+        self.assertError(handle_fast_predict(self.post(b'\xff\xd8not a jpeg')), 400)
+
+    def test_middleware_passes_other_paths(self):
+        middleware = FastPredictMiddleware(lambda request: HttpResponse('next'))
+        self.assertEqual(middleware(RequestFactory().get('/model/history/')).content, b'next')
+        self.assertEqual(middleware(RequestFactory().get(self.path)).status_code, 405)
+
+    def test_middleware_unused_without_tokens(self):
+        with override_settings(FAST_PREDICT_TOKENS=[]), self.assertRaises(MiddlewareNotUsed):
+            FastPredictMiddleware(lambda request: HttpResponse())
+        with override_settings(DEPLOYMENT_ROLE='api'), self.assertRaises(MiddlewareNotUsed):
+            FastPredictMiddleware(lambda request: HttpResponse())
+
+
+class QualityGateTests(SimpleTestCase):
+    def setUp(self):
+        self.gate = QualityGate(
+            thumbnail_size=128,
+            min_resolution=(224, 224),
+            min_brightness=40,
+            max_clipped_fraction=0.5,
+            min_sharpness=50,
+            min_vegetation_coverage=0.2,
+            vegetation_hue_range=(60, 180),
+            vegetation_min_saturation=0.2,
+            vegetation_min_value=0.2,
+        )
+        self.leaf = checkerboard(512, (40, 180, 40), (20, 100, 20))  # Sharp, well exposed, all green
+
+    def check(self, rgb, **kwargs):
+        return self.gate.check(image_file(rgb, **kwargs))
+
+    def test_good_image_passes(self):
+        result = self.check(self.leaf)
+        self.assertTrue(result)
+        self.assertEqual(result.reasons, [])
+        self.assertEqual((result.metrics['width'], result.metrics['height']), (512, 512))
+        self.assertGreater(result.metrics['vegetation_coverage'], 0.9)
+
+    def test_jpeg_passes(self):
+        self.assertEqual(self.check(self.leaf, format='JPEG').reasons, [])
+
+    def test_low_resolution(self):
+        self.assertEqual(self.check(checkerboard(64, (40, 180, 40), (20, 100, 20))).reasons, ['low_resolution'])
+
+    def test_blurry(self):
+        self.assertEqual(self.check(np.full((512, 512, 3), (40, 180, 40))).reasons, ['blurry'])
+
+    def test_no_vegetation(self):
+        self.assertEqual(self.check(checkerboard(512, (180, 40, 40), (100, 20, 20))).reasons, ['no_vegetation'])
+
+    def test_black_image_fails_several_checks(self):
+        result = self.check(np.zeros((512, 512, 3)))
+        self.assertEqual(result.reasons, ['too_dark', 'underexposed', 'blurry', 'no_vegetation'])
+
+    def test_white_image_is_overexposed(self):
+        self.assertEqual(self.check(np.full((512, 512, 3), 255)).reasons, ['overexposed', 'blurry', 'no_vegetation'])
+
+    def test_unreadable(self):
+        result = self.gate.check(io.BytesIO(b'not an image'))
+        self.assertFalse(result)
+        self.assertEqual(result.reasons, ['unreadable'])
+        self.assertEqual(result.metrics, {})
+
+    def test_error_body_and_stats(self):
+        result = self.check(np.zeros((512, 512, 3)))
+        self.check(self.leaf)
+        error = result.as_error()
+        self.assertEqual([reason['code'] for reason in error['reasons']], result.reasons)
+        self.assertTrue(all(reason['message'] for reason in error['reasons']))
+        stats = self.gate.stats()
+        self.assertEqual(stats['checked'], 2)
+        self.assertEqual((stats['rejections']['too_dark'], stats['rejections']['low_resolution']), (1, 0))
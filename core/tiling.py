@@ -0,0 +1,153 @@
+"""
+Tiled inference for high-resolution drone and field-camera images.
+
+The image is decoded once into an RGB array (downscaled to TILED_MAX_SIDE) and cut
+into overlapping model-sized tiles. Tiles are zero-copy views of that array
+(sliding_window_view); only the tiles that pass the vegetation filter are copied,
+one batch at a time, into the model input. The filter computes the vegetation mask
+on a strided sample of the image and sums each tile's share from an integral image,
+so skipping bare soil and sky costs almost nothing.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
+from core.cascade import is_healthy
+from core.image_quality import vegetation_mask
+from core.model_utils import parse_prediction
+
+TILE_SIZE = 256  # The model input size
+
+
+def load_rgb(image_file, max_side, min_side=TILE_SIZE):
+    """
+    Decodes an image into one H x W x 3 uint8 array, downscaled so its longer side
+    is at most `max_side` and upscaled when its shorter side is below `min_side`.
+    """
+    with Image.open(image_file) as image:
+        image.draft('RGB', (max_side, max_side))  # JPEG: decode at reduced scale when much larger
+        image = image.convert('RGB')
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    if min(image.size) < min_side:
+        scale = min_side / min(image.size)
+        image = image.resize((max(min_side, round(image.width * scale)), max(min_side, round(image.height * scale))))
+    return np.asarray(image)
+
+
+def tile_positions(length, tile, stride):
+    """Start offsets of tiles covering [0, length): every `stride`, plus one flush with the end."""
+    last = length - tile
+    positions = list(range(0, last + 1, stride))
+    if positions[-1] != last:
+        positions.append(last)
+    return positions
+
+
+class TileGrid:
+    """
+    Overlapping tile x tile windows over an RGB array, addressed by (row, col).
+    """
+    def __init__(self, rgb, tile=TILE_SIZE, stride=TILE_SIZE):
+        self.rgb = rgb
+        self.tile = tile
+        self.stride = stride
+        self.ys = tile_positions(rgb.shape[0], tile, stride)
+        self.xs = tile_positions(rgb.shape[1], tile, stride)
+        # (H - tile + 1, W - tile + 1, tile, tile, 3) view: every possible window, nothing copied
+        self._windows = sliding_window_view(rgb, (tile, tile, 3))[:, :, 0]
+
+    @property
+    def shape(self):
+        return len(self.ys), len(self.xs)
+
+    def window(self, row, col):
+        """The tile at (row, col), a view into the image array."""
+        return self._windows[self.ys[row], self.xs[col]]
+
+    def bounds(self, row, col):
+        """(x0, y0, x1, y1) of the tile in image pixels."""
+        return self.xs[col], self.ys[row], self.xs[col] + self.tile, self.ys[row] + self.tile
+
+    def vegetation_fractions(self, hue_range, min_saturation, min_value, step=4):
+        """Share of vegetation pixels in each tile (rows x cols), from every `step`-th pixel."""
+        mask = vegetation_mask(self.rgb[::step, ::step], hue_range, min_saturation, min_value)
+        integral = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int64)
+        integral[1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+
+        y0 = np.array(self.ys) // step
+        y1 = np.minimum((np.array(self.ys) + self.tile) // step, mask.shape[0])
+        x0 = np.array(self.xs) // step
+        x1 = np.minimum((np.array(self.xs) + self.tile) // step, mask.shape[1])
+        counts = (integral[y1[:, None], x1[None, :]] - integral[y0[:, None], x1[None, :]]
+                  - integral[y1[:, None], x0[None, :]] + integral[y0[:, None], x0[None, :]])
+        areas = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+        return counts / np.maximum(areas, 1)
+
+    def vegetation_cells(self, min_fraction, hue_range, min_saturation, min_value):
+        """(row, col) of the tiles whose vegetation share is at least `min_fraction`, row by row."""
+        fractions = self.vegetation_fractions(hue_range, min_saturation, min_value)
+        return [(int(row), int(col)) for row, col in zip(*np.nonzero(fractions >= min_fraction))]
+
+    def batches(self, cells, batch_size):
+        """Yields (cells, B x tile x tile x 3 uint8 array) for consecutive chunks of `cells`."""
+        for start in range(0, len(cells), batch_size):
+            chunk = cells[start:start + batch_size]
+            yield chunk, np.stack([self.window(row, col) for row, col in chunk])
+
+
+def summarize_tiles(grid, results, model_version):
+    """
+    Builds the tiled prediction response from {(row, col): (label, score, disease_score)}:
+    a rows x cols heatmap of disease probability and top labels (None for skipped tiles),
+    and one finding per predicted disease with its tile count, share of the classified
+    tiles, scores and bounding box, most widespread first. When no tile had enough
+    vegetation to classify, health_status is 'no_vegetation' rather than 'Healthy'.
+    """
+    rows, cols = grid.shape
+    heatmap = [[None] * cols for _ in range(rows)]
+    labels = [[None] * cols for _ in range(rows)]
+    findings = {}
+    for (row, col), (label, score, disease_score) in results.items():
+        heatmap[row][col] = round(disease_score, 4)
+        labels[row][col] = label
+        if is_healthy(label):
+            continue
+        finding = findings.setdefault(label, {'scores': [], 'bounds': []})
+        finding['scores'].append(score)
+        finding['bounds'].append(grid.bounds(row, col))
+
+    summary = []
+    for label, finding in findings.items():
+        parsed = parse_prediction(label)
+        bounds = np.array(finding['bounds'])
+        summary.append({
+            'prediction': label,
+            'crop': parsed['crop'],
+            'disease': parsed['disease'],
+            'tiles': len(finding['scores']),
+            'coverage': round(len(finding['scores']) / len(results), 4),
+            'mean_score': round(float(np.mean(finding['scores'])), 4),
+            'max_score': round(max(finding['scores']), 4),
+            'bbox': [int(bounds[:, 0].min()), int(bounds[:, 1].min()),
+                     int(bounds[:, 2].max()), int(bounds[:, 3].max())],
+        })
+    summary.sort(key=lambda finding: finding['tiles'], reverse=True)
+    if not results:
+        health_status = 'no_vegetation'
+    else:
+        health_status = 'Diseased' if summary else 'Healthy'
+
+    return {
+        'model_version': model_version,
+        'health_status': health_status,
+        'image_size': [grid.rgb.shape[1], grid.rgb.shape[0]],
+        'tile_size': grid.tile,
+        'stride': grid.stride,
+        'grid': [rows, cols],
+        'tiles_classified': len(results),
+        'tiles_skipped': rows * cols - len(results),
+        'findings': summary,
+        'heatmap': heatmap,
+        'labels': labels,
+    }
@@ -0,0 +1,193 @@
+"""
+Helpers shared by the training, calibration and evaluation management commands.
+"""
+import logging
+import os
+import statistics
+import time
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from torchvision import datasets, transforms
+
+from core.model_utils import classes
+
+logger = logging.getLogger(__name__)
+
+
+def folder_class_indices(dataset, class_names=classes):
+    """Maps the folder indices of an ImageFolder to indices in `class_names` (a model's output order)."""
+    unknown = [name for name in dataset.classes if name not in class_names]
+    if unknown:
+        raise ValueError(f"Dataset folders don't match any model class: {', '.join(unknown)}")
+    return {idx: class_names.index(name) for name, idx in dataset.class_to_idx.items()}
+
+
+def image_folder_dataset(root, size=256, extra_transforms=(), target_transform=None, class_names=classes):
+    """
+    Loads an ImageFolder dataset whose sub-folders are named after `class_names`
+    (e.g. root/Apple___Black_rot/*.jpg) and labels images with their index in `class_names`,
+    so labels line up with the model outputs whatever folders are present.
+    """
+    transform = transforms.Compose([
+        transforms.Resize((size, size)),
+        transforms.ToTensor(),
+        *extra_transforms,
+    ])
+    dataset = datasets.ImageFolder(root, transform=transform)
+
+    folder_to_class = folder_class_indices(dataset, class_names)
+    if target_transform is None:
+        dataset.target_transform = folder_to_class.__getitem__
+    else:
+        dataset.target_transform = lambda idx: target_transform(folder_to_class[idx])
+    return dataset
+
+
+class DeviceLoader:
+    """Wraps a DataLoader and moves every (images, labels) batch to `device`."""
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = device
+
+    def __iter__(self):
+        for images, labels in self.loader:
+            yield images.to(self.device), labels.to(self.device)
+
+    def __len__(self):
+        return len(self.loader)
+
+
+def data_loader(dataset, batch_size=64, shuffle=False, num_workers=2):
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle,
+                      num_workers=num_workers, pin_memory=torch.cuda.is_available())
+
+
+@torch.no_grad()
+def evaluate(model, loader):
+    """Runs validation_step over a loader and aggregates with validation_epoch_end."""
+    model.eval()
+    return model.validation_epoch_end([model.validation_step(batch) for batch in loader])
+
+
+def fit_one_cycle(epochs, max_lr, model, train_loader, val_loader,
+                  weight_decay=1e-4, grad_clip=0.1, opt_func=torch.optim.Adam, train_step=None,
+                  autocast_dtype=None, checkpoint_path=None):
+    """
+    Trains with a one-cycle learning-rate schedule using the model's training_step
+    (or `train_step(batch)`, e.g. a distillation loss), validation_step and epoch_end.
+    Returns the per-epoch results.
+
+    `autocast_dtype` (e.g. torch.bfloat16) runs the forward passes under autocast.
+    With `checkpoint_path`, model/optimizer/scheduler state is saved after every epoch
+    and training resumes from it if the file already exists.
+    """
+    train_step = train_step or model.training_step
+    history = []
+    optimizer = opt_func(model.parameters(), max_lr, weight_decay=weight_decay)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(
+        optimizer, max_lr, epochs=epochs, steps_per_epoch=len(train_loader)
+    )
+    device_type = next(model.parameters()).device.type
+
+    start_epoch = 0
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        # Our own file (includes scheduler state), not an untrusted artifact
+        checkpoint = torch.load(checkpoint_path, map_location=next(model.parameters()).device, weights_only=False)
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        start_epoch, history = checkpoint['epoch'] + 1, checkpoint['history']
+        logger.info("Resuming training from %s at epoch %s", checkpoint_path, start_epoch)
+
+    for epoch in range(start_epoch, epochs):
+        model.train()
+        train_losses, lrs = [], []
+        for batch in train_loader:
+            with torch.autocast(device_type, dtype=autocast_dtype, enabled=autocast_dtype is not None):
+                loss = train_step(batch)
+            train_losses.append(loss.detach())
+            loss.backward()
+            if grad_clip:
+                nn.utils.clip_grad_value_(model.parameters(), grad_clip)
+            optimizer.step()
+            optimizer.zero_grad()
+            lrs.append(optimizer.param_groups[0]['lr'])
+            scheduler.step()
+
+        result = evaluate(model, val_loader)
+        result['train_loss'] = torch.stack(train_losses).mean().item()
+        result['lrs'] = lrs
+        model.epoch_end(epoch, result)
+        history.append(result)
+
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, {
+                'model': model.state_dict(),
+                'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(),
+                'epoch': epoch,
+                'history': history,
+            })
+    return history
+
+
+def save_checkpoint(path, state):
+    """Writes a checkpoint atomically, so an interrupted save never corrupts the last good one."""
+    tmp_path = f"{path}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def measure_latency(model, input_size=256, runs=30, batch_size=1):
+    """Median wall time (seconds) of a forward pass on a random batch, after one warm-up pass."""
+    device = next(model.parameters()).device
+    images = torch.rand(batch_size, 3, input_size, input_size, device=device)
+    timings = []
+    model.eval()
+    with torch.inference_mode():
+        model(images)
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(images)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def count_flops(model, input_size=256, in_channels=3):
+    """
+    Counts multiply-accumulates of Conv2d and Linear layers for one image,
+    using forward hooks on a dummy input.
+    """
+    total = 0
+
+    def conv_hook(module, inputs, output):
+        nonlocal total
+        kernel = module.kernel_size[0] * module.kernel_size[1] * (module.in_channels // module.groups)
+        total += output.numel() * kernel
+
+    def linear_hook(module, inputs, output):
+        nonlocal total
+        total += output.numel() * module.in_features
+
+    hooks = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            hooks.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            hooks.append(module.register_forward_hook(linear_hook))
+
+    was_training = model.training
+    model.eval()
+    device = next(model.parameters()).device
+    with torch.no_grad():
+        model(torch.zeros(1, in_channels, input_size, input_size, device=device))
+    model.train(was_training)
+    for hook in hooks:
+        hook.remove()
+    return total
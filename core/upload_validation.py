@@ -0,0 +1,138 @@
+"""
+Pre-decode validation of uploaded images.
+
+The format is sniffed from the magic bytes (the client's Content-Type is not
+trusted) and the dimensions are read from the PNG IHDR chunk or the JPEG SOF
+segment, so oversized or malformed uploads are rejected before Pillow decodes
+a single pixel. Image.MAX_IMAGE_PIXELS is set to the same pixel budget as a
+second line of defence for any code path that opens images directly.
+"""
+import logging
+import struct
+
+from django.conf import settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SOI = b'\xff\xd8'
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # By IHDR colour type
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}  # DHT, JPG and DAC share the range
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}  # TEM, RSTn: no length field
+
+
+class ImageHeader:
+    """
+    Format and geometry of an image, read from its header.
+    """
+    def __init__(self, format, width, height, channels, bit_depth):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.bit_depth = bit_depth
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    def decode_bytes(self):
+        """Estimated memory to decode the image and convert it to RGB, as the predict pipeline does."""
+        bytes_per_sample = (self.bit_depth + 7) // 8
+        return self.pixels * (self.channels * bytes_per_sample + 3)
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError('truncated header')
+    return data
+
+
+def _png_header(f):
+    # Signature, then the IHDR chunk: length, type, width, height, bit depth, colour type
+    length, chunk_type, width, height, bit_depth, color_type = struct.unpack('>I4sIIBB', _read_exact(f, 18))
+    if chunk_type != b'IHDR' or color_type not in PNG_CHANNELS:
+        raise ValueError('invalid IHDR chunk')
+    return ImageHeader('png', width, height, PNG_CHANNELS[color_type], bit_depth)
+
+
+def _jpeg_header(f, max_scan_bytes):
+    scanned = len(JPEG_SOI)
+    while scanned < max_scan_bytes:
+        if _read_exact(f, 1) != b'\xff':
+            raise ValueError('invalid marker')
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:  # Fill bytes
+            marker = _read_exact(f, 1)[0]
+        scanned += 2
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # EOI or start of scan before any frame header
+            raise ValueError('no frame header')
+
+        (length,) = struct.unpack('>H', _read_exact(f, 2))
+        if length < 2:
+            raise ValueError('invalid segment length')
+        if marker in JPEG_SOF_MARKERS:
+            precision, height, width, components = struct.unpack('>BHHB', _read_exact(f, 6))
+            if not height:
+                raise ValueError('height defined by DNL is not supported')
+            return ImageHeader('jpeg', width, height, components, precision)
+        f.seek(length - 2, 1)
+        scanned += length
+    raise ValueError('frame header not found')
+
+
+def read_image_header(f, max_scan_bytes):
+    """
+    Reads the format and dimensions of a PNG or JPEG file object without decoding it.
+    Raises ValueError for anything else. The file position is restored.
+    """
+    position = f.tell()
+    try:
+        magic = f.read(len(PNG_SIGNATURE))
+        if magic == PNG_SIGNATURE:
+            return _png_header(f)
+        if magic.startswith(JPEG_SOI):
+            f.seek(position + len(JPEG_SOI))
+            return _jpeg_header(f, max_scan_bytes)
+        raise ValueError('not a PNG or JPEG file')
+    except struct.error:
+        raise ValueError('truncated header')
+    finally:
+        f.seek(position)
+
+
+def validate_upload(upload):
+    """
+    Validates an uploaded image from its size and header only.
+    Returns its ImageHeader, or raises a ValidationError with a reason code.
+    """
+    if upload.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            f"Image is too large ({upload.size} bytes, max {settings.UPLOAD_MAX_BYTES}).", code='too_many_bytes'
+        )
+    try:
+        header = read_image_header(upload, settings.UPLOAD_HEADER_SCAN_BYTES)
+    except (OSError, ValueError) as e:
+        logger.warning("Rejected upload %s: %s (client content type %s)", upload.name, e, upload.content_type)
+        raise ValidationError("Unsupported file format, only JPEG and PNG images are accepted.", code='unsupported_format')
+
+    if not header.width or not header.height:
+        raise ValidationError("Image has no pixels.", code='empty_image')
+    if header.pixels > settings.UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f"Image is {header.width}x{header.height}, more than {settings.UPLOAD_MAX_PIXELS} pixels.",
+            code='too_many_pixels'
+        )
+    if header.decode_bytes() > settings.UPLOAD_MAX_DECODE_BYTES:
+        raise ValidationError("Image would need too much memory to decode.", code='decode_memory_limit')
+    return header
+
+
+def configure_pillow():
+    """Makes Pillow refuse to decode (DecompressionBombError) images far beyond the upload pixel budget."""
+    Image.MAX_IMAGE_PIXELS = settings.UPLOAD_MAX_PIXELS
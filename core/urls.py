@@ -1,19 +1,89 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.urls import path
+from django.utils.module_loading import import_string
 from .views import *
 
-urlpatterns = [
+
+def lazy_view(dotted_path, is_async=False):
+    """
+    Returns a view that imports the view at `dotted_path` (a class-based view,
+    or an async function view with `is_async`) on its first call.
+    Keeps torch (imported by core.predict_views) out of the URLconf import; server
+    processes that serve inference have already imported it at startup (core.apps.start_inference).
+    """
+    view = None
+
+    def load():
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path)
+            if not is_async:
+                view = view.as_view()
+        return view
+
+    if is_async:
+        async def dispatch(request, *args, **kwargs):
+            if view is None:
+                # The import loads torch and the model: do it on a thread, not on the event loop
+                await sync_to_async(load)()
+            return await view(request, *args, **kwargs)
+    else:
+        def dispatch(request, *args, **kwargs):
+            return load()(request, *args, **kwargs)
+
+    dispatch.csrf_exempt = True  # Like APIView.as_view(); checked before the real view is imported
+    return dispatch
+
+
+SERVES_INFERENCE = settings.DEPLOYMENT_ROLE in ('all', 'inference')
+SERVES_API = settings.DEPLOYMENT_ROLE in ('all', 'api')
+
+inference_urlpatterns = [
     # Predict Image View
     # Route to handle the image prediction process. 
     # Accepts an image upload and returns the prediction 
     # for the plant's health condition and disease.
-    path('predict/', PredictImageView.as_view(), name='predict-image'),
-    
+    path('predict/', lazy_view('core.predict_views.PredictImageView'),
+         name='predict-image'),
+
+    # Async variant of predict/ for ASGI deployments (same request and response format,
+    # bearer token required). Uploads, queueing, DB writes and email don't hold a thread.
+    path('predict/async/', lazy_view('core.predict_views.predict_image_async', is_async=True),
+         name='predict-image-async'),
+
+    # Tiled prediction for high-resolution drone and field-camera images (same upload field as predict/).
+    # Returns a per-tile disease heatmap and aggregated findings instead of one prediction.
+    path('predict/tiled/', lazy_view('core.predict_views.PredictTiledView'), name='predict-image-tiled'),
+
+    # Route to inspect inference load for this worker (admin only).
+    # GET: Admission counters and per-priority-class queue depth and wait times.
+    path('inference/stats/', lazy_view('core.predict_views.InferenceStatsAPIView'), name='inference-stats'),
+]
+
+api_urlpatterns = [
+    # Asynchronous prediction jobs (submit-and-poll). Jobs are run by `manage.py run_prediction_worker`.
+    # POST jobs/: image upload (+ optional callback_url) -> 202 with job_id and status_url.
+    # GET jobs/<job_id>/: status, timings and the result once finished.
+    path('jobs/', PredictionJobSubmitAPIView.as_view(), name='prediction-job-submit'),
+    path('jobs/<uuid:job_id>/', PredictionJobDetailAPIView.as_view(), name='prediction-job-detail'),
+
     # Disease History Views
     # Route to list all disease history records or create a new disease history record.
     # GET: List all records.
     # POST: Create a new disease history record.
     path('disease-history/', DiseaseHistoryListCreateAPIView.as_view(), name='disease-history-list'),
     
+    # Route to stream the disease history as CSV or NDJSON.
+    # GET: ?type=csv|ndjson, optional ?start_date= and ?end_date= (YYYY-MM-DD).
+    path('disease-history/export/', DiseaseHistoryExportAPIView.as_view(), name='disease-history-export'),
+
+    # Routes to edit or delete many disease history records in one transaction.
+    # POST bulk-edit: {"edits": [{"historyID": 1, "status": "Healthy"}, ...]}
+    # POST bulk-delete: {"historyIDs": [1, 2, 3]}
+    path('disease-history/bulk-edit/', DiseaseHistoryBulkEditAPIView.as_view(), name='disease-history-bulk-edit'),
+    path('disease-history/bulk-delete/', DiseaseHistoryBulkDeleteAPIView.as_view(), name='disease-history-bulk-delete'),
+
     # Route to view, update, or delete a specific disease history record.
     # GET: Retrieve a disease history record by its primary key (pk).
     # PUT: Update a disease history record.
@@ -56,3 +126,5 @@ urlpatterns = [
 
     path('crop-library/', CropLibraryListAPIView.as_view(), name='disease-sample-list'),
 ]
+
+urlpatterns = (inference_urlpatterns if SERVES_INFERENCE else []) + (api_urlpatterns if SERVES_API else [])
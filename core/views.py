@@ -1,147 +1,130 @@
-import os
 import logging
 from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.core.files.storage import default_storage
 
-from .email_utils import send_detection_report_email
+from .export_utils import EXPORT_FORMATS, export_history_rows
+from .bulk_utils import apply_bulk_edits, apply_bulk_deletes
+from .fast_serializers import *
+from .renderers import FAST_RENDERER_CLASSES
+from .image_quality import store_upload
+from .jobs import job_payload, submit_job
+from .scheduler import priority_class
 from .models import *
 from .serializers import *
-from .model_utils import *
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-# Load the plant disease detection model
-model = load_model()
 
-class PredictImageView(APIView):
+# ---- Prediction jobs ----
+class PredictionJobSubmitAPIView(APIView):
     """
-    View for predicting plant disease from an uploaded image.
-    - Validates image format and quality
-    - Predicts the disease and sends an email report
+    Submit an image for asynchronous prediction.
+    - Validates and stores the upload, then returns 202 with the job ID immediately
+    - The result is computed by an inference worker (run_prediction_worker) and
+      can be polled at the status URL or POSTed to the optional callback_url
     """
-    def post(self, request, format=None):
-        serializer = ImageUploadSerializer(data=request.data)
+    permission_classes = [IsAuthenticated]
 
-        # Validate image upload
-        if serializer.is_valid():
-            image = serializer.validated_data['image']
-
-            # Save the uploaded image
-            filename = default_storage.save(f"detection/{image.name}", image)
-            image_path = os.path.join(settings.MEDIA_ROOT, filename)
-            image_url = request.build_absolute_uri(settings.MEDIA_URL + filename)
-
-            # Check the quality of the uploaded image
-            if not is_image_quality_sufficient(image_path):
-                logging.warning(f"Image quality insufficient: {image.name}")
-                return Response(
-                    {"error": "Image quality insufficient, please upload a clearer image."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Process the image and predict the disease
-            try:
-                img_tensor = preprocess_image(image_path)
-                prediction = predict_image(img_tensor, model)
-
-                # Parse the prediction into crop and disease
-                parsed_prediction = parse_prediction(prediction)
-                crop = parsed_prediction["crop"]
-                disease = parsed_prediction["disease"]
-
-                # Determine health status based on the prediction
-                if disease == "Healthy":
-                    health_status = "Healthy"
-                    disease_name = None
-                    message = "The plant is healthy."
-                elif disease == "Unknown":
-                    health_status = "Unhealthy"
-                    disease_name = None
-                    message = "The plant is not healthy, but the disease could not be identified."
-                else:
-                    health_status = "Unhealthy"
-                    disease_name = disease
-                    message = f"The plant is not healthy and is affected by {disease}."
+    def post(self, request):
+        serializer = PredictionJobSubmitSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning("Invalid prediction job submission: %s", serializer.errors)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        quality, filename = store_upload(serializer.validated_data['image'])
+        if not quality:
+            return Response(quality.as_error(), status=status.HTTP_400_BAD_REQUEST)
+
+        job = submit_job(
+            request.user,
+            filename,
+            request.build_absolute_uri(settings.MEDIA_URL + filename),
+            priority_class(request, ceiling=settings.INFERENCE_JOB_PRIORITY),
+            serializer.validated_data['callback_url'],
+        )
+        status_url = request.build_absolute_uri(reverse('prediction-job-detail', args=[job.jobID]))
+        return Response(
+            {**job_payload(job), 'status_url': status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url},
+        )
+
+
+class PredictionJobDetailAPIView(APIView):
+    """
+    Poll an asynchronous prediction job: status, timings and, once finished, the result
+    (same fields as the synchronous predict response) or the error.
+    """
+    permission_classes = [IsAuthenticated]
 
-                try:
-                    plant = Plant.objects.get(name=crop)
-                except Plant.DoesNotExist:
-                    logging.error(f"Plant not found in DB: {crop}")
-                    return Response({"error": f"Plant '{crop}' not found in database."}, status=404)
-                
-                if disease_name:
-                    try:
-                        disease_obj = Disease.objects.get(name=disease_name, plant=plant)
-                    except Disease.DoesNotExist:
-                        logging.error(f"Disease '{disease_name}' not found for plant '{plant.name}'")
-                        return Response({"error": f"Disease '{disease_name}' not found for plant '{plant.name}'."}, status=404)
-                else:
-                    disease_obj = None  # If healthy or unknown
-
-                # Save the disease detection history to the database
-                DiseaseHistory.objects.create(
-                    user=request.user,
-                    plantID=plant, 
-                    diseaseID=disease_obj,
-                    status=health_status,
-                )
-                # Send email with detection results
-                try:
-                    send_detection_report_email(
-                        user=request.user,
-                        crop=crop,
-                        disease_name=disease_name,
-                        health_status=health_status,
-                        message=message,
-                        image_url=image_url
-                    )
-                except Exception as e:
-                    logging.error(f"Failed to send detection email: {str(e)}")
-
-                # Return the prediction result as a response
-                return Response({
-                    'condition_status': health_status,
-                    'crop':crop,
-                    'disease_name': disease_name,
-                    'prediction_raw': prediction,
-                    'message': message,
-                    'image_url': image_url
-                })
-
-            except Exception as e:
-                logging.error(f"Error during prediction: {str(e)}")
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # If the serializer is invalid, return the errors
-        logging.warning(f"Invalid image upload: {serializer.errors}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    def get(self, request, job_id):
+        job = get_object_or_404(PredictionJob, jobID=job_id, user=request.user)
+        return Response(job_payload(job))
 
 
 # ---- DiseaseHistory ----
 class DiseaseHistoryListCreateAPIView(APIView):
     """
     List and create disease history records.
+    GET supports sparse fieldsets via ?fields=.
     """
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        records = DiseaseHistory.objects.all()
-        serializer = DiseaseHistorySerializer(records, many=True)
+        serializer = DiseaseHistoryValuesSerializer(request=request)
         return Response(serializer.data)
 
     def post(self, request):
         serializer = DiseaseHistorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Created new disease history record: {serializer.data}")
+            logger.info("Created new disease history record: %s", serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        logging.warning(f"Failed to create disease history: {serializer.errors}")
+        logger.warning("Failed to create disease history: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DiseaseHistoryExportAPIView(APIView):
+    """
+    Stream the disease history as CSV or NDJSON.
+    - ?type=csv|ndjson selects the output format (default: csv)
+    - ?start_date=YYYY-MM-DD and ?end_date=YYYY-MM-DD limit the date range (inclusive)
+    """
+    def get(self, request):
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported export type '{export_type}'. Use one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates = {}
+        for param in ('start_date', 'end_date'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    dates[param] = parse_date(value)
+                except ValueError:
+                    dates[param] = None
+                if dates[param] is None:
+                    return Response({"error": f"Invalid {param} '{value}', expected YYYY-MM-DD."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, stream = EXPORT_FORMATS[export_type]
+        rows = export_history_rows(**dates)
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="disease-history.{export_type}"'
+        logger.info("Streaming disease history export as %s", export_type)
+        return response
+
+
 class DiseaseHistoryDetailAPIView(APIView):
     """
     View, update, or delete a specific disease history record.
@@ -156,35 +139,69 @@ class DiseaseHistoryDetailAPIView(APIView):
         serializer = DiseaseHistorySerializer(record, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Updated disease history record {pk}: {serializer.data}")
+            logger.info("Updated disease history record %s: %s", pk, serializer.data)
             return Response(serializer.data)
-        logging.warning(f"Failed to update disease history {pk}: {serializer.errors}")
+        logger.warning("Failed to update disease history %s: %s", pk, serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         record = get_object_or_404(DiseaseHistory, pk=pk)
         record.delete()
-        logging.info(f"Deleted disease history record {pk}")
+        logger.info("Deleted disease history record %s", pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class DiseaseHistoryBulkEditAPIView(APIView):
+    """
+    Edit many disease history records in one transaction.
+    Records an EditHistory row for every edited record.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkHistoryEditSerializer(data=request.data)
+        if serializer.is_valid():
+            updated = apply_bulk_edits(request.user, serializer.validated_data['edits'])
+            return Response({"updated": updated})
+        logger.warning("Failed to bulk edit disease history: %s", serializer.errors)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DiseaseHistoryBulkDeleteAPIView(APIView):
+    """
+    Delete many disease history records in one transaction.
+    Records a DeleteHistory row for every deleted record.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkHistoryDeleteSerializer(data=request.data)
+        if serializer.is_valid():
+            deleted = apply_bulk_deletes(request.user, serializer.validated_data['historyIDs'])
+            return Response({"deleted": deleted})
+        logger.warning("Failed to bulk delete disease history: %s", serializer.errors)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 # ---- FeedbackRating ----
 class FeedbackRatingListCreateAPIView(APIView):
     """
     List and create feedback ratings.
+    GET supports sparse fieldsets via ?fields=.
     """
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        feedbacks = FeedbackRating.objects.all()
-        serializer = FeedbackRatingSerializer(feedbacks, many=True)
+        serializer = FeedbackRatingValuesSerializer(request=request)
         return Response(serializer.data)
 
     def post(self, request):
         serializer = FeedbackRatingSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Created feedback rating: {serializer.data}")
+            logger.info("Created feedback rating: %s", serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        logging.warning(f"Failed to create feedback rating: {serializer.errors}")
+        logger.warning("Failed to create feedback rating: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -202,15 +219,15 @@ class FeedbackRatingDetailAPIView(APIView):
         serializer = FeedbackRatingSerializer(feedback, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Updated feedback rating {pk}: {serializer.data}")
+            logger.info("Updated feedback rating %s: %s", pk, serializer.data)
             return Response(serializer.data)
-        logging.warning(f"Failed to update feedback rating {pk}: {serializer.errors}")
+        logger.warning("Failed to update feedback rating %s: %s", pk, serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         feedback = get_object_or_404(FeedbackRating, pk=pk)
         feedback.delete()
-        logging.info(f"Deleted feedback rating {pk}")
+        logger.info("Deleted feedback rating %s", pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -218,19 +235,21 @@ class FeedbackRatingDetailAPIView(APIView):
 class EditHistoryListCreateAPIView(APIView):
     """
     List and create edit history records.
+    GET supports sparse fieldsets via ?fields=.
     """
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        edits = EditHistory.objects.all()
-        serializer = EditHistorySerializer(edits, many=True)
+        serializer = EditHistoryValuesSerializer(request=request)
         return Response(serializer.data)
 
     def post(self, request):
         serializer = EditHistorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Created edit history: {serializer.data}")
+            logger.info("Created edit history: %s", serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        logging.warning(f"Failed to create edit history: {serializer.errors}")
+        logger.warning("Failed to create edit history: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -246,7 +265,7 @@ class EditHistoryDetailAPIView(APIView):
     def delete(self, request, pk):
         edit = get_object_or_404(EditHistory, pk=pk)
         edit.delete()
-        logging.info(f"Deleted edit history record {pk}")
+        logger.info("Deleted edit history record %s", pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -254,19 +273,21 @@ class EditHistoryDetailAPIView(APIView):
 class DeleteHistoryListCreateAPIView(APIView):
     """
     List and create delete history records.
+    GET supports sparse fieldsets via ?fields=.
     """
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        deletes = DeleteHistory.objects.all()
-        serializer = DeleteHistorySerializer(deletes, many=True)
+        serializer = DeleteHistoryValuesSerializer(request=request)
         return Response(serializer.data)
 
     def post(self, request):
         serializer = DeleteHistorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            logging.info(f"Created delete history: {serializer.data}")
+            logger.info("Created delete history: %s", serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        logging.warning(f"Failed to create delete history: {serializer.errors}")
+        logger.warning("Failed to create delete history: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -282,14 +303,16 @@ class DeleteHistoryDetailAPIView(APIView):
     def delete(self, request, pk):
         delete = get_object_or_404(DeleteHistory, pk=pk)
         delete.delete()
-        logging.info(f"Deleted delete history record {pk}")
+        logger.info("Deleted delete history record %s", pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class CropLibraryListAPIView(APIView):
     """
     API to list plant names, disease names, and sample images.
+    Supports sparse fieldsets via ?fields=.
     """
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        diseases = Disease.objects.all()
-        serializer = CropLibrarySerializer(diseases, many=True, context={'request': request})
+        serializer = CropLibraryValuesSerializer(request=request)
         return Response(serializer.data)
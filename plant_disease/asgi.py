@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plant_disease.settings')
 
 application = get_asgi_application()
+
+# Load the model now, on the main thread, rather than on the first predict request
+from core.apps import start_inference  # noqa: E402
+
+start_inference()
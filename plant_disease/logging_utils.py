@@ -0,0 +1,161 @@
+"""
+Non-blocking, structured logging for the plant_disease project.
+
+Request threads only put records on an in-memory queue (QueueListenerHandler);
+a background QueueListener formats them as JSON and writes them to the real
+handlers. RequestIDMiddleware tags every record with the current request ID.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
+from logging.config import ConvertingList
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# Request ID of the request being handled by the current thread / task
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIDFilter(logging.Filter):
+    """
+    Adds the current request ID to every record as `record.request_id`.
+    """
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records at or below `max_level`.
+    Used on high-volume loggers so hot-path messages don't flood the queue.
+    """
+    def __init__(self, rate=1.0, max_level='INFO'):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as a single-line JSON object.
+    Fields passed through `extra=` are included as top-level keys.
+    """
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+def _resolve_handlers(handlers):
+    """Resolve `cfg://handlers.<name>` references from dictConfig into handler objects."""
+    if not isinstance(handlers, ConvertingList):
+        return handlers
+    return [handlers[i] for i in range(len(handlers))]
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler that owns a background QueueListener feeding `handlers`.
+    The request thread only enqueues the record; formatting and disk I/O
+    happen on the listener thread.
+
+    Configure it with the '()' key and `cfg://handlers.<name>` references;
+    it must sort after its target handlers in LOGGING['handlers'], since
+    dictConfig configures handlers in alphabetical order.
+    """
+    def __init__(self, handlers, maxsize=10000, respect_handler_level=True):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.listener = QueueListener(
+            self.queue, *_resolve_handlers(handlers), respect_handler_level=respect_handler_level
+        )
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Render the message and traceback now, but keep the other attributes
+        # (request_id, extra fields) for the JSON formatter on the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Drop the record instead of blocking the request thread when the listener falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class RequestIDMiddleware:
+    """
+    Assigns a request ID (from the X-Request-ID header or a new UUID) to each request,
+    exposes it to log records and echoes it back in the response.
+    Sync and async capable, so ASGI requests stay on the event loop.
+    """
+    header = 'HTTP_X_REQUEST_ID'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        request_id = request.META.get(self.header) or uuid.uuid4().hex
+        request.request_id = request_id
+        return request_id, request_id_var.set(request_id)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_id, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
@@ -2,10 +2,16 @@ from datetime import timedelta
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Define base directory for consistent path building
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# -------------------------------
+# ENVIRONMENT VARIABLES
+# -------------------------------
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))  # Load .env values securely
+
 # -------------------------------
 # SECURITY CONFIGURATION
 # -------------------------------
@@ -35,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.fast_predict.FastPredictMiddleware',  # Must stay first: answers FAST_PREDICT_PATH before anything else runs
+    'plant_disease.logging_utils.RequestIDMiddleware',  # Tags log records with a request ID
     "corsheaders.middleware.CorsMiddleware", # Handle CORS headers
     "django.middleware.common.CommonMiddleware",
     'django.middleware.security.SecurityMiddleware',
@@ -48,6 +56,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'plant_disease.urls'
 
+# Which routes this process serves, so auth/API and inference can be deployed separately:
+#   'all'       - everything (default, single deployment)
+#   'api'       - auth, history, feedback, library; never imports torch or loads the model
+#   'inference' - only model/predict/ and model/inference/stats/; loads the model at URLconf import
+DEPLOYMENT_ROLE = os.getenv('DEPLOYMENT_ROLE', 'all')
+if DEPLOYMENT_ROLE not in ('all', 'api', 'inference'):
+    raise ImproperlyConfigured(f"DEPLOYMENT_ROLE must be 'all', 'api' or 'inference', not '{DEPLOYMENT_ROLE}'.")
+
 # -------------------------------
 # TEMPLATES CONFIGURATION
 # -------------------------------
@@ -71,16 +87,71 @@ WSGI_APPLICATION = 'plant_disease.wsgi.application'
 # -------------------------------
 # DATABASE CONFIGURATION
 # -------------------------------
-DATABASES = {
-    'default': {
+# Selected with DJANGO_DB_PROFILE:
+#   'sqlite'     - default-configured SQLite for development
+#   'sqlite-wal' - SQLite tuned for concurrent writers (WAL, busy timeout, mmap, persistent connections);
+#                  SQLITE_PRAGMAS are applied to each new connection by core.apps.apply_sqlite_pragmas
+#   'postgres'   - PostgreSQL with persistent connections
+DB_PROFILE = os.getenv('DJANGO_DB_PROFILE', 'sqlite')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',      # Readers don't block the writer
+    'synchronous': 'NORMAL',    # Safe with WAL; fsync only at checkpoints
+    'busy_timeout': 5000,       # Wait (ms) for the write lock instead of failing immediately
+    'cache_size': -64000,       # 64 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+DB_PROFILES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',  # SQLite for development
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'sqlite-wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        # Django 4.2 passes OPTIONS straight to sqlite3.connect(), so only its arguments are accepted here
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB', 'plant_disease'),
+        'USER': os.getenv('POSTGRES_USER', 'plant_disease'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),  # Persistent connections, one per thread
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+if DB_PROFILE not in DB_PROFILES:
+    raise ImproperlyConfigured(f"DJANGO_DB_PROFILE must be one of {', '.join(DB_PROFILES)}, not '{DB_PROFILE}'.")
+
+DATABASES = {
+    'default': DB_PROFILES[DB_PROFILE],
 }
 
 # -------------------------------
 # PASSWORD VALIDATION
 # -------------------------------
+# PBKDF2 runs on a dedicated thread pool (userauths.hashing) so login bursts can't starve inference.
+# The hasher keeps Django's 'pbkdf2_sha256' algorithm, so existing password hashes stay valid.
+PASSWORD_HASHERS = [
+    'userauths.hashing.OffloadedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+AUTH_HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', '2'))  # Concurrent password hashes per worker process
+AUTH_HASH_MAX_PENDING = int(os.getenv('AUTH_HASH_MAX_PENDING', '32'))  # Queued + running; beyond this: 503
+AUTH_HASH_CPUS = int(os.getenv('AUTH_HASH_CPUS', '0'))  # Cores reserved for hashing (0: no reservation/pinning)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -117,14 +188,24 @@ AUTH_USER_MODEL = 'userauths.CustomUser'
 # -------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userauths.authentication.CachedJWTAuthentication',  # JWT auth with a short-lived user cache
     )
 }
 
+# Seconds a resolved JWT user stays cached (invalidated early when the user is saved). With more than one
+# server process this needs a shared cache: under LocMemCache the cache is then disabled (check userauths.W001).
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', '60'))
+
 # -------------------------------
-# ENVIRONMENT VARIABLES
+# CACHE CONFIGURATION
 # -------------------------------
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))  # Load .env values securely
+# Per-process memory cache by default; point CACHE_BACKEND/CACHE_LOCATION at Redis/Memcached to share it across workers
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
 
 # -------------------------------
 # LOGGING CONFIGURATION
@@ -133,19 +214,42 @@ LOG_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)  # Ensure logs directory exists
 
 
+# Fraction of hot-path INFO records kept per logger (e.g. one line per model save / prediction)
+LOG_SAMPLE_RATES = {
+    'core.models': float(os.getenv('LOG_SAMPLE_RATE_MODELS', '0.1')),
+    'core.serializers': float(os.getenv('LOG_SAMPLE_RATE_SERIALIZERS', '0.1')),
+    'core.model_utils': float(os.getenv('LOG_SAMPLE_RATE_INFERENCE', '0.1')),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,  # Keep default Django loggers
 
     'formatters': {
         'verbose': {
-            'format': '[{asctime}] {levelname} {name} - {message}',
+            'format': '[{asctime}] {levelname} {name} [{request_id}] - {message}',
             'style': '{',
         },
         'simple': {
             'format': '{levelname}: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'plant_disease.logging_utils.JsonFormatter',
+        },
+    },
+
+    'filters': {
+        'request_id': {
+            '()': 'plant_disease.logging_utils.RequestIDFilter',
+        },
+        **{
+            f'sample_{name}': {
+                '()': 'plant_disease.logging_utils.SamplingFilter',
+                'rate': rate,
+            }
+            for name, rate in LOG_SAMPLE_RATES.items()
+        },
     },
 
     'handlers': {
@@ -157,19 +261,35 @@ LOGGING = {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
             'filename': os.path.join(LOG_DIR, 'core.log'),
-            'formatter': 'verbose',
+            'formatter': 'json',
+        },
+        # Request threads only enqueue records; a background listener writes them
+        # to the handlers above. Must sort after them (dictConfig order is alphabetical).
+        'queue': {
+            '()': 'plant_disease.logging_utils.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['request_id'],
         },
     },
 
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
         },
         'core': {  # Custom logger for your app
-            'handlers': ['file'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
-            'propagate': True,
+            'propagate': False,
+        },
+        'userauths': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        **{
+            name: {'filters': [f'sample_{name}']}
+            for name in LOG_SAMPLE_RATES
         },
     }
 }
@@ -217,6 +337,112 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# -------------------------------
+# PREDICTION ADMISSION CONTROL
+# -------------------------------
+PREDICT_MAX_IN_FLIGHT = int(os.getenv('PREDICT_MAX_IN_FLIGHT', '4'))  # Concurrent predictions per worker
+PREDICT_RATE_LIMIT_PER_SECOND = float(os.getenv('PREDICT_RATE_LIMIT_PER_SECOND', '1'))  # Per-user refill rate (0 disables)
+PREDICT_RATE_LIMIT_BURST = float(os.getenv('PREDICT_RATE_LIMIT_BURST', '10'))  # Per-user burst size
+PREDICT_DEADLINE_HEADER = 'X-Request-Deadline'  # Absolute Unix timestamp after which the client gives up
+PREDICT_TIMEOUT_HEADER = 'X-Request-Timeout'    # Relative budget in seconds
+PREDICT_ASYNC_CPU_WORKERS = int(os.getenv('PREDICT_ASYNC_CPU_WORKERS', '4'))  # Decode/preprocess threads of predict/async/
+
+# Binary fast path for internal callers (core.fast_predict): raw JPEG or 256x256x3 RGB in, top-k out.
+# Disabled unless at least one token is set; callers send it in X-Internal-Token.
+FAST_PREDICT_PATH = '/model/predict/fast/'
+FAST_PREDICT_TOKENS = [t for t in os.getenv('FAST_PREDICT_TOKENS', '').split(',') if t]
+FAST_PREDICT_MAX_IN_FLIGHT = int(os.getenv('FAST_PREDICT_MAX_IN_FLIGHT', '16'))
+FAST_PREDICT_TOP_K = 5
+FAST_PREDICT_MAX_TOP_K = 38  # Number of classes
+
+# Upload limits, checked from the file size and image header before any decoding
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.getenv('UPLOAD_MAX_PIXELS', str(40_000_000)))  # Also Pillow's MAX_IMAGE_PIXELS
+UPLOAD_MAX_DECODE_BYTES = int(os.getenv('UPLOAD_MAX_DECODE_BYTES', str(256 * 1024 * 1024)))  # Decoded + RGB copy
+UPLOAD_HEADER_SCAN_BYTES = 1024 * 1024  # JPEG metadata allowed before the frame header
+
+# Image quality gate, measured on a small decoded thumbnail before inference
+IMAGE_QUALITY_THUMBNAIL_SIZE = 128
+IMAGE_QUALITY_MIN_RESOLUTION = (224, 224)  # Of the original upload
+IMAGE_QUALITY_MIN_BRIGHTNESS = 40  # Mean gray level (0-255)
+IMAGE_QUALITY_MAX_CLIPPED_FRACTION = 0.25  # Max share of pixels crushed to black / blown to white
+IMAGE_QUALITY_MIN_SHARPNESS = float(os.getenv('IMAGE_QUALITY_MIN_SHARPNESS', '20'))  # Laplacian variance on the thumbnail
+IMAGE_QUALITY_MIN_VEGETATION_COVERAGE = float(os.getenv('IMAGE_QUALITY_MIN_VEGETATION_COVERAGE', '0.05'))
+IMAGE_QUALITY_VEGETATION_HUE_RANGE = (20, 160)  # HSV hue in degrees: yellowing through green leaves
+IMAGE_QUALITY_VEGETATION_MIN_SATURATION = 0.15
+IMAGE_QUALITY_VEGETATION_MIN_VALUE = 0.15
+
+# Inference scheduling: priority classes and their weights (weighted round-robin between classes,
+# deficit round-robin between users inside a class). Each endpoint has a class; clients may ask for a
+# lighter one with X-Priority-Class, only staff users and the internal fast path for a heavier one.
+INFERENCE_PRIORITY_CLASSES = {
+    'interactive': int(os.getenv('INFERENCE_WEIGHT_INTERACTIVE', '8')),  # Single-image uploads
+    'bulk': int(os.getenv('INFERENCE_WEIGHT_BULK', '1')),                # Batch jobs use the leftover capacity
+}
+INFERENCE_DEFAULT_PRIORITY = 'interactive'  # Synchronous predict endpoints
+INFERENCE_JOB_PRIORITY = 'bulk'  # Asynchronous prediction jobs
+# Model replicas per worker process (= threads running forwards) and their CPU budget; 0 picks automatically
+# from the cores this process may use, divided by the number of server processes sharing them.
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+INFERENCE_THREADS_PER_REPLICA = int(os.getenv('INFERENCE_THREADS_PER_REPLICA', '0'))  # torch intra-op threads
+INFERENCE_PROCESSES = int(os.getenv('WEB_CONCURRENCY', '1'))  # Server worker processes on this host
+INFERENCE_PIN_CPUS = os.getenv('INFERENCE_PIN_CPUS', 'false').lower() == 'true'  # Pin each replica to its own cores
+
+# Dedicated inference servers (`manage.py run_inference_server --socket PATH`, one per path). When set, web
+# workers don't load the model: they send preprocessed tensors over these Unix sockets (tensor data travels
+# in shared memory) to the least-loaded server. Size the servers' pools with INFERENCE_WORKERS.
+INFERENCE_SERVERS = [p for p in os.getenv('INFERENCE_SERVERS', '').split(',') if p]
+INFERENCE_SERVER_TIMEOUT = float(os.getenv('INFERENCE_SERVER_TIMEOUT', '30'))  # Per forward, queueing included
+INFERENCE_SERVER_RETRY_SECONDS = 5  # An unreachable server is skipped this long
+INFERENCE_SERVER_MAX_CONCURRENCY = 32  # Forwards this web process keeps in flight (threads waiting on servers)
+
+# Asynchronous prediction jobs (model/jobs/), processed by `manage.py run_prediction_worker`
+PREDICTION_JOB_BROKER = os.getenv('PREDICTION_JOB_BROKER', 'database')  # 'database' or 'redis'
+PREDICTION_JOB_REDIS_URL = os.getenv('PREDICTION_JOB_REDIS_URL', 'redis://localhost:6379/0')
+PREDICTION_JOB_REDIS_KEY = 'plant-disease:prediction-jobs'
+PREDICTION_JOB_POLL_SECONDS = float(os.getenv('PREDICTION_JOB_POLL_SECONDS', '1'))  # Idle wait between broker polls
+PREDICTION_JOB_QUEUE_TIMEOUT = int(os.getenv('PREDICTION_JOB_QUEUE_TIMEOUT', '3600'))  # Queued longer than this: expired
+PREDICTION_JOB_RUNNING_TIMEOUT = 300  # Running longer than this: the worker is presumed dead, job re-queued
+PREDICTION_JOB_MAX_ATTEMPTS = 3  # ... or failed after this many attempts
+PREDICTION_JOB_RESULT_TTL = int(os.getenv('PREDICTION_JOB_RESULT_TTL', '86400'))  # Finished jobs kept for polling
+PREDICTION_JOB_CALLBACK_TIMEOUT = 5  # Seconds
+# Hosts callback URLs may point at (must also resolve to public addresses). Empty: callbacks disabled.
+PREDICTION_JOB_CALLBACK_HOSTS = [h.lower() for h in os.getenv('PREDICTION_JOB_CALLBACK_HOSTS', '').split(',') if h]
+
+# -------------------------------
+# MODEL REGISTRY
+# -------------------------------
+MODEL_REGISTRY_DIR = BASE_DIR / 'core' / 'model' / 'registry'  # Versioned artifacts + CURRENT pointer
+MODEL_REGISTRY_POLL_SECONDS = int(os.getenv('MODEL_REGISTRY_POLL_SECONDS', '30'))  # 0: reload on SIGHUP only
+DATASET_CACHE_DIR = BASE_DIR / 'core' / 'model' / 'cache'  # Decoded uint8 training caches + checkpoints (train_model)
+
+# Shadow evaluation: score a sample of production traffic with a candidate registry version
+SHADOW_MODEL_VERSION = os.getenv('SHADOW_MODEL_VERSION') or None  # Unset disables shadow mode
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0.05'))  # Fraction of predictions sampled
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '16'))  # Samples beyond this are dropped
+SHADOW_MAX_PRIMARY_QUEUE_DEPTH = int(os.getenv('SHADOW_MAX_PRIMARY_QUEUE_DEPTH', '0'))  # Skip when inference is backed up
+
+# Triage cascade: a tiny 64 x 64 classifier answers confidently-healthy leaves before the full model
+TRIAGE_ENABLED = os.getenv('TRIAGE_ENABLED', 'false').lower() == 'true'
+TRIAGE_MODEL_DIR = BASE_DIR / 'core' / 'model' / 'triage'  # triage-model.pth + triage.json (calibrated threshold)
+
+# Input-resolution variants (same weights, adaptive pooling). Compute scales with the pixel count.
+MODEL_VARIANT_SIZES = [128, 192, 256]
+MODEL_VARIANTS_FILE = BASE_DIR / 'core' / 'model' / 'variants.json'  # Measured by `benchmark_variants`
+INFERENCE_CLASS_INPUT_SIZE = {'interactive': 256, 'bulk': 256}  # Preferred size per priority class
+INFERENCE_DEGRADE_STEPS = [(8, 192), (16, 128)]  # (queue depth, max input size) under load
+# A smaller variant is only used when benchmark_variants measured its top-1 accuracy within this
+# much (absolute) of the full-size model; without measurements every request runs at full size.
+INFERENCE_VARIANT_MAX_ACCURACY_LOSS = float(os.getenv('INFERENCE_VARIANT_MAX_ACCURACY_LOSS', '0.01'))
+
+# Tiled inference of high-resolution images (predict/tiled/): 256 px tiles (the model input)
+TILED_TILE_STRIDE = 192  # 25% overlap between neighbouring tiles
+TILED_MAX_SIDE = int(os.getenv('TILED_MAX_SIDE', '4096'))  # Larger images are downscaled before tiling
+TILED_MIN_VEGETATION = 0.15  # Tiles with a smaller vegetation share are skipped
+TILED_BATCH_SIZE = int(os.getenv('TILED_BATCH_SIZE', '16'))
+TILED_MAX_PENDING_BATCHES = 2  # Batches queued at once per request
+TILED_PRIORITY = 'bulk'  # One tiled request is many forwards; don't let it crowd out interactive uploads
+
 # -------------------------------
 # EMAIL & SMS INTEGRATION SETTINGS
 # -------------------------------
@@ -7,9 +7,14 @@ from django.conf.urls.static import static
 # URL ROUTING CONFIGURATION
 # -------------------------------
 urlpatterns = [
-    path('admin/', admin.site.urls),                      # Django admin interface
-    path('api/', include('userauths.urls')),              # User authentication and registration APIs
     path('model/', include('core.urls')),                 # Core model-related APIs (e.g., prediction, history)
 ]
 
+# Inference-only workers (DEPLOYMENT_ROLE = 'inference') serve just the predict routes
+if settings.DEPLOYMENT_ROLE != 'inference':
+    urlpatterns += [
+        path('admin/', admin.site.urls),                  # Django admin interface
+        path('api/', include('userauths.urls')),          # User authentication and registration APIs
+    ]
+
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,57 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+PER_PROCESS_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def user_cache_enabled():
+    """
+    Whether resolved JWT users may be cached. Invalidation (userauths.signals) only reaches
+    the cache of the process that saved the user, so a per-process cache is only used when
+    this is the single server process (WEB_CONCURRENCY 1, DEPLOYMENT_ROLE 'all');
+    otherwise a shared backend (Redis, Memcached, database) is required.
+    """
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return False
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHE_BACKENDS:
+        return True
+    return settings.INFERENCE_PROCESSES == 1 and settings.DEPLOYMENT_ROLE == 'all'
+
+
+def user_cache_key(user_id):
+    """Cache key under which the resolved user for a JWT is stored."""
+    return f"jwt-user:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the resolved user for JWT_USER_CACHE_TTL seconds,
+    so authenticated requests don't query CustomUser every time.
+    Entries are invalidated when the user is saved or deleted (see userauths.signals).
+    Falls back to plain JWTAuthentication when the cache isn't shared (user_cache_enabled).
+    """
+    def get_user(self, validated_token):
+        if not user_cache_enabled():
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .authentication import user_cache_enabled
+
+
+@register(Tags.caches)
+def check_jwt_user_cache(app_configs, **kwargs):
+    """Warns when the JWT user cache is configured but disabled because the cache isn't shared."""
+    if settings.JWT_USER_CACHE_TTL <= 0 or user_cache_enabled():
+        return []
+    return [Warning(
+        "The JWT user cache is disabled: the default cache is per-process (LocMemCache), so logouts and "
+        "password changes would not reach the other server processes.",
+        hint="Set CACHE_BACKEND/CACHE_LOCATION to a shared cache (e.g. Redis), or JWT_USER_CACHE_TTL=0.",
+        id='userauths.W001',
+    )]
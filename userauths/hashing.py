@@ -0,0 +1,158 @@
+"""
+Password hashing on a dedicated, bounded thread pool.
+
+PBKDF2 is deliberately expensive (hundreds of ms of CPU per hash). Running it on
+the request threads lets a login burst take every core away from inference.
+OffloadedPBKDF2PasswordHasher sends the key derivation to a small executor
+instead, so authenticate(), make_password() and set_password() all share
+AUTH_HASH_WORKERS threads, pinned to the cores core.cpu_plan reserves for
+them. hashlib releases the GIL, so those threads really run in parallel with
+the rest of the worker. When more than AUTH_HASH_MAX_PENDING hashes are
+waiting, new ones from the sign-in API views (SheddingPasswordHashingMixin)
+are rejected with a 503 instead of queueing behind them. Every other caller
+(Django admin login, createsuperuser, changepassword, plain authenticate())
+just queues, since it has no DRF exception handling to turn the rejection
+into a response.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.cpu_plan import auth_cpus
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in requests right now, please try again shortly.'
+    default_code = 'password_hashing_busy'
+
+
+# Set while a view that can answer PasswordHashingBusy with a 503 is running
+_shedding = contextvars.ContextVar('password_hashing_shedding', default=False)
+
+
+@contextmanager
+def shedding_load():
+    """Hashes started in this block raise PasswordHashingBusy instead of queueing when the pool is full."""
+    token = _shedding.set(True)
+    try:
+        yield
+    finally:
+        _shedding.reset(token)
+
+
+class SheddingPasswordHashingMixin:
+    """DRF view mixin: password hashes run by the view are shed with a 503 when the pool is full."""
+    def dispatch(self, request, *args, **kwargs):
+        with shedding_load():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class PasswordHashingExecutor:
+    """
+    Runs hashing jobs on `workers` threads pinned to `cpus`, with at most
+    `max_pending` jobs queued or running. Records queue wait, hash time and the
+    share of wall time hashes actually got on a CPU; a share well below 1
+    means the hashing cores are contended.
+    """
+    def __init__(self, workers, max_pending, cpus=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cpus = cpus or None
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.total_cpu = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing',
+                                            initializer=self._pin_thread)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            workers=settings.AUTH_HASH_WORKERS,
+            max_pending=settings.AUTH_HASH_MAX_PENDING,
+            cpus=auth_cpus,
+        )
+
+    def _pin_thread(self):
+        if self.cpus:
+            try:
+                os.sched_setaffinity(threading.get_native_id(), self.cpus)
+            except (AttributeError, OSError) as e:
+                logger.warning("Could not pin password hashing thread to CPUs %s: %s", self.cpus, e)
+
+    def run(self, fn, *args):
+        """
+        Runs fn(*args) on the hashing pool and returns its result. Inside shedding_load(),
+        raises PasswordHashingBusy when `max_pending` hashes are already queued or running.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending and _shedding.get():
+                self.rejected += 1
+                raise PasswordHashingBusy()
+            self.pending += 1
+            self.submitted += 1
+        return self._executor.submit(self._timed, time.perf_counter(), fn, args).result()
+
+    def _timed(self, submitted_at, fn, args):
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            cpu = time.thread_time() - cpu_started
+            with self._lock:
+                wait = started - submitted_at
+                self.pending -= 1
+                self.completed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.total_run += finished - started
+                self.total_cpu += cpu
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                'workers': self.workers,
+                'cpus': self.cpus,
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'completed': completed,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(1000 * self.total_wait / completed, 2) if completed else 0.0,
+                'max_wait_ms': round(1000 * self.max_wait, 2),
+                'avg_hash_ms': round(1000 * self.total_run / completed, 2) if completed else 0.0,
+                'cpu_share': round(self.total_cpu / self.total_run, 3) if self.total_run else None,
+            }
+
+
+# Hashing pool of this worker process
+password_hashing = PasswordHashingExecutor.from_settings()
+
+
+class OffloadedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's default PBKDF2-SHA256 hasher (same algorithm name and encoding, so existing
+    hashes keep verifying) with the key derivation run on the hashing pool.
+    verify() and harden_runtime() go through encode(), so they are offloaded too.
+    """
+    def encode(self, password, salt, iterations=None):
+        return password_hashing.run(super().encode, password, salt, iterations)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Deletes the rows of `queryset` in primary-key batches so a large purge
+    doesn't hold one long write lock. Returns the number of deleted rows.
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        queryset.model.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-delete expired outstanding and blacklisted JWT refresh tokens (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now()
+
+        blacklisted = delete_in_batches(
+            BlacklistedToken.objects.filter(token__expires_at__lte=cutoff), batch_size
+        )
+        outstanding = delete_in_batches(
+            OutstandingToken.objects.filter(expires_at__lte=cutoff), batch_size
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {outstanding} expired outstanding tokens and {blacklisted} blacklisted tokens.'
+        ))
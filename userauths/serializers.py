@@ -31,29 +31,29 @@ class RegisterSerializer(serializers.ModelSerializer):
         confirm_password = data.get('confirm_password')
         
         if password != confirm_password:
-            logger.warning(f"Password mismatch for email: {data.get('email')}")
+            logger.warning("Password mismatch for email: %s", data.get('email'))
             raise serializers.ValidationError("Passwords do not match.")
         
         # Password policy enforcement
         if len(password) < 8:
-            logger.warning(f"Weak password (too short) for email: {data.get('email')}")
+            logger.warning("Weak password (too short) for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must be at least 8 characters long.")
         if not re.search(r"[A-Z]", password):
-            logger.warning(f"Weak password (missing uppercase) for email: {data.get('email')}")
+            logger.warning("Weak password (missing uppercase) for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must contain at least one uppercase letter.")
         if not re.search(r"[a-z]", password):
-            logger.warning(f"Weak password (missing lowercase) for email: {data.get('email')}")
+            logger.warning("Weak password (missing lowercase) for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must contain at least one lowercase letter.")
         if not re.search(r"[0-9]", password):
-            logger.warning(f"Weak password (missing digit) for email: {data.get('email')}")
+            logger.warning("Weak password (missing digit) for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must contain at least one digit.")
         if not re.search(r"[!@#$%^&*(),.?\":{}|<>]", password):
-            logger.warning(f"Weak password (missing special char) for email: {data.get('email')}")
+            logger.warning("Weak password (missing special char) for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must contain at least one special character.")
         if re.search(r"\s", password):
-            logger.warning(f"Password contains space for email: {data.get('email')}")
+            logger.warning("Password contains space for email: %s", data.get('email'))
             raise serializers.ValidationError("Password must not contain spaces.")
-        logger.info(f"Password validated for registration: {data.get('email')}")
+        logger.info("Password validated for registration: %s", data.get('email'))
         return data
 
 class SendEmailOTPSerializer(serializers.Serializer):
@@ -63,7 +63,7 @@ class SendEmailOTPSerializer(serializers.Serializer):
     email = serializers.EmailField()
     # purpose = serializers.ChoiceField(choices=['register', 'login', 'forgot_password'])
     def validate_email(self, email):
-        logger.info(f"SendEmailOTPSerializer validating email: {email}")
+        logger.info("SendEmailOTPSerializer validating email: %s", email)
         return email
 
 # class SendMobileOTPSerializer(serializers.Serializer):
@@ -82,7 +82,7 @@ class OTPVerifySerializer(serializers.Serializer):
     email = serializers.EmailField()
     otp_code = serializers.CharField(max_length=6)
     def validate(self, data):
-        logger.info(f"Verifying OTP for email: {data.get('email')}")
+        logger.info("Verifying OTP for email: %s", data.get('email'))
         return data
 
 class LoginSerializer(serializers.Serializer):
@@ -92,7 +92,7 @@ class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
     def validate(self, data):
-        logger.info(f"Login attempt for email: {data.get('email')}")
+        logger.info("Login attempt for email: %s", data.get('email'))
         return data
 
 class ForgotPasswordSerializer(serializers.Serializer):
@@ -101,7 +101,7 @@ class ForgotPasswordSerializer(serializers.Serializer):
     """
     email = serializers.EmailField()
     def validate_email(self, email):
-        logger.info(f"Forgot password requested for email: {email}")
+        logger.info("Forgot password requested for email: %s", email)
         return email
 
 class ResetPasswordSerializer(serializers.Serializer):
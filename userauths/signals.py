@@ -0,0 +1,16 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import user_cache_key
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_jwt_user(sender, instance, **kwargs):
+    """
+    Drop the cached JWT user whenever the user changes.
+    Note: QuerySet.update() doesn't send signals; stale entries then expire after JWT_USER_CACHE_TTL.
+    """
+    cache.delete(user_cache_key(instance.pk))
@@ -1,3 +1,113 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import CachedJWTAuthentication, user_cache_enabled, user_cache_key
+from .hashing import PasswordHashingBusy, PasswordHashingExecutor, shedding_load
+from .models import CustomUser
+
+
+class PasswordHashingExecutorTests(SimpleTestCase):
+    def setUp(self):
+        self.executor = PasswordHashingExecutor(workers=1, max_pending=1)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.blocker = threading.Thread(target=self.executor.run, args=(self.block,))
+        self.blocker.start()
+        self.started.wait(5)  # The only slot is now taken
+
+    def tearDown(self):
+        self.release.set()
+        self.blocker.join(5)
+        self.executor._executor.shutdown()
+
+    def block(self):
+        self.started.set()
+        self.release.wait(5)
+
+    def test_runs_and_counts(self):
+        self.release.set()
+        self.blocker.join(5)
+        self.assertEqual(self.executor.run(sum, [1, 2]), 3)
+        stats = self.executor.stats()
+        self.assertEqual((stats['completed'], stats['rejected'], stats['pending']), (2, 0, 0))
+
+    def test_sheds_when_full_inside_shedding_load(self):
+        with shedding_load(), self.assertRaises(PasswordHashingBusy):
+            self.executor.run(sum, [1, 2])
+        self.assertEqual(self.executor.stats()['rejected'], 1)
+
+    def test_queues_when_full_outside_shedding_load(self):
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(self.executor.run(sum, [1, 2])))
+        waiter.start()
+        self.release.set()
+        waiter.join(5)
+        self.assertEqual(results, [3])
+        self.assertEqual(self.executor.stats()['rejected'], 0)
+
+
+@override_settings(
+    JWT_USER_CACHE_TTL=60,
+    INFERENCE_PROCESSES=1,
+    DEPLOYMENT_ROLE='all',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            'grower@example.com', 'Test', 'Grower', 'Central', '0700000000', password='old-password'
+        )
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CachedJWTAuthentication()
+
+    def test_caches_resolved_user(self):
+        self.assertEqual(self.auth.get_user(self.token), self.user)
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)), self.user)
+        with self.assertNumQueries(0):
+            self.auth.get_user(self.token)
+
+    def test_password_change_invalidates_cache(self):
+        self.auth.get_user(self.token)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertTrue(self.auth.get_user(self.token).check_password('new-password'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_deleted_user_is_rejected(self):
+        self.auth.get_user(self.token)
+        self.user.delete()
+        self.assertIsNone(cache.get(user_cache_key(self.token['user_id'])))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_logout_blacklists_refresh_token(self):
+        tokens = self.client.post(
+            reverse('login'), {'email': 'grower@example.com', 'password': 'old-password'}
+        ).json()
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}
+        self.assertEqual(self.client.post(reverse('logout'), {'refresh': tokens['refresh']}, **headers).status_code, 205)
+        self.assertEqual(self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}).status_code, 401)
+
+    def test_cache_disabled_for_per_process_backend_with_several_processes(self):
+        self.assertTrue(user_cache_enabled())
+        with override_settings(INFERENCE_PROCESSES=4):
+            self.assertFalse(user_cache_enabled())
+            self.auth.get_user(self.token)
+            self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        with override_settings(INFERENCE_PROCESSES=4, CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}):
+            self.assertTrue(user_cache_enabled())
@@ -2,7 +2,6 @@ from django.urls import path
 
 # JWT Views
 from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
@@ -18,7 +17,9 @@ from .views import (
     LogoutView,
     ForgotPasswordView,
     ResetPasswordView,
-    UserProfileView
+    UserProfileView,
+    PasswordHashingStatsView,
+    SheddingTokenObtainPairView,
 )
 
 urlpatterns = [
@@ -38,9 +39,12 @@ urlpatterns = [
     path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
 
     # JWT Token Management
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', SheddingTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
     path('profile/', UserProfileView.as_view(), name='user-profile'),
+
+    # Password hashing pool metrics (admin only)
+    path('auth/hashing-stats/', PasswordHashingStatsView.as_view(), name='password-hashing-stats'),
 ]
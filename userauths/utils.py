@@ -35,7 +35,7 @@ def cleanup_temp_user(email, phone_no):
         Q(email=email) | Q(phone_no=phone_no)
     ).delete()
 
-    logger.info(f"Cleaned up temp users: expired={expired_count}, conflicts={conflict_count}")
+    logger.info("Cleaned up temp users: expired=%s, conflicts=%s", expired_count, conflict_count)
 
 
 def create_temp_user(validated_data):
@@ -50,7 +50,7 @@ def create_temp_user(validated_data):
         password=make_password(validated_data['password']),
         region=validated_data['region']
     )
-    logger.debug(f"Temporary user created for email: {temp_user.email}")
+    logger.debug("Temporary user created for email: %s", temp_user.email)
     return temp_user
 
 
@@ -87,11 +87,11 @@ def send_email_otp(email, purpose='register'):
             sib_api_v3_sdk.ApiClient(configuration)
         )
         api_instance.send_transac_email(send_smtp_email)
-        logger.info(f"Email OTP sent to {email}")
+        logger.info("Email OTP sent to %s", email)
         return otp_code
 
     except ApiException as e:
-        logger.error(f"Error sending email OTP via Brevo for {email}: {e}")
+        logger.error("Error sending email OTP via Brevo for %s: %s", email, e)
         return False
 
 
@@ -153,18 +153,18 @@ def verify_otp(identifier, otp_code, is_email=True):
         lookup_field = {'email': identifier} if is_email else {'phone_no': identifier}
         otp = OTP.objects.filter(**lookup_field, otp_code=otp_code).latest('created_at')
     except OTP.DoesNotExist:
-        logger.warning(f"OTP verification failed for {identifier} - OTP not found")
+        logger.warning("OTP verification failed for %s - OTP not found", identifier)
         return None, "Invalid or expired OTP"
 
     if otp.is_verified:
-        logger.info(f"OTP for {identifier} already verified")
+        logger.info("OTP for %s already verified", identifier)
         return None, "OTP already verified"
 
     if otp.is_expired():
-        logger.info(f"OTP for {identifier} has expired")
+        logger.info("OTP for %s has expired", identifier)
         return None, "OTP has expired"
 
     otp.is_verified = True
     otp.save()
-    logger.info(f"OTP successfully verified for {identifier}")
+    logger.info("OTP successfully verified for %s", identifier)
     return otp, None
@@ -5,17 +5,19 @@ from django.utils.timezone import now
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .serializers import *
 from .models import *
 from .utils import *
+from .hashing import PasswordHashingBusy, SheddingPasswordHashingMixin, password_hashing
 
 
 logger = logging.getLogger(__name__)
 
-class RegisterView(APIView):
+class RegisterView(SheddingPasswordHashingMixin, APIView):
     permission_classes = (AllowAny,)
 
     def post(self, request):
@@ -24,16 +26,16 @@ class RegisterView(APIView):
             phone_no = serializer.validated_data['phone_no']
             email = serializer.validated_data['email']
             if CustomUser.objects.filter(email=email).exists():
-                logger.warning(f"Attempted registration with existing email: {email}")
+                logger.warning("Attempted registration with existing email: %s", email)
                 return Response({"error": "Email is already registered"}, status=400)
             if CustomUser.objects.filter(phone_no=phone_no).exists():
-                logger.warning(f"Attempted registration with existing phone number: {phone_no}")
+                logger.warning("Attempted registration with existing phone number: %s", phone_no)
                 return Response({"error": "This number is already registered"}, status=400)
 
             cleanup_temp_user(email, phone_no)
             temp_user = create_temp_user(serializer.validated_data)
             send_email_otp(temp_user.email, purpose='register')
-            logger.info(f"Temporary user created and OTP sent to email: {email}")
+            logger.info("Temporary user created and OTP sent to email: %s", email)
             return Response({"message": "Email OTP sent"}, status=200)
         
         logger.error("Invalid registration data", extra={"errors": serializer.errors})
@@ -48,7 +50,7 @@ class SendEmailOTPView(APIView):
         if serializer.is_valid():
             email = serializer.validated_data['email']
             send_email_otp(email)
-            logger.info(f"OTP sent to email: {email}")
+            logger.info("OTP sent to email: %s", email)
             return Response({"message": "OTP sent to email."}, status=status.HTTP_200_OK)
         logger.error("Failed to send email OTP", extra={"errors": serializer.errors})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -77,13 +79,13 @@ class VerifyEmailOTPView(APIView):
         otp_code = request.data.get("otp_code")
         otp, error = verify_otp(email, otp_code, is_email=True)
         if error:
-            logger.warning(f"Email OTP verification failed for {email}: {error}")
+            logger.warning("Email OTP verification failed for %s: %s", email, error)
             return Response({"error": error}, status=400)
         
         try:
             temp_user = TemporaryUserData.objects.get(email=email)
         except TemporaryUserData.DoesNotExist:
-            logger.error(f"Temporary user not found for email: {email}")
+            logger.error("Temporary user not found for email: %s", email)
             return Response({"error": "Temporary user not found."}, status=400)
 
         temp_user.is_email_verified = True
@@ -109,7 +111,7 @@ class VerifyEmailOTPView(APIView):
         serializer = RegisterSerializer(user)
         data = serializer.data
         data["tokens"] = tokens
-        logger.info(f"User successfully registered: {user.email}")
+        logger.info("User successfully registered: %s", user.email)
         return Response( {"message": "User successfully registered."}, status=status.HTTP_201_CREATED)
 
 
@@ -163,7 +165,7 @@ class VerifyEmailOTPView(APIView):
 #         return Response( {"message": "User successfully registered."}, status=status.HTTP_201_CREATED)
 
 
-class LoginView(APIView):
+class LoginView(SheddingPasswordHashingMixin, APIView):
     permission_classes = (AllowAny,)
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -177,7 +179,7 @@ class LoginView(APIView):
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
                 })
-            logger.warning(f"Invalid login attempt for email: {serializer.validated_data['email']}")
+            logger.warning("Invalid login attempt for email: %s", serializer.validated_data['email'])
             return Response({"error": "Invalid credentials"}, status=400)
         logger.error("Login serializer validation failed", extra={"errors": serializer.errors})
         return Response(serializer.errors, status=400)
@@ -189,7 +191,7 @@ class LogoutView(APIView):
             refresh_token = request.data.get("refresh")
             token = RefreshToken(refresh_token)
             token.blacklist()
-            logger.info(f"User logged out: {request.user.email}")
+            logger.info("User logged out: %s", request.user.email)
             return Response(status=205)
         except Exception as e:
             logger.error("Logout failed", exc_info=e)
@@ -206,18 +208,18 @@ class ForgotPasswordView(APIView):
             try:
                 user = CustomUser.objects.get(email=email)
             except CustomUser.DoesNotExist:
-                logger.warning(f"Forgot password attempt for non-existent email: {email}")
+                logger.warning("Forgot password attempt for non-existent email: %s", email)
                 return Response({"error": "User not found."}, status=status.HTTP_400_BAD_REQUEST)
 
             # Send the reset OTP to the user's email
             send_email_otp(email, purpose='reset')
-            logger.info(f"Password reset OTP sent to: {email}")
+            logger.info("Password reset OTP sent to: %s", email)
             return Response({"message": "Password reset OTP sent to email."}, status=status.HTTP_200_OK)
         else:
             logger.error("Forgot password serializer validation failed", extra={"errors": serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ResetPasswordView(APIView):
+class ResetPasswordView(SheddingPasswordHashingMixin, APIView):
     permission_classes = (AllowAny,)
     
     def post(self, request):
@@ -229,15 +231,17 @@ class ResetPasswordView(APIView):
             try:
                 otp = OTP.objects.get(email=email, otp_code=otp_code)
                 if otp.is_expired():
-                    logger.warning(f"Reset password failed: OTP expired for {email}")
+                    logger.warning("Reset password failed: OTP expired for %s", email)
                     return Response({"error": "OTP expired"}, status=400)
                 user = CustomUser.objects.get(email=email)
                 user.set_password(new_password)
                 user.save()
-                logger.info(f"Password reset successful for {email}")
+                logger.info("Password reset successful for %s", email)
                 return Response({"message": "Password reset successful."})
+            except PasswordHashingBusy:
+                raise
             except Exception as e:
-                logger.error(f"Reset password failed for {email}", exc_info=e)
+                logger.error("Reset password failed for %s", email, exc_info=e)
                 return Response({"error": "Invalid data"}, status=400)
         return Response(serializer.errors, status=400)
 
@@ -252,3 +256,18 @@ class UserProfileView(RetrieveUpdateAPIView):
 
     def get_object(self):
         return self.request.user  # Return the currently logged-in user
+
+
+class SheddingTokenObtainPairView(SheddingPasswordHashingMixin, TokenObtainPairView):
+    """simplejwt's token view, with password hashes shed under load like the login view."""
+
+
+class PasswordHashingStatsView(APIView):
+    """
+    Password hashing pool metrics for this worker (admin only): queue depth, wait and
+    hash times, rejections, and the CPU share hashes got on their reserved cores.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(password_hashing.stats())